@@ -10,6 +10,8 @@ Aplicacao Flask para controlar o ciclo de vida de processos entre gerencias.
 """
 
 import ast
+import csv
+import hashlib
 import json
 import logging
 import os
@@ -17,13 +19,20 @@ import secrets
 import re
 import sys
 import site
+import sqlite3
 import tempfile
+import threading
+import time
 import unicodedata
 import webbrowser
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from io import BytesIO
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from functools import lru_cache
+from io import BytesIO, StringIO
+from itertools import chain
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from urllib.parse import urlparse
 from zoneinfo import ZoneInfo
 
@@ -41,6 +50,9 @@ from flask import (
     session,
     send_file,
     jsonify,
+    make_response,
+    Response,
+    stream_with_context,
     url_for,
 )
 from flask_login import (
@@ -52,8 +64,24 @@ from flask_login import (
     logout_user,
 )
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func, inspect, text, or_, cast
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import (
+    and_,
+    case,
+    cast,
+    event,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    tuple_,
+    type_coerce,
+    union_all,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, joinedload, lazyload, load_only, raiseload, selectinload
 from werkzeug.security import check_password_hash, generate_password_hash
 # removed upload feature
 
@@ -95,11 +123,25 @@ carregar_dotenv(DOTENV_PATH)
 IMPORT_CACHE_DIR = os.path.join(BASE_DIR, "tmp_imports")
 IMPORT_CACHE_TTL_MIN = 90
 IMPORT_CACHE: Dict[str, Dict[str, object]] = {}
+# Parquets da leitura completa em geracao (evita disparar a mesma leitura duas vezes).
+_IMPORTACOES_EM_LEITURA: Set[str] = set()
+_IMPORTACOES_LOCK = threading.Lock()
 OPENPYXL_MIN_VERSION = "3.1.5"
 MAX_IMPORT_FILE_SIZE_MB = 50
 IMPORT_COMMIT_BATCH_DEFAULT = 250
 IMPORT_TEMP_DB_MAX_MB = 2
 
+# Exportacoes (geral e por gerencia) geradas em segundo plano
+EXPORT_CACHE_DIR = os.path.join(BASE_DIR, "tmp_exports")
+EXPORT_CACHE_TTL_MIN = 10
+# Intervalo em que a exportacao em andamento renova o marcador .parcial (sinal de vida)
+EXPORT_HEARTBEAT_SEG = 30
+# Acima deste numero de linhas a exportacao da gerencia sai em CSV (xlsx fica lento demais)
+EXPORT_CSV_LIMITE_LINHAS = 50000
+# Formatos numericos das celulas de data (as exportacoes gravam date/datetime, nao texto)
+FORMATO_DATA_PLANILHA = "dd/mm/yyyy"
+FORMATO_DATA_HORA_PLANILHA = "dd/mm/yyyy hh:mm"
+
 
 # Campos aceitos durante importacao/exportacao e usados tambem para sugerir mapeamento.
 def _env_int(nome: str, padrao: int) -> int:
@@ -194,6 +236,10 @@ GERENCIAS_TRAMITE_EXIBICAO = (
     + [GERENCIA_ALIAS_GABINETE]
 )
 ORDEM_GERENCIAS = {ger: idx for idx, ger in enumerate(GERENCIAS)}
+# Marcadores de fluxo que nao contam como gerencia na trilha do processo.
+GERENCIAS_FORA_TRILHA = frozenset({"FINALIZADO", "SAIDA", "ENTRADA", "CADASTRO"})
+# Mesmos marcadores em minusculas, para comparar com nomes normalizados por strip().lower().
+GERENCIAS_FORA_TRILHA_MINUSCULAS = frozenset(nome.lower() for nome in GERENCIAS_FORA_TRILHA)
 
 # Quando verdadeiro, o site opera em modo "vitrine" sem ler/escrever dados reais.
 # Quando true, app roda em modo vitrine (sem escrever no banco)
@@ -213,6 +259,10 @@ AUTO_CORRIGIR_DADOS_ON_START = (
 MAX_IMPORT_FILE_SIZE_BYTES = max(1, _env_int("MAX_IMPORT_FILE_SIZE_MB", MAX_IMPORT_FILE_SIZE_MB)) * 1024 * 1024
 IMPORT_COMMIT_BATCH_SIZE = max(1, _env_int("IMPORT_COMMIT_BATCH_SIZE", IMPORT_COMMIT_BATCH_DEFAULT))
 IMPORT_TEMP_DB_MAX_BYTES = max(0, _env_int("IMPORT_TEMP_DB_MAX_MB", IMPORT_TEMP_DB_MAX_MB)) * 1024 * 1024
+# Cabecalho "Rotulo (GERENCIA)" das colunas de campos extras na planilha importada.
+REGEX_COLUNA_EXTRA_IMPORTACAO = re.compile(r"^(.*)\(([^)]+)\)\s*$")
+# Numero SEI lido pelo Excel como float em texto (ex.: "12345.0").
+REGEX_NUMERO_COM_DECIMAL_ZERO = re.compile(r"\d+\.0")
 
 ILUSTRACAO_FORMATOS_SUPORTADOS = (".png", ".jpg", ".jpeg", ".webp", ".svg", ".gif")
 CAMPO_EXTRA_TIPOS = {
@@ -1351,11 +1401,15 @@ def serializar_campos_extra(campos: List["CampoExtra"]) -> List[Dict[str, str]]:
 
 
 def obter_campos_por_gerencia() -> Dict[str, List["CampoExtra"]]:
-    """Retorna os campos extras agrupados pela gerencia."""
+    """Retorna os campos extras agrupados pela gerencia (uma consulta por requisicao)."""
+    agrupados = g.get("campos_por_gerencia")
+    if agrupados is not None:
+        return agrupados
     campos = CampoExtra.query.order_by(CampoExtra.criado_em.asc()).all()
-    agrupados: Dict[str, List[CampoExtra]] = defaultdict(list)
+    agrupados = defaultdict(list)
     for campo in campos:
         agrupados[campo.gerencia].append(campo)
+    g.campos_por_gerencia = agrupados
     return agrupados
 
 
@@ -1363,7 +1417,8 @@ def listar_campos_gerencia(gerencia: str) -> List["CampoExtra"]:
     """Retorna campos configurados para uma gerencia especifica."""
     if not gerencia:
         return []
-    return CampoExtra.query.filter_by(gerencia=gerencia).order_by(CampoExtra.criado_em.asc()).all()
+    # Reaproveita o agrupamento carregado uma vez por requisicao em obter_campos_por_gerencia.
+    return list(obter_campos_por_gerencia().get(gerencia, ()))
 
 
 def obter_coordenadorias_por_gerencia(gerencia: Optional[str]) -> List[str]:
@@ -1375,13 +1430,13 @@ def obter_coordenadorias_por_gerencia(gerencia: Optional[str]) -> List[str]:
     valores = list(COORDENADORIAS_POR_GERENCIA.get(ger_norm, []))
     vistos = {normalizar_chave(item) for item in valores}
 
-    pares_usuarios = (
-        db.session.query(Usuario.coordenadoria)
-        .filter(Usuario.coordenadoria.isnot(None))
-        .filter(func.lower(Usuario.gerencia_padrao) == ger_norm.lower())
-        .all()
-    )
-    for (coord,) in pares_usuarios:
+    pares_usuarios = db.session.scalars(
+        select(Usuario.coordenadoria).where(
+            Usuario.coordenadoria.isnot(None),
+            func.lower(Usuario.gerencia_padrao) == ger_norm.lower(),
+        )
+    ).all()
+    for coord in pares_usuarios:
         coord_txt = limpar_texto(coord, "")
         if not coord_txt:
             continue
@@ -1391,13 +1446,13 @@ def obter_coordenadorias_por_gerencia(gerencia: Optional[str]) -> List[str]:
         vistos.add(chave)
         valores.append(coord_txt)
 
-    pares_processos = (
-        db.session.query(Processo.coordenadoria)
-        .filter(Processo.coordenadoria.isnot(None))
-        .filter(func.lower(Processo.gerencia) == ger_norm.lower())
-        .all()
-    )
-    for (coord,) in pares_processos:
+    pares_processos = db.session.scalars(
+        select(Processo.coordenadoria).where(
+            Processo.coordenadoria.isnot(None),
+            func.lower(Processo.gerencia) == ger_norm.lower(),
+        )
+    ).all()
+    for coord in pares_processos:
         coord_txt = limpar_texto(coord, "")
         if not coord_txt:
             continue
@@ -1432,13 +1487,13 @@ def obter_equipes_por_coordenadoria(coordenadoria: Optional[str]) -> List[str]:
     valores = list(EQUIPES_POR_COORDENADORIA.get(coord_chave, []))
     vistos = {normalizar_chave(item) for item in valores}
 
-    equipes_usuarios = (
-        db.session.query(Usuario.equipe_area)
-        .filter(Usuario.equipe_area.isnot(None))
-        .filter(func.lower(Usuario.coordenadoria) == coord.lower())
-        .all()
-    )
-    for (equipe,) in equipes_usuarios:
+    equipes_usuarios = db.session.scalars(
+        select(Usuario.equipe_area).where(
+            Usuario.equipe_area.isnot(None),
+            func.lower(Usuario.coordenadoria) == coord.lower(),
+        )
+    ).all()
+    for equipe in equipes_usuarios:
         equipe_txt = limpar_texto(equipe, "")
         if not equipe_txt:
             continue
@@ -1448,13 +1503,13 @@ def obter_equipes_por_coordenadoria(coordenadoria: Optional[str]) -> List[str]:
         vistos.add(chave)
         valores.append(equipe_txt)
 
-    equipes_processos = (
-        db.session.query(Processo.equipe_area)
-        .filter(Processo.equipe_area.isnot(None))
-        .filter(func.lower(Processo.coordenadoria) == coord.lower())
-        .all()
-    )
-    for (equipe,) in equipes_processos:
+    equipes_processos = db.session.scalars(
+        select(Processo.equipe_area).where(
+            Processo.equipe_area.isnot(None),
+            func.lower(Processo.coordenadoria) == coord.lower(),
+        )
+    ).all()
+    for equipe in equipes_processos:
         equipe_txt = limpar_texto(equipe, "")
         if not equipe_txt:
             continue
@@ -1986,6 +2041,19 @@ login_manager.login_view = "login"
 login_manager.login_message_category = "warning"
 
 
+@event.listens_for(Engine, "connect")
+def _configurar_conexao_sqlite(conexao_dbapi, _registro) -> None:
+    """Ativa WAL e sync NORMAL no SQLite para nao aguardar fsync completo a cada commit."""
+    if not isinstance(conexao_dbapi, sqlite3.Connection):
+        return
+    cursor = conexao_dbapi.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    finally:
+        cursor.close()
+
+
 # === Models ===
 # Os models abaixo concentram o estado persistido do sistema:
 # - Usuario controla autenticacao/permissoes
@@ -2028,6 +2096,17 @@ class Usuario(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
 
 
+def calcular_numero_sei_base(numero_sei: Optional[str], dados_extra: Optional[dict]) -> str:
+    """Numero SEI sem o prefixo da gerencia (ou valor original, se houver)."""
+    extras = dados_extra or {}
+    if extras.get("numero_sei_original"):
+        return str(extras["numero_sei_original"]).strip()
+    numero = (numero_sei or "").strip()
+    if "-" in numero:
+        return numero.split("-", 1)[1].strip()
+    return numero
+
+
 class Processo(db.Model):
     """Modelagem do processo cadastrado e movido entre gerencias."""
 
@@ -2083,13 +2162,7 @@ class Processo(db.Model):
     @property
     def numero_sei_base(self) -> str:
         """Numero SEI sem o prefixo da gerencia (ou valor original, se houver)."""
-        extras = self.dados_extra or {}
-        if extras.get("numero_sei_original"):
-            return str(extras["numero_sei_original"]).strip()
-        numero = (self.numero_sei or "").strip()
-        if "-" in numero:
-            return numero.split("-", 1)[1].strip()
-        return numero
+        return calcular_numero_sei_base(self.numero_sei, self.dados_extra)
 
     @property
     def classificacao_institucional(self) -> Optional[str]:
@@ -2154,6 +2227,16 @@ class ImportacaoTemp(db.Model):
     criado_em = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 
+class EsquemaVersao(db.Model):
+    """Registra a versao de esquema ja aplicada por garantir_colunas_extra."""
+
+    __tablename__ = "esquema_versao"
+
+    id = db.Column(db.Integer, primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class Notificacao(db.Model):
     """Avisos simples direcionados a um usuario."""
 
@@ -2862,6 +2945,10 @@ def normalizar_chave(valor: str) -> str:
     )
 
 
+# Concessionarias validas indexadas pela chave normalizada (lista fixa, montada uma vez).
+MAPA_CONCESSIONARIAS = {normalizar_chave(item): item for item in CONCESSIONARIAS if item}
+
+
 def normalizar_coluna_importacao(valor: str) -> str:
     """Normaliza cabecalhos de planilha para mapeamento de importacao."""
     base = normalizar_chave(valor)
@@ -2916,6 +3003,7 @@ def _limpar_cache_importacao() -> None:
                 os.remove(caminho)
             except OSError:
                 pass
+            _remover_dataframes_importacao(caminho)
     try:
         removidos = (
             ImportacaoTemp.query.filter(ImportacaoTemp.criado_em < limite)
@@ -2945,7 +3033,7 @@ def _localizar_arquivo_importacao(token: str) -> Optional[str]:
             if not os.path.isdir(base):
                 continue
             for nome in os.listdir(base):
-                if nome.startswith(prefixo):
+                if nome.startswith(prefixo) and ".parquet" not in nome:
                     return os.path.join(base, nome)
         except OSError:
             continue
@@ -3106,6 +3194,9 @@ def _remover_importacao_temp(token: str) -> None:
             os.remove(caminho_disco)
         except OSError:
             pass
+    for arquivo in (caminho, caminho_disco):
+        if arquivo:
+            _remover_dataframes_importacao(arquivo)
     try:
         ImportacaoTemp.query.filter_by(token=token).delete(synchronize_session=False)
         db.session.commit()
@@ -3113,6 +3204,75 @@ def _remover_importacao_temp(token: str) -> None:
         db.session.rollback()
 
 
+def _caminho_dataframe_importacao(caminho: str, sheet_name, header_index: int) -> str:
+    """Parquet com a planilha ja lida, salvo ao lado do upload (um por aba/cabecalho)."""
+    chave = hashlib.sha1(f"{sheet_name}|{header_index}".encode("utf-8")).hexdigest()[:12]
+    return f"{caminho}.{chave}.parquet"
+
+
+def _remover_dataframes_importacao(caminho: str) -> None:
+    """Remove os parquets (e temporarios) gerados para o upload."""
+    base, nome = os.path.split(caminho)
+    prefixo = f"{nome}."
+    try:
+        nomes = os.listdir(base or ".")
+    except OSError:
+        return
+    for item in nomes:
+        if item.startswith(prefixo) and ".parquet" in item:
+            try:
+                os.remove(os.path.join(base, item))
+            except OSError:
+                pass
+
+
+def _salvar_dataframe_importacao(caminho: str, sheet_name, header_index: int, kwargs: Dict[str, object]) -> None:
+    """Le a aba inteira e grava em parquet para a confirmacao nao reler o Excel."""
+    destino = _caminho_dataframe_importacao(caminho, sheet_name, header_index)
+    temporario = f"{destino}.tmp"
+    try:
+        df = pd.read_excel(caminho, sheet_name=sheet_name, header=header_index, **kwargs)
+        df.columns = [str(col) for col in df.columns]
+        df.to_parquet(temporario, index=False)
+        os.replace(temporario, destino)
+    except Exception as exc:
+        # Colunas com tipos mistos (ou pyarrow ausente) ficam sem parquet; a confirmacao rele o Excel.
+        logger.warning("Planilha da importacao nao foi salva em parquet: %s", exc)
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+    finally:
+        with _IMPORTACOES_LOCK:
+            _IMPORTACOES_EM_LEITURA.discard(destino)
+
+
+def _iniciar_leitura_importacao(caminho: str, sheet_name, header_index: int, kwargs: Dict[str, object]) -> None:
+    """Dispara a leitura completa em segundo plano, a menos que ja exista ou esteja rodando."""
+    destino = _caminho_dataframe_importacao(caminho, sheet_name, header_index)
+    with _IMPORTACOES_LOCK:
+        if destino in _IMPORTACOES_EM_LEITURA or os.path.exists(destino):
+            return
+        _IMPORTACOES_EM_LEITURA.add(destino)
+    threading.Thread(
+        target=_salvar_dataframe_importacao,
+        args=(caminho, sheet_name, header_index, kwargs),
+        name="importacao-parquet",
+        daemon=True,
+    ).start()
+
+
+def _carregar_dataframe_importacao(caminho: str, sheet_name, header_index: int) -> Optional[pd.DataFrame]:
+    """Recupera o DataFrame salvo quando aba e cabecalho sao os mesmos do mapeamento."""
+    destino = _caminho_dataframe_importacao(caminho, sheet_name, header_index)
+    if not os.path.exists(destino):
+        return None
+    try:
+        return pd.read_parquet(destino)
+    except Exception:
+        return None
+
+
 def _sugerir_mapeamento_importacao(colunas: List[str]) -> Dict[str, str]:
     """Gera sugestao de mapeamento com base nos nomes das colunas."""
     mapeamento = {
@@ -3244,13 +3404,22 @@ def _garantir_dependencia_excel(engine: Optional[str]) -> Optional[str]:
     return None
 
 
+def _calamine_disponivel() -> bool:
+    """Indica se o leitor python-calamine (bem mais rapido que openpyxl) esta instalado."""
+    try:
+        import python_calamine  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
 def _excel_engine_para(caminho: str) -> Optional[str]:
     """Define o engine do pandas para leitura de Excel pelo sufixo do arquivo."""
     ext = os.path.splitext(str(caminho or ""))[1].lower()
     if ext == ".xls":
         return "xlrd"
     if ext in {".xlsx", ".xlsm", ".xltx", ".xltm"}:
-        return "openpyxl"
+        return "calamine" if _calamine_disponivel() else "openpyxl"
     return None
 
 
@@ -3325,10 +3494,21 @@ def limpar_texto(valor, default: str = "") -> str:
 
 def normalizar_gerencia(valor, *, permitir_entrada: bool = False) -> Optional[str]:
     """Converte nomes livres de gerencia para os codigos aceitos pelo sistema."""
-    nome = limpar_texto(valor)
-    if not nome:
-        return None
+    if isinstance(valor, str):
+        # Caminho comum (texto bruto do banco): mesma limpeza de limpar_texto, sem pd.isna.
+        nome = valor.strip()
+        if nome.upper() in {"", "NAN", "NAT"}:
+            return None
+    else:
+        nome = limpar_texto(valor)
+        if not nome:
+            return None
+    return _normalizar_nome_gerencia(nome, permitir_entrada)
 
+
+@lru_cache(maxsize=512)
+def _normalizar_nome_gerencia(nome: str, permitir_entrada: bool) -> Optional[str]:
+    # Resultado depende so do texto limpo; planilhas e listagens repetem poucos nomes.
     ascii_nome = (
         unicodedata.normalize("NFKD", nome)
         .encode("ascii", "ignore")
@@ -3406,6 +3586,160 @@ def gerar_chave_relacionamento_numero(numero_base: str, chave_processo: Optional
     return f"base:{base}"
 
 
+def filtrar_consulta_por_numero_base(consulta, numero_base: str):
+    """Pre-filtra no SQL os candidatos que podem ter o numero base informado."""
+    # numero_sei_base e uma propriedade Python (numero_sei_original ou sufixo do numero SEI);
+    # o LIKE abaixo e um superconjunto seguro e a comparacao exata fica com o chamador.
+    variantes_json = {json.dumps(numero_base)[1:-1], numero_base}
+    dados_extra_txt = cast(Processo.dados_extra, db.Text)
+    return consulta.filter(
+        or_(
+            Processo.numero_sei.contains(numero_base, autoescape=True),
+            *[dados_extra_txt.contains(variante, autoescape=True) for variante in variantes_json],
+        )
+    )
+
+
+def listar_processos_por_numero_base(
+    numero_base: str,
+    *,
+    ignorar_ids: Optional[Iterable[int]] = None,
+) -> List["Processo"]:
+    """Retorna os processos cujo numero base coincide exatamente com o informado."""
+    if not numero_base:
+        return []
+    ignorar = set(ignorar_ids or ())
+    if _expressao_numero_sei_base() is not None:
+        # Comparacao exata no SQL (mesma busca em lote de agrupar_processos_por_numeros_base).
+        processos = agrupar_processos_por_numeros_base([numero_base]).get(numero_base, [])
+        return [p for p in processos if p.id not in ignorar]
+    # Bancos sem expressao para o numero base: LIKE como superconjunto e comparacao em Python.
+    consulta = filtrar_consulta_por_numero_base(Processo.query, numero_base)
+    if ignorar:
+        consulta = consulta.filter(~Processo.id.in_(ignorar))
+    return [p for p in consulta.all() if p.numero_sei_base == numero_base]
+
+
+def _partes_numero_sei_base():
+    """numero_sei_original e sufixo apos o primeiro hifen, como expressoes SQL (None sem suporte)."""
+    dialeto = db.engine.dialect.name
+    if dialeto == "postgresql":
+        # Cast para JSONB quando a coluna e TEXT (bases legadas); ->> direto falharia.
+        original = _dados_extra_json_postgres()["numero_sei_original"].astext
+        posicao_hifen = func.strpos(Processo.numero_sei, "-")
+    elif dialeto == "sqlite":
+        original = cast(func.json_extract(Processo.dados_extra, "$.numero_sei_original"), db.Text)
+        posicao_hifen = func.instr(Processo.numero_sei, "-")
+    else:
+        return None
+    sufixo = case(
+        (posicao_hifen > 0, func.substr(Processo.numero_sei, posicao_hifen + 1)),
+        else_=Processo.numero_sei,
+    )
+    return original, sufixo
+
+
+def _expressao_numero_sei_base():
+    """Numero SEI base calculado no SQL, com a mesma regra de calcular_numero_sei_base."""
+    partes = _partes_numero_sei_base()
+    if partes is None:
+        return None
+    original, sufixo = partes
+    return func.coalesce(func.nullif(func.trim(original), ""), func.trim(sufixo))
+
+
+# Quantidade de numeros base por IN nas consultas em lotes.
+LOTE_NUMEROS_BASE = 500
+
+
+def _consultar_em_lotes(consulta, bases: List[str], montar_condicao):
+    """Executa a consulta filtrada por lotes de numeros base; sem condicao, devolve tudo."""
+    if montar_condicao is None:
+        yield from consulta.all()
+        return
+    for inicio in range(0, len(bases), LOTE_NUMEROS_BASE):
+        yield from consulta.filter(
+            montar_condicao(bases[inicio:inicio + LOTE_NUMEROS_BASE])
+        ).all()
+
+
+def _consultar_candidatos_numero_base(consulta, bases: List[str]):
+    """Executa a consulta restrita aos candidatos dos numeros base (em minusculas), em lotes do IN."""
+    # numero_sei_original, sufixo apos o hifen ou numero inteiro (prefixo que nao e gerencia):
+    # superconjunto das regras em Python, que continuam decidindo o resultado final.
+    partes = _partes_numero_sei_base()
+    montar_condicao = None
+    if partes is not None:
+        expressoes = [
+            func.lower(func.trim(expressao)) for expressao in (*partes, Processo.numero_sei)
+        ]
+
+        def montar_condicao(lote):
+            return or_(*[expressao.in_(lote) for expressao in expressoes])
+
+    return _consultar_em_lotes(consulta, bases, montar_condicao)
+
+
+def _condicao_dados_extra_com_chave(chave: str):
+    """Condicao SQL de dados_extra contendo a chave (None quando o banco nao permite)."""
+    dialeto = db.engine.dialect.name
+    if dialeto == "postgresql":
+        return cast(Processo.dados_extra, postgresql.JSONB).has_key(chave)
+    if dialeto == "sqlite":
+        caminho = '$."' + chave.replace('"', '""') + '"'
+        return func.json_type(Processo.dados_extra, caminho).isnot(None)
+    return None
+
+
+def _consultar_por_numeros_base(consulta, bases: List[str]):
+    """Executa a consulta restrita aos numeros base informados, em lotes do IN."""
+    expressao = _expressao_numero_sei_base()
+    montar_condicao = expressao.in_ if expressao is not None else None
+    return _consultar_em_lotes(consulta, bases, montar_condicao)
+
+
+def agrupar_processos_por_numeros_base(numeros_base: Iterable[str]) -> Dict[str, List["Processo"]]:
+    """Busca os processos de varios numeros base de uma vez, agrupados pelo numero base."""
+    bases = sorted({base for base in numeros_base if base})
+    agrupados: Dict[str, List[Processo]] = {}
+    if not bases:
+        return agrupados
+    # A comparacao final em Python garante o mesmo resultado da propriedade numero_sei_base.
+    bases_validas = set(bases)
+    for item in _consultar_por_numeros_base(Processo.query.order_by(Processo.id), bases):
+        base_item = item.numero_sei_base
+        if base_item in bases_validas:
+            agrupados.setdefault(base_item, []).append(item)
+    return agrupados
+
+
+def obter_chaves_referencia_por_numeros_base(numeros_base: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Chave de relacionamento de cada numero base, lendo apenas as colunas necessarias."""
+    bases = sorted({base for base in numeros_base if base})
+    if not bases:
+        return {}
+    consulta = db.session.query(
+        Processo.numero_sei, Processo.dados_extra, Processo.finalizado_em
+    ).order_by(Processo.id)
+    bases_validas = set(bases)
+    # Uma passada agrupando direto as chaves (ativas e todas) de cada numero base.
+    chaves_por_base: Dict[str, Tuple[Set[str], Set[str]]] = {}
+    for linha in _consultar_por_numeros_base(consulta, bases):
+        base_item = calcular_numero_sei_base(linha.numero_sei, linha.dados_extra)
+        if base_item not in bases_validas:
+            continue
+        chaves_ativas, chaves = chaves_por_base.setdefault(base_item, (set(), set()))
+        chave = obter_chave_processo_em_dados(linha.dados_extra or {})
+        if chave:
+            chaves.add(chave)
+            if linha.finalizado_em is None:
+                chaves_ativas.add(chave)
+    return {
+        base_item: _resolver_chave_referencia(chaves_ativas, chaves)
+        for base_item, (chaves_ativas, chaves) in chaves_por_base.items()
+    }
+
+
 def processo_pertence_mesmo_grupo(
     item: "Processo",
     *,
@@ -3426,21 +3760,22 @@ def obter_chave_referencia_unica_por_base(relacionados: List["Processo"]) -> Opt
     """Define chave de relacionamento quando existe apenas uma para o numero base."""
     if not relacionados:
         return None
-    chaves_ativas = {
-        obter_chave_processo_relacional(item)
-        for item in relacionados
-        if item.finalizado_em is None
-    }
-    chaves_ativas.discard(None)
-    if len(chaves_ativas) == 1:
-        return next(iter(chaves_ativas))
-    if len(chaves_ativas) > 1:
-        return None
-    chaves = {obter_chave_processo_relacional(item) for item in relacionados}
-    chaves.discard(None)
-    if len(chaves) == 1:
-        return next(iter(chaves))
-    return None
+    chaves_ativas: Set[str] = set()
+    chaves: Set[str] = set()
+    for item in relacionados:
+        chave = obter_chave_processo_relacional(item)
+        if chave:
+            chaves.add(chave)
+            if item.finalizado_em is None:
+                chaves_ativas.add(chave)
+    return _resolver_chave_referencia(chaves_ativas, chaves)
+
+
+def _resolver_chave_referencia(chaves_ativas: Set[str], chaves: Set[str]) -> Optional[str]:
+    # Prioriza a chave unica entre os ativos; sem ativos com chave, a unica entre todos.
+    if chaves_ativas:
+        return next(iter(chaves_ativas)) if len(chaves_ativas) == 1 else None
+    return next(iter(chaves)) if len(chaves) == 1 else None
 
 
 def gerar_nova_chave_processo(numero_base: str) -> str:
@@ -3452,8 +3787,15 @@ def gerar_nova_chave_processo(numero_base: str) -> str:
     return f"{base}-{carimbo}-{secrets.token_hex(4)}"
 
 
-def analisar_numero_para_cadastro(numero_informado: str) -> Dict[str, object]:
-    """Inspeciona se ha demandas ativas/finalizadas para o numero informado."""
+def analisar_numero_para_cadastro(
+    numero_informado: str,
+    *,
+    relacionados: Optional[List["Processo"]] = None,
+) -> Dict[str, object]:
+    """Inspeciona se ha demandas ativas/finalizadas para o numero informado.
+
+    relacionados permite reaproveitar a lista ja buscada do mesmo numero base.
+    """
     numero_base = extrair_numero_base_sei(numero_informado)
     resultado: Dict[str, object] = {
         "numero_base": numero_base,
@@ -3468,7 +3810,8 @@ def analisar_numero_para_cadastro(numero_informado: str) -> Dict[str, object]:
     if not numero_base or SITE_EM_CONFIGURACAO:
         return resultado
 
-    relacionados = [p for p in Processo.query.all() if p.numero_sei_base == numero_base]
+    if relacionados is None:
+        relacionados = listar_processos_por_numero_base(numero_base)
     ativos = [p for p in relacionados if not p.finalizado_em]
     finalizados = [p for p in relacionados if p.finalizado_em]
 
@@ -3551,6 +3894,24 @@ def parse_date(valor) -> Optional[date]:
     return None
 
 
+def _parse_iso_datetime(valor: Optional[str]) -> Optional[datetime]:
+    """Converte texto ISO (como gravado na serializacao de processos) em datetime."""
+    if not valor or not isinstance(valor, str):
+        return None
+    return _converter_iso_datetime(valor)
+
+
+@lru_cache(maxsize=8192)
+def _converter_iso_datetime(valor: str) -> Optional[datetime]:
+    # O mesmo finalizado_em/data de movimentacao e convertido varias vezes nas chaves de
+    # ordenacao dos relatorios; datetime e imutavel, entao o resultado pode ser reaproveitado.
+    # O limite cobre finalizado_em e as datas de movimentacao de um relatorio completo.
+    try:
+        return datetime.fromisoformat(valor)
+    except ValueError:
+        return None
+
+
 DATE_FILTER_FROM_PREFIX = "__date_from__:"
 DATE_FILTER_TO_PREFIX = "__date_to__:"
 DATE_FILTER_SLUGS = {
@@ -3631,8 +3992,14 @@ def data_entrada_na_gerencia(processo: "Processo", gerencia: Optional[str]) -> O
     return processo.criado_em.date() if processo.criado_em else None
 
 
-def ordenar_gerencias_preferencial(origem: List[str]) -> List[str]:
+def ordenar_gerencias_preferencial(origem: Iterable[str]) -> List[str]:
     """Ordena gerencias na ordem visual padrao: GABINETE, GEPER, GEDEX, GEFOR."""
+    return list(_ordenar_gerencias_preferencial(tuple(origem)))
+
+
+@lru_cache(maxsize=256)
+def _ordenar_gerencias_preferencial(origem: Tuple[str, ...]) -> Tuple[str, ...]:
+    # As listas de gerencias se repetem muito entre processos de uma mesma pagina.
     vistos = set()
     unicas: List[str] = []
     for nome in origem:
@@ -3646,15 +4013,17 @@ def ordenar_gerencias_preferencial(origem: List[str]) -> List[str]:
             continue
         vistos.add(chave)
         unicas.append(texto)
-    return sorted(
-        unicas,
-        key=lambda nome: (
-            ORDEM_GERENCIAS.get(
-                normalizar_gerencia(nome, permitir_entrada=True) or str(nome).strip().upper(),
-                999,
+    return tuple(
+        sorted(
+            unicas,
+            key=lambda nome: (
+                ORDEM_GERENCIAS.get(
+                    normalizar_gerencia(nome, permitir_entrada=True) or str(nome).strip().upper(),
+                    999,
+                ),
+                str(nome).strip().upper(),
             ),
-            str(nome).strip().upper(),
-        ),
+        )
     )
 
 
@@ -3763,11 +4132,17 @@ def sincronizar_atribuicao_responsavel_equipe(
 
 def coletar_valores_distintos(coluna) -> List[str]:
     """Retorna valores unicos de uma coluna textual para uso em filtros."""
-    resultados = db.session.query(coluna).filter(coluna.isnot(None)).all()
-    valores = {limpar_texto(resultado[0]) for resultado in resultados if limpar_texto(resultado[0])}
+    resultados = db.session.scalars(select(coluna).where(coluna.isnot(None)))
+    valores = {texto for texto in map(limpar_texto, resultados) if texto}
     return sorted(valores, key=lambda texto: texto.upper())
 
 
+# Campos de data gravados como texto no snapshot das movimentacoes.
+CAMPOS_DATA_SNAPSHOT = ("data_status", "prazo_equipe", "prazo", "data_entrada", "data_entrada_geplan")
+# Tipos de movimentacao que registram a saida do processo de uma gerencia.
+TIPOS_MOVIMENTACAO_SAIDA_GERENCIA = frozenset({"finalizacao_gerencia", "movimentacao"})
+
+
 def _normalizar_snapshot(snapshot):
     """Garante que o snapshot salvo na movimentacao seja um dicionario."""
     if not snapshot:
@@ -3833,8 +4208,9 @@ def coletar_gerencias_envolvidas(processo: Processo) -> List[str]:
 
     def registrar(nome: Optional[str]) -> None:
         for texto in iterar_gerencias(nome):
-            slug = texto.upper()
-            if slug in {"FINALIZADO", "SAIDA", "ENTRADA", "CADASTRO"} or slug in vistos:
+            # Vocabulario pequeno e fechado: internar evita alocar o mesmo slug a cada chamada.
+            slug = sys.intern(texto.upper())
+            if slug in GERENCIAS_FORA_TRILHA or slug in vistos:
                 continue
             vistos.add(slug)
             trilha.append(texto)
@@ -3855,57 +4231,93 @@ def coletar_gerencias_envolvidas(processo: Processo) -> List[str]:
     return ordenar_gerencias_preferencial(trilha)
 
 
-def capturar_estado_historico_processo(processo: Processo) -> Dict[str, str]:
+@dataclass(frozen=True, slots=True)
+class ResumoProcessoSaida:
+    """Colunas de um processo da SAIDA usadas para agrupar e paginar as demandas."""
+
+    id: int
+    numero_sei_base: str
+    dados_extra: Optional[dict]
+    atualizado_em: Optional[datetime]
+    criado_em: Optional[datetime]
+
+
+@dataclass(frozen=True, slots=True)
+class EstadoHistoricoProcesso:
+    """Valores textuais dos campos comparados para registrar edicoes no historico."""
+
+    prazo: str
+    concessionaria: str
+    responsavel_adm: str
+    observacao: str
+    descricao_melhorada: str
+    coordenadoria: str
+    equipe_area: str
+    responsavel_equipe: str
+    tipo_processo: str
+    palavras_chave: str
+    status: str
+    prazo_equipe: str
+    observacoes_complementares: str
+    tramitado_para: str
+    classificacao_institucional: str
+    dados_extra: str
+
+
+def capturar_estado_historico_processo(processo: Processo) -> EstadoHistoricoProcesso:
     """Captura campos relevantes para detectar alteracoes de edicao."""
     def _fmt_data(valor: Optional[date]) -> str:
         return valor.isoformat() if valor else ""
 
-    return {
-        "prazo": _fmt_data(processo.prazo),
-        "concessionaria": processo.concessionaria or "",
-        "responsavel_adm": processo.responsavel_adm or "",
-        "observacao": processo.observacao or "",
-        "descricao_melhorada": processo.descricao_melhorada or "",
-        "coordenadoria": processo.coordenadoria or "",
-        "equipe_area": processo.equipe_area or "",
-        "responsavel_equipe": processo.responsavel_equipe or "",
-        "tipo_processo": processo.tipo_processo or "",
-        "palavras_chave": processo.palavras_chave or "",
-        "status": processo.status or "",
-        "prazo_equipe": _fmt_data(processo.prazo_equipe),
-        "observacoes_complementares": processo.observacoes_complementares or "",
-        "tramitado_para": processo.tramitado_para or "",
-        "classificacao_institucional": processo.classificacao_institucional or "",
-        "dados_extra": json.dumps(processo.dados_extra or {}, ensure_ascii=False, sort_keys=True),
-    }
+    return EstadoHistoricoProcesso(
+        prazo=_fmt_data(processo.prazo),
+        concessionaria=processo.concessionaria or "",
+        responsavel_adm=processo.responsavel_adm or "",
+        observacao=processo.observacao or "",
+        descricao_melhorada=processo.descricao_melhorada or "",
+        coordenadoria=processo.coordenadoria or "",
+        equipe_area=processo.equipe_area or "",
+        responsavel_equipe=processo.responsavel_equipe or "",
+        tipo_processo=processo.tipo_processo or "",
+        palavras_chave=processo.palavras_chave or "",
+        status=processo.status or "",
+        prazo_equipe=_fmt_data(processo.prazo_equipe),
+        observacoes_complementares=processo.observacoes_complementares or "",
+        tramitado_para=processo.tramitado_para or "",
+        classificacao_institucional=processo.classificacao_institucional or "",
+        dados_extra=json.dumps(processo.dados_extra or {}, ensure_ascii=False, sort_keys=True),
+    )
+
+
+# Pares (campo, rotulo) na ordem em que as mudancas aparecem no historico.
+_HISTORICO_LABELS: Tuple[Tuple[str, str], ...] = (
+    ("prazo", "Prazo SUROD"),
+    ("concessionaria", "Concessionária"),
+    ("responsavel_adm", "Responsavel ADM"),
+    ("observacao", "Observacao"),
+    ("descricao_melhorada", "Descrição melhorada"),
+    ("coordenadoria", "Coordenadoria"),
+    ("equipe_area", "Equipe/Area"),
+    ("responsavel_equipe", "Responsável da equipe"),
+    ("tipo_processo", "Tipo de processo"),
+    ("palavras_chave", "Palavras-chave"),
+    ("status", "Status"),
+    ("prazo_equipe", "Prazo equipe"),
+    ("observacoes_complementares", "Observações complementares"),
+    ("tramitado_para", "Tramitado para"),
+    ("classificacao_institucional", "Classificacao institucional"),
+    ("dados_extra", "Campos extras"),
+)
 
 
 def descrever_mudancas_historico(
-    estado_antes: Dict[str, str], estado_depois: Dict[str, str]
+    estado_antes: EstadoHistoricoProcesso, estado_depois: EstadoHistoricoProcesso
 ) -> List[str]:
     """Retorna lista textual de mudancas para auditoria no historico."""
-    labels = {
-        "prazo": "Prazo SUROD",
-        "concessionaria": "Concessionária",
-        "responsavel_adm": "Responsavel ADM",
-        "observacao": "Observacao",
-        "descricao_melhorada": "Descrição melhorada",
-        "coordenadoria": "Coordenadoria",
-        "equipe_area": "Equipe/Area",
-        "responsavel_equipe": "Responsável da equipe",
-        "tipo_processo": "Tipo de processo",
-        "palavras_chave": "Palavras-chave",
-        "status": "Status",
-        "prazo_equipe": "Prazo equipe",
-        "observacoes_complementares": "Observações complementares",
-        "tramitado_para": "Tramitado para",
-        "classificacao_institucional": "Classificacao institucional",
-        "dados_extra": "Campos extras",
-    }
     mudancas: List[str] = []
-    for chave, label in labels.items():
-        antes = (estado_antes.get(chave) or "").strip()
-        depois = (estado_depois.get(chave) or "").strip()
+    for chave, label in _HISTORICO_LABELS:
+        antes = getattr(estado_antes, chave).strip()
+        depois = getattr(estado_depois, chave).strip()
         if antes == depois:
             continue
         if chave == "dados_extra":
@@ -3946,6 +4358,90 @@ def _substituir_termo_processo(texto: str, termo: str) -> str:
     return texto
 
 
+def _texto_evento_cadastro(
+    usuario: str, de: str, para: str, motivo: str, termo: str, gerencia_criacao: Optional[str]
+) -> str:
+    ger = para if para and para != "-" else (gerencia_criacao or "-")
+    termo_cadastro = _termo_por_gerencia(ger, "cadastro")
+    acao = _flexao_acao(termo_cadastro, "cadastrado", "cadastrada")
+    envio = _flexao_acao(termo_cadastro, "enviado", "enviada")
+    return (
+        f"{termo_cadastro} {acao} por {usuario} e {envio} para {ger}."
+    )
+
+
+def _texto_evento_finalizacao_gerencia(
+    usuario: str, de: str, para: str, motivo: str, termo: str, gerencia_criacao: Optional[str]
+) -> str:
+    acao = _flexao_acao(termo, "finalizado", "finalizada")
+    envio = _flexao_acao(termo, "enviado", "enviada")
+    return (
+        f"{termo} {acao} em {de} por {usuario} e {envio} para {para}."
+    )
+
+
+def _texto_evento_finalizado_geral(
+    usuario: str, de: str, para: str, motivo: str, termo: str, gerencia_criacao: Optional[str]
+) -> str:
+    return f"Processo encerrado em {de} por {usuario}."
+
+
+def _texto_evento_edicao(
+    usuario: str, de: str, para: str, motivo: str, termo: str, gerencia_criacao: Optional[str]
+) -> str:
+    acao = _flexao_acao(termo, "editado", "editada")
+    alteracoes = f" Alteracoes: {motivo}." if motivo else ""
+    return f"{termo} {acao} na gerencia {de} por {usuario}.{alteracoes}"
+
+
+def _texto_evento_status(
+    usuario: str, de: str, para: str, motivo: str, termo: str, gerencia_criacao: Optional[str]
+) -> str:
+    sujeito = "do processo" if termo == "Processo" else "da demanda"
+    return (
+        f"Status {sujeito} atualizado na gerencia {de} para: "
+        f"{motivo or '-'} por {usuario}."
+    )
+
+
+def _texto_evento_atribuicao(
+    usuario: str, de: str, para: str, motivo: str, termo: str, gerencia_criacao: Optional[str]
+) -> str:
+    if motivo:
+        return _substituir_termo_processo(motivo, termo)
+    acao = _flexao_acao(termo, "atribuido", "atribuida")
+    return f"{termo} {acao} na gerencia {de} por {usuario}."
+
+
+def _texto_evento_devolucao_gabinete(
+    usuario: str, de: str, para: str, motivo: str, termo: str, gerencia_criacao: Optional[str]
+) -> str:
+    acao = _flexao_acao(termo, "devolvido", "devolvida")
+    return (
+        f"{termo} {acao} para {GERENCIA_ALIAS_GABINETE} por {usuario}. Motivo: {motivo or '-'}."
+    )
+
+
+def _texto_evento_movimentacao(
+    usuario: str, de: str, para: str, motivo: str, termo: str, gerencia_criacao: Optional[str]
+) -> str:
+    acao = _flexao_acao(termo, "movido", "movida")
+    complemento = f" Motivo: {motivo}." if motivo else ""
+    return f"{termo} {acao} de {de} para {para} por {usuario}.{complemento}"
+
+
+# Tipos de movimentacao sem entrada aqui usam o texto padrao de movimentacao.
+_TEXTOS_EVENTO_HISTORICO = {
+    "cadastro": _texto_evento_cadastro,
+    "finalizacao_gerencia": _texto_evento_finalizacao_gerencia,
+    "finalizado_geral": _texto_evento_finalizado_geral,
+    "edicao": _texto_evento_edicao,
+    "status": _texto_evento_status,
+    "atribuicao": _texto_evento_atribuicao,
+    "devolucao_gabinete": _texto_evento_devolucao_gabinete,
+}
+
+
 def montar_texto_evento_historico(
     mov: "Movimentacao", *, gerencia_criacao: Optional[str] = None
 ) -> str:
@@ -3956,51 +4452,8 @@ def montar_texto_evento_historico(
     para = mov.para_gerencia or "-"
     motivo = (mov.motivo or "").strip()
     termo = _termo_por_gerencia(de, tipo)
-
-    if tipo == "cadastro":
-        ger = para if para and para != "-" else (gerencia_criacao or "-")
-        termo_cadastro = _termo_por_gerencia(ger, tipo)
-        acao = _flexao_acao(termo_cadastro, "cadastrado", "cadastrada")
-        envio = _flexao_acao(termo_cadastro, "enviado", "enviada")
-        return (
-            f"{termo_cadastro} {acao} por {usuario} e {envio} para {ger}."
-        )
-    if tipo == "finalizacao_gerencia":
-        acao = _flexao_acao(termo, "finalizado", "finalizada")
-        envio = _flexao_acao(termo, "enviado", "enviada")
-        return (
-            f"{termo} {acao} em {de} por {usuario} e {envio} para {para}."
-        )
-    if tipo == "finalizado_geral":
-        return f"Processo encerrado em {de} por {usuario}."
-    if tipo == "edicao":
-        acao = _flexao_acao(termo, "editado", "editada")
-        texto = f"{termo} {acao} na gerencia {de} por {usuario}."
-        if motivo:
-            texto += f" Alteracoes: {motivo}."
-        return texto
-    if tipo == "status":
-        sujeito = "do processo" if termo == "Processo" else "da demanda"
-        return (
-            f"Status {sujeito} atualizado na gerencia {de} para: "
-            f"{motivo or '-'} por {usuario}."
-        )
-    if tipo == "atribuicao":
-        if motivo:
-            return _substituir_termo_processo(motivo, termo)
-        acao = _flexao_acao(termo, "atribuido", "atribuida")
-        return f"{termo} {acao} na gerencia {de} por {usuario}."
-    if tipo == "devolucao_gabinete":
-        acao = _flexao_acao(termo, "devolvido", "devolvida")
-        return (
-            f"{termo} {acao} para {GERENCIA_ALIAS_GABINETE} por {usuario}. Motivo: {motivo or '-'}."
-        )
-
-    acao = _flexao_acao(termo, "movido", "movida")
-    texto = f"{termo} {acao} de {de} para {para} por {usuario}."
-    if motivo:
-        texto += f" Motivo: {motivo}."
-    return texto
+    montar_texto = _TEXTOS_EVENTO_HISTORICO.get(tipo, _texto_evento_movimentacao)
+    return montar_texto(usuario, de, para, motivo, termo, gerencia_criacao)
 
 
 def coletar_gerencias_com_demanda_por_base(
@@ -4013,9 +4466,8 @@ def coletar_gerencias_com_demanda_por_base(
     if not numero_base:
         return []
 
-    ignorar = set(ignorar_ids or set())
     gerencias = set()
-    relacionados = [p for p in Processo.query.all() if p.id not in ignorar]
+    relacionados = listar_processos_por_numero_base(numero_base, ignorar_ids=ignorar_ids)
 
     for item in relacionados:
         if not processo_pertence_mesmo_grupo(
@@ -4026,15 +4478,39 @@ def coletar_gerencias_com_demanda_por_base(
             continue
         for ger in coletar_gerencias_envolvidas(item):
             ger_norm = normalizar_gerencia(ger, permitir_entrada=True)
-            if ger_norm and ger_norm not in {"SAIDA", "FINALIZADO", "ENTRADA", "CADASTRO"}:
+            if ger_norm and ger_norm not in GERENCIAS_FORA_TRILHA:
                 gerencias.add(ger_norm)
         ger_atual = normalizar_gerencia(item.gerencia, permitir_entrada=True)
-        if ger_atual and ger_atual not in {"SAIDA", "FINALIZADO", "ENTRADA", "CADASTRO"}:
+        if ger_atual and ger_atual not in GERENCIAS_FORA_TRILHA:
             gerencias.add(ger_atual)
 
     return ordenar_gerencias_preferencial(list(gerencias))
 
 
+def carregar_relacionamentos_processos(processos: Iterable[Processo]) -> None:
+    """Carrega em lote movimentacoes e responsavel atribuido dos processos informados."""
+    # Uma consulta para os processos e outra para todas as movimentacoes, em vez de
+    # uma consulta por processo no primeiro acesso a cada relacionamento.
+    ids = list(
+        {
+            processo.id
+            for processo in processos
+            if processo.id is not None
+            and {"movimentacoes", "assigned_to"} & inspect(processo).unloaded
+        }
+    )
+    if not ids:
+        return
+    (
+        Processo.query.options(
+            selectinload(Processo.movimentacoes),
+            joinedload(Processo.assigned_to),
+        )
+        .filter(Processo.id.in_(ids))
+        .all()
+    )
+
+
 def obter_origem_saida(processo: Processo) -> Optional[str]:
     """Retorna a gerencia de origem que enviou o processo para SAIDA."""
     movs = sorted(
@@ -4047,11 +4523,152 @@ def obter_origem_saida(processo: Processo) -> Optional[str]:
     return processo.gerencia
 
 
+def obter_origens_saida(processos: Iterable[Processo]) -> Dict[int, Optional[str]]:
+    """Versao em lote de obter_origem_saida, indexada pelo id do processo."""
+    origens: Dict[int, Optional[str]] = {}
+    pendentes: Dict[int, Processo] = {}
+    for processo in processos:
+        if "movimentacoes" in inspect(processo).unloaded:
+            pendentes[processo.id] = processo
+        else:
+            origens[processo.id] = obter_origem_saida(processo)
+    if not pendentes:
+        return origens
+    # Sem movimentacoes carregadas, busca so as entradas em SAIDA em uma consulta leve
+    # por lote; em empate de data vale a de maior id, como na versao por processo.
+    ultimas: Dict[int, Tuple[Optional[str], datetime]] = {}
+    ids = list(pendentes)
+    for inicio in range(0, len(ids), 500):
+        linhas = (
+            db.session.query(Movimentacao.processo_id, Movimentacao.de_gerencia, Movimentacao.criado_em)
+            .filter(
+                Movimentacao.processo_id.in_(ids[inicio:inicio + 500]),
+                Movimentacao.para_gerencia == "SAIDA",
+            )
+            .order_by(Movimentacao.id)
+            .all()
+        )
+        for processo_id, de_gerencia, criado_em in linhas:
+            criado_em = criado_em or datetime.min
+            atual = ultimas.get(processo_id)
+            if atual is None or criado_em >= atual[1]:
+                ultimas[processo_id] = (de_gerencia, criado_em)
+    for processo_id, processo in pendentes.items():
+        ultima = ultimas.get(processo_id)
+        origens[processo_id] = (ultima[0] if ultima else None) or processo.gerencia
+    return origens
+
+
+def listar_ids_finalizados_fora_da_gerencia(gerencia: str) -> Set[int]:
+    """Ids finalizados na gerencia ou enviados dela para SAIDA, exceto os devolvidos ainda ativos."""
+    # Uma unica consulta agrupada por processo substitui as cinco (tres em movimentacoes e duas
+    # de conferencia do estado atual) que montavam as mesmas listas.
+    enviado_saida = and_(
+        Movimentacao.de_gerencia == gerencia,
+        Movimentacao.para_gerencia == "SAIDA",
+        Processo.gerencia == "SAIDA",
+    )
+    finalizado_gerencia = and_(
+        Movimentacao.de_gerencia == gerencia,
+        Movimentacao.tipo == "finalizacao_gerencia",
+    )
+    devolvido_ativo = and_(
+        Movimentacao.de_gerencia == "SAIDA",
+        Movimentacao.para_gerencia != "SAIDA",
+        Movimentacao.tipo == "movimentacao",
+        Processo.gerencia != "SAIDA",
+        Processo.finalizado_em.is_(None),
+    )
+    linhas = (
+        db.session.query(
+            Movimentacao.processo_id,
+            func.max(case((or_(enviado_saida, finalizado_gerencia), 1), else_=0)),
+            func.max(case((devolvido_ativo, 1), else_=0)),
+        )
+        .join(Processo, Processo.id == Movimentacao.processo_id)
+        .filter(or_(enviado_saida, finalizado_gerencia, devolvido_ativo))
+        .group_by(Movimentacao.processo_id)
+        .all()
+    )
+    return {processo_id for processo_id, candidato, devolvido in linhas if candidato and not devolvido}
+
+
+# Cache por processo da serializacao do painel de finalizados. Cada entrada guarda uma
+# assinatura barata (datas, atribuicao e ultima movimentacao) usada para detectar
+# alteracoes; snapshots de movimentacao nao sao editados depois de gravados.
+SERIALIZACAO_RELATORIO_CACHE_MAX = 2048
+_SERIALIZACAO_RELATORIO_CACHE: "OrderedDict[int, Tuple[tuple, Dict[str, object]]]" = OrderedDict()
+_SERIALIZACAO_RELATORIO_LOCK = threading.Lock()
+
+
+def _assinatura_serializacao_relatorio(processo: Processo) -> tuple:
+    """Resume o estado do processo que afeta a serializacao do relatorio."""
+    movimentacoes = processo.movimentacoes
+    responsavel = processo.assigned_to
+    return (
+        processo.finalizado_em,
+        processo.atualizado_em,
+        processo.assigned_to_id,
+        responsavel.username if responsavel else None,
+        len(movimentacoes),
+        max((mov.criado_em for mov in movimentacoes if mov.criado_em), default=None),
+    )
+
+
+def _copiar_serializacao_relatorio(dados: Dict[str, object]) -> Dict[str, object]:
+    """Copia o nivel de cima: os chamadores so reatribuem chaves, o resto e somente leitura."""
+    return dict(dados)
+
+
 def serializar_processo_para_relatorio(processo: Processo) -> Dict[str, object]:
     """Transforma o processo em estrutura serializavel para o painel de finalizados."""
+    if processo.id is None:
+        return _montar_serializacao_relatorio(processo)
+    assinatura = _assinatura_serializacao_relatorio(processo)
+    with _SERIALIZACAO_RELATORIO_LOCK:
+        entrada = _SERIALIZACAO_RELATORIO_CACHE.get(processo.id)
+        if entrada and entrada[0] == assinatura:
+            _SERIALIZACAO_RELATORIO_CACHE.move_to_end(processo.id)
+            return _copiar_serializacao_relatorio(entrada[1])
+    dados = _montar_serializacao_relatorio(processo)
+    with _SERIALIZACAO_RELATORIO_LOCK:
+        _SERIALIZACAO_RELATORIO_CACHE[processo.id] = (assinatura, dados)
+        _SERIALIZACAO_RELATORIO_CACHE.move_to_end(processo.id)
+        while len(_SERIALIZACAO_RELATORIO_CACHE) > SERIALIZACAO_RELATORIO_CACHE_MAX:
+            _SERIALIZACAO_RELATORIO_CACHE.popitem(last=False)
+    return _copiar_serializacao_relatorio(dados)
+
+
+def trilha_gerencias_relatorio(base: Dict[str, object]) -> List[str]:
+    """Trilha de gerencias de um processo serializado, sem repeticoes e na ordem preferencial."""
+    # Passada unica por trilha, gerencias escolhidas, gerencia atual e movimentacoes:
+    # descarta vazios e gerencias fora da trilha e remove repetidas (sem diferenciar caixa).
+    dados_extra = base.get("dados_extra") or {}
+    escolhidas = (dados_extra.get("gerencias_escolhidas") or []) if isinstance(dados_extra, dict) else []
+    vistos: Set[str] = set()
+    unicas: List[str] = []
+    for nome in chain(
+        base.get("gerencias_involvidas") or [],
+        escolhidas,
+        (base.get("gerencia"),),
+        chain.from_iterable((mov.get("de"), mov.get("para")) for mov in base.get("movimentacoes") or []),
+    ):
+        if not nome:
+            continue
+        texto = str(nome).strip()
+        chave = texto.upper()
+        if not texto or chave in GERENCIAS_FORA_TRILHA or chave in vistos:
+            continue
+        vistos.add(chave)
+        unicas.append(texto)
+    return ordenar_gerencias_preferencial(unicas)
+
+
+def _montar_serializacao_relatorio(processo: Processo) -> Dict[str, object]:
+    """Monta a serializacao completa do processo (sem cache)."""
     movimentacoes = sorted(
         processo.movimentacoes,
-        key=lambda mov: mov.criado_em or datetime.min,
+        key=lambda mov: mov.criado_em or _DATA_HORA_MINIMA,
     )
     gerencias_trilha = coletar_gerencias_envolvidas(processo)
     gerencia_criacao = gerencias_trilha[0] if gerencias_trilha else (processo.gerencia or "-")
@@ -4059,13 +4676,18 @@ def serializar_processo_para_relatorio(processo: Processo) -> Dict[str, object]:
         processo.numero_sei_base,
         obter_chave_processo_relacional(processo),
     )
-    cadastro_mov = next(
-        (mov for mov in movimentacoes if (mov.tipo or "").strip().lower() == "cadastro"),
-        None,
-    )
+    # Uma unica passada localiza o cadastro e o primeiro usuario registrado.
+    cadastro_mov = None
+    primeiro_usuario = None
+    for mov in movimentacoes:
+        if cadastro_mov is None and (mov.tipo or "").strip().lower() == "cadastro":
+            cadastro_mov = mov
+        if primeiro_usuario is None and mov.usuario:
+            primeiro_usuario = mov.usuario
+        if cadastro_mov is not None and primeiro_usuario is not None:
+            break
     usuario_cadastro = cadastro_mov.usuario if cadastro_mov and cadastro_mov.usuario else None
-    if not usuario_cadastro and movimentacoes:
-        primeiro_usuario = next((mov.usuario for mov in movimentacoes if mov.usuario), None)
+    if not usuario_cadastro:
         usuario_cadastro = primeiro_usuario or None
     if not usuario_cadastro:
         usuario_cadastro = processo.finalizado_por or None
@@ -4079,41 +4701,43 @@ def serializar_processo_para_relatorio(processo: Processo) -> Dict[str, object]:
         snapshot_finalizacao = _normalizar_snapshot(
             getattr(ultima_finalizacao, "dados_snapshot", None)
         ) if ultima_finalizacao else None
+    # Snapshot da ultima finalizacao (vazio quando nao ha) consultado campo a campo abaixo.
+    snapshot = snapshot_finalizacao or {}
 
     return {
         "id": processo.id,
         "numero_sei": processo.numero_sei,
         "numero_sei_base": processo.numero_sei_base,
         "chave_relacionamento": chave_relacionamento,
-        "assunto": (snapshot_finalizacao or {}).get("assunto") or processo.assunto,
-        "interessado": (snapshot_finalizacao or {}).get("interessado") or processo.interessado,
-        "concessionaria": (snapshot_finalizacao or {}).get("concessionaria") or processo.concessionaria,
+        "assunto": snapshot.get("assunto") or processo.assunto,
+        "interessado": snapshot.get("interessado") or processo.interessado,
+        "concessionaria": snapshot.get("concessionaria") or processo.concessionaria,
         "classificacao_institucional": (
-            (snapshot_finalizacao or {}).get("classificacao_institucional") or processo.descricao
+            snapshot.get("classificacao_institucional") or processo.descricao
         ),
         "descricao_melhorada": (
-            (snapshot_finalizacao or {}).get("descricao_melhorada") or processo.descricao_melhorada
+            snapshot.get("descricao_melhorada") or processo.descricao_melhorada
         ),
-        "observacao": (snapshot_finalizacao or {}).get("observacao") or processo.observacao,
+        "observacao": snapshot.get("observacao") or processo.observacao,
         "gerencia": processo.gerencia,
         "destino_saida": processo.tramitado_para,
-        "coordenadoria": (snapshot_finalizacao or {}).get("coordenadoria") or processo.coordenadoria,
-        "equipe_area": (snapshot_finalizacao or {}).get("equipe_area") or processo.equipe_area,
-        "responsavel_adm": (snapshot_finalizacao or {}).get("responsavel_adm") or processo.responsavel_adm,
-        "responsavel_equipe": (snapshot_finalizacao or {}).get("responsavel_equipe") or processo.responsavel_equipe,
-        "tipo_processo": (snapshot_finalizacao or {}).get("tipo_processo") or processo.tipo_processo,
-        "palavras_chave": (snapshot_finalizacao or {}).get("palavras_chave") or processo.palavras_chave,
-        "status": (snapshot_finalizacao or {}).get("status") or processo.status,
-        "prazo": parse_date((snapshot_finalizacao or {}).get("prazo")) or processo.prazo,
-        "data_entrada": parse_date((snapshot_finalizacao or {}).get("data_entrada")) or processo.data_entrada,
-        "data_entrada_geplan": parse_date((snapshot_finalizacao or {}).get("data_entrada_geplan"))
+        "coordenadoria": snapshot.get("coordenadoria") or processo.coordenadoria,
+        "equipe_area": snapshot.get("equipe_area") or processo.equipe_area,
+        "responsavel_adm": snapshot.get("responsavel_adm") or processo.responsavel_adm,
+        "responsavel_equipe": snapshot.get("responsavel_equipe") or processo.responsavel_equipe,
+        "tipo_processo": snapshot.get("tipo_processo") or processo.tipo_processo,
+        "palavras_chave": snapshot.get("palavras_chave") or processo.palavras_chave,
+        "status": snapshot.get("status") or processo.status,
+        "prazo": parse_date(snapshot.get("prazo")) or processo.prazo,
+        "data_entrada": parse_date(snapshot.get("data_entrada")) or processo.data_entrada,
+        "data_entrada_geplan": parse_date(snapshot.get("data_entrada_geplan"))
         or processo.data_entrada_geplan,
         "observacoes_complementares": (
-            (snapshot_finalizacao or {}).get("observacoes_complementares")
+            snapshot.get("observacoes_complementares")
             or processo.observacoes_complementares
         ),
         "responsavel": processo.assigned_to.username if processo.assigned_to else None,
-        "dados_extra": (snapshot_finalizacao or {}).get("extras") or processo.dados_extra or {},
+        "dados_extra": snapshot.get("extras") or processo.dados_extra or {},
         "criado_em": processo.criado_em.isoformat() if processo.criado_em else None,
         "finalizado_em": (
             processo.finalizado_em.isoformat()
@@ -4235,22 +4859,35 @@ def promover_usuarios_acesso_total() -> None:
         return
     alvo_admin = normalizar_chave(DEFAULT_ADMIN_USER)
     alvo_email = (DEFAULT_ADMIN_EMAIL or "").strip().lower()
-    usuarios = Usuario.query.all()
-    tem_principal = any(getattr(u, "is_admin_principal", False) for u in usuarios)
-    alterados = 0
+    # Le so as colunas usadas na regra; a comparacao continua com normalizar_chave.
+    usuarios = db.session.query(
+        Usuario.id,
+        Usuario.username,
+        Usuario.email,
+        Usuario.is_admin_principal,
+        Usuario.acesso_total,
+    ).all()
+    tem_principal = any(usuario.is_admin_principal for usuario in usuarios)
+    conceder = []
+    remover = []
     for usuario in usuarios:
         if tem_principal:
-            deve_acesso_total = bool(getattr(usuario, "is_admin_principal", False))
+            deve_acesso_total = bool(usuario.is_admin_principal)
         else:
             chave_username = normalizar_chave(usuario.username or "")
             email_usuario = (usuario.email or "").strip().lower()
-            deve_acesso_total = chave_username == alvo_admin or (
+            deve_acesso_total = chave_username == alvo_admin or bool(
                 alvo_email and email_usuario == alvo_email
             )
         if usuario.acesso_total != deve_acesso_total:
-            usuario.acesso_total = deve_acesso_total
-            alterados += 1
-    if alterados:
+            (conceder if deve_acesso_total else remover).append(usuario.id)
+    # Duas atualizacoes em lote (concede/remove) pelos ids em vez de alterar cada objeto.
+    for ids, valor in ((conceder, True), (remover, False)):
+        if ids:
+            Usuario.query.filter(Usuario.id.in_(ids)).update(
+                {Usuario.acesso_total: valor}, synchronize_session=False
+            )
+    if conceder or remover:
         db.session.commit()
 
 
@@ -4309,50 +4946,121 @@ def inicializar():
         )
 
 
-def aplicar_filtro_devolvidos_gabinete(consulta):
-    """Remove processos marcados como devolvidos do gabinete."""
-    dados_extra_txt = func.lower(cast(Processo.dados_extra, db.Text))
-    return consulta.filter(
-        or_(
-            Processo.dados_extra.is_(None),
+_DADOS_EXTRA_JSON_NATIVO: Dict[str, bool] = {}
+
+
+def _dados_extra_json_postgres():
+    """dados_extra como JSON no Postgres; bases legadas com coluna TEXT recebem cast para JSONB."""
+    # O operador ->> so existe para json/jsonb: aplicado direto na coluna TEXT criada por
+    # garantir_colunas_extra ele falha. O tipo da coluna e lido uma vez por banco.
+    chave = str(db.engine.url)
+    nativo = _DADOS_EXTRA_JSON_NATIVO.get(chave)
+    if nativo is None:
+        tipo = next(
+            (col["type"] for col in inspect(db.engine).get_columns("processos") if col["name"] == "dados_extra"),
+            None,
+        )
+        nativo = isinstance(tipo, db.JSON)
+        _DADOS_EXTRA_JSON_NATIVO[chave] = nativo
+    if nativo:
+        # Mantem a mesma expressao dos indices criados quando a coluna e JSON nativo.
+        return type_coerce(Processo.dados_extra, postgresql.JSON)
+    return cast(Processo.dados_extra, postgresql.JSONB)
+
+
+def _expressao_flag_devolvido_gabinete():
+    """Extrai a marca devolvido_gabinete do JSON como texto ('true' quando marcada)."""
+    # Operadores JSON nativos evitam o LIKE sobre o JSON inteiro convertido em texto
+    # (que obrigava varredura completa) e permitem indice por expressao no Postgres.
+    dialeto = db.engine.dialect.name
+    if dialeto == "postgresql":
+        return _dados_extra_json_postgres()["devolvido_gabinete"].astext
+    if dialeto == "sqlite":
+        return func.json_type(Processo.dados_extra, "$.devolvido_gabinete")
+    return None
+
+
+def _condicao_nao_devolvido_gabinete():
+    """Condicao SQL verdadeira para processos que nao foram devolvidos ao gabinete."""
+    flag = _expressao_flag_devolvido_gabinete()
+    if flag is None:
+        dados_extra_txt = func.lower(cast(Processo.dados_extra, db.Text))
+        return or_(
+            Processo.dados_extra.is_(None),
             ~dados_extra_txt.like('%"devolvido_gabinete"%true%'),
         )
+    return or_(
+        Processo.dados_extra.is_(None),
+        flag.is_(None),
+        flag != "true",
     )
 
 
+def aplicar_filtro_devolvidos_gabinete(consulta):
+    """Remove processos marcados como devolvidos do gabinete."""
+    return consulta.filter(_condicao_nao_devolvido_gabinete())
+
+
 def aplicar_filtro_somente_devolvidos_gabinete(consulta):
     """Mantem apenas processos marcados como devolvidos ao gabinete."""
-    dados_extra_txt = func.lower(cast(Processo.dados_extra, db.Text))
-    return consulta.filter(dados_extra_txt.like('%"devolvido_gabinete"%true%'))
+    flag = _expressao_flag_devolvido_gabinete()
+    if flag is None:
+        dados_extra_txt = func.lower(cast(Processo.dados_extra, db.Text))
+        return consulta.filter(dados_extra_txt.like('%"devolvido_gabinete"%true%'))
+    return consulta.filter(flag == "true")
+
+
+# Sentinelas de ordenacao ligadas uma vez; evitam a busca do atributo em chaves de sort.
+_MEIA_NOITE = datetime.min.time()
+_DATA_HORA_MINIMA = datetime.min
+
+
+def obter_totais_por_gerencia() -> Dict[str, Dict[str, int]]:
+    """Conta processos ativos, em andamento (sem devolvidos) e finalizados por gerencia."""
+    # Contagens do dashboard, contagem de SAIDA e metricas gerais saem do mesmo
+    # resultado agrupado, evitando uma ida ao banco para cada indicador.
+    ativos = func.sum(case((Processo.finalizado_em.is_(None), 1), else_=0))
+    andamento = func.sum(
+        case(
+            (and_(Processo.finalizado_em.is_(None), _condicao_nao_devolvido_gabinete()), 1),
+            else_=0,
+        )
+    )
+    finalizados = func.sum(case((Processo.finalizado_em.isnot(None), 1), else_=0))
+    consulta = db.session.query(Processo.gerencia, ativos, andamento, finalizados).group_by(
+        Processo.gerencia
+    )
+    return {
+        ger: {
+            "ativos": int(total_ativos or 0),
+            "andamento": int(total_andamento or 0),
+            "finalizados": int(total_finalizados or 0),
+        }
+        for ger, total_ativos, total_andamento, total_finalizados in consulta.all()
+    }
 
 
-def obter_contagens_por_gerencia():
+def obter_contagens_por_gerencia(
+    totais: Optional[Dict[str, Dict[str, int]]] = None,
+):
     """Calcula quantidade de processos ativos por gerencia."""
+    if totais is None:
+        totais = obter_totais_por_gerencia()
     contagens = {ger: 0 for ger in GERENCIAS}
-    consulta = (
-        db.session.query(Processo.gerencia, func.count(Processo.id))
-        .filter(Processo.finalizado_em.is_(None))
-    )
-    consulta = aplicar_filtro_devolvidos_gabinete(consulta)
-    for ger, total in consulta.group_by(Processo.gerencia).all():
+    for ger, valores in totais.items():
         if ger in contagens:
-            contagens[ger] = total
+            contagens[ger] = valores["andamento"]
     return contagens
 
 
-def obter_metricas_processos() -> Dict[str, Optional[float]]:
+def obter_metricas_processos(
+    totais: Optional[Dict[str, Dict[str, int]]] = None,
+) -> Dict[str, Optional[float]]:
     """Calcula indicadores gerais de processos (andamento, finalizados e tempo medio)."""
-    consulta_andamento = db.session.query(func.count(Processo.id)).filter(
-        Processo.finalizado_em.is_(None)
-    )
-    consulta_andamento = aplicar_filtro_devolvidos_gabinete(consulta_andamento)
-    total_andamento = consulta_andamento.scalar() or 0
-
-    total_finalizados = (
-        db.session.query(func.count(Processo.id))
-        .filter(Processo.finalizado_em.isnot(None))
-        .scalar()
-    ) or 0
+    if totais is None:
+        totais = obter_totais_por_gerencia()
+    total_andamento = sum(valores["andamento"] for valores in totais.values())
+    total_finalizados = sum(valores["finalizados"] for valores in totais.values())
 
     registros_finalizados = (
         db.session.query(Processo.data_entrada, Processo.finalizado_em)
@@ -4363,15 +5071,17 @@ def obter_metricas_processos() -> Dict[str, Optional[float]]:
         .all()
     )
 
-    duracoes_segundos = [
-        (finalizado - datetime.combine(entrada, datetime.min.time())).total_seconds()
-        for entrada, finalizado in registros_finalizados
-        if entrada and finalizado and finalizado >= datetime.combine(entrada, datetime.min.time())
-    ]
+    soma_segundos = 0.0
+    quantidade = 0
+    for entrada, finalizado in registros_finalizados:
+        if not entrada or not finalizado:
+            continue
+        entrada_dt = datetime.combine(entrada, _MEIA_NOITE)
+        if finalizado >= entrada_dt:
+            soma_segundos += (finalizado - entrada_dt).total_seconds()
+            quantidade += 1
 
-    tempo_medio_dias = (
-        (sum(duracoes_segundos) / len(duracoes_segundos)) / 86400 if duracoes_segundos else None
-    )
+    tempo_medio_dias = (soma_segundos / quantidade) / 86400 if quantidade else None
 
     return {
         "andamento": int(total_andamento),
@@ -4380,6 +5090,233 @@ def obter_metricas_processos() -> Dict[str, Optional[float]]:
     }
 
 
+# Agregados do dashboard (totais por gerencia, metricas e SAIDA) mudam bem menos que as
+# visualizacoes do painel. Ficam em cache por processo durante AGREGADOS_PAINEL_TTL
+# segundos, e qualquer commit que altere processos troca a versao e descarta a entrada.
+AGREGADOS_PAINEL_TTL = 45
+_AGREGADOS_PAINEL_CACHE: Dict[int, Tuple[float, Dict[str, object]]] = {}
+_AGREGADOS_PAINEL_LOCK = threading.Lock()
+_agregados_painel_versao = 0
+# Contador de exclusoes de processos: max(id)/max(atualizado_em) nao enxergam a remocao
+# de um processo antigo, entao a assinatura da tabela inclui este contador.
+_processos_excluidos_versao = 0
+
+
+def invalidar_agregados_painel() -> None:
+    """Descarta os agregados do dashboard em cache."""
+    global _agregados_painel_versao
+    with _AGREGADOS_PAINEL_LOCK:
+        _agregados_painel_versao += 1
+        _AGREGADOS_PAINEL_CACHE.clear()
+
+
+def obter_agregados_painel() -> Dict[str, object]:
+    """Retorna totais, contagens, metricas e contagem de SAIDA do dashboard (com cache curto)."""
+    agora = time.monotonic()
+    with _AGREGADOS_PAINEL_LOCK:
+        versao = _agregados_painel_versao
+        entrada = _AGREGADOS_PAINEL_CACHE.get(versao)
+    if entrada is not None and entrada[0] > agora:
+        dados = entrada[1]
+    else:
+        totais = obter_totais_por_gerencia()
+        dados = {
+            "totais": totais,
+            "contagens": obter_contagens_por_gerencia(totais),
+            "metricas": obter_metricas_processos(totais),
+            "contagem_saida": totais.get("SAIDA", {}).get("ativos", 0),
+        }
+        with _AGREGADOS_PAINEL_LOCK:
+            # Se um commit trocou a versao durante o calculo, o resultado nao e guardado.
+            if versao == _agregados_painel_versao:
+                _AGREGADOS_PAINEL_CACHE[versao] = (agora + AGREGADOS_PAINEL_TTL, dados)
+    return {
+        "totais": {ger: dict(valores) for ger, valores in dados["totais"].items()},
+        "contagens": dict(dados["contagens"]),
+        "metricas": dict(dados["metricas"]),
+        "contagem_saida": dados["contagem_saida"],
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _marcar_processos_alterados(sessao, _contexto) -> None:
+    if any(
+        isinstance(obj, Processo)
+        for obj in (*sessao.new, *sessao.dirty, *sessao.deleted)
+    ):
+        sessao.info["agregados_painel_sujos"] = True
+    if any(isinstance(obj, Processo) for obj in sessao.deleted):
+        sessao.info["processos_excluidos"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _marcar_processos_alterados_em_lote(estado) -> None:
+    if (estado.is_insert or estado.is_update or estado.is_delete) and any(
+        mapper.class_ is Processo for mapper in estado.all_mappers
+    ):
+        estado.session.info["agregados_painel_sujos"] = True
+        if estado.is_delete:
+            estado.session.info["processos_excluidos"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_agregados_apos_commit(sessao) -> None:
+    global _processos_excluidos_versao
+    if sessao.info.pop("processos_excluidos", False):
+        with _AGREGADOS_PAINEL_LOCK:
+            _processos_excluidos_versao += 1
+    if sessao.info.pop("agregados_painel_sujos", False):
+        invalidar_agregados_painel()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_marca_agregados(sessao) -> None:
+    sessao.info.pop("agregados_painel_sujos", None)
+    sessao.info.pop("processos_excluidos", None)
+
+
+def assinatura_tabela_processos() -> str:
+    """Resumo barato do estado da tabela de processos (maior id, ultima atualizacao e exclusoes)."""
+    # Os dois MAX usam indice (chave primaria e idx_processos_atualizado_em); um COUNT varreria a tabela.
+    maior_id, ultimo = db.session.query(func.max(Processo.id), func.max(Processo.atualizado_em)).one()
+    return f"{maior_id or 0}:{ultimo.isoformat() if ultimo else ''}:{_processos_excluidos_versao}"
+
+
+def calcular_etag_painel(hoje: date) -> Optional[str]:
+    """ETag do dashboard; None quando a pagina nao pode ser revalidada (ha mensagens flash)."""
+    if SITE_EM_CONFIGURACAO or session.get("_flashes"):
+        return None
+    usuario = None
+    if current_user.is_authenticated:
+        usuario = [
+            getattr(current_user, coluna.key)
+            for coluna in Usuario.__table__.columns
+            if coluna.key != "password_hash"
+        ]
+    partes = {
+        "url": request.full_path,
+        "hoje": hoje.isoformat(),
+        "dados": assinatura_tabela_processos(),
+        "usuario": usuario,
+        "meus_processos_visto": session.get("meus_processos_visto"),
+        "campos_extra": {
+            gerencia: serializar_campos_extra(lista)
+            for gerencia, lista in obter_campos_por_gerencia().items()
+        },
+    }
+    return hashlib.sha1(json.dumps(partes, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# Listagens filtradas do dashboard contam no maximo este numero de processos; acima
+# disso o total aparece como estimado em vez de custar um COUNT sobre todos os ativos.
+LIMITE_CONTAGEM_PAINEL = 1000
+
+# Colunas de Processo lidas pela listagem do dashboard (tabela, ficha resumida, filtros
+# por coluna e cursor da paginacao); textos longos que a tela nao exibe ficam de fora.
+COLUNAS_PAINEL_PROCESSO = (
+    "numero_sei",
+    "assunto",
+    "interessado",
+    "concessionaria",
+    "gerencia",
+    "prazo",
+    "data_entrada",
+    "observacao",
+    "coordenadoria",
+    "equipe_area",
+    "responsavel_equipe",
+    "tipo_processo",
+    "palavras_chave",
+    "status",
+    "observacoes_complementares",
+    "assigned_to_id",
+    "dados_extra",
+    "atualizado_em",
+)
+
+
+class PaginacaoPainel:
+    """Paginacao do dashboard com numero de pagina e cursor opcional da proxima pagina."""
+
+    __slots__ = ("page", "per_page", "total", "_pages", "apos_ts", "apos_id", "total_estimado")
+
+    def __init__(
+        self,
+        page: int,
+        per_page: int,
+        total: int,
+        pages: int,
+        apos_ts: Optional[str] = None,
+        apos_id: Optional[int] = None,
+        total_estimado: bool = False,
+    ):
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self._pages = pages
+        self.apos_ts = apos_ts
+        self.apos_id = apos_id
+        # Total limitado por LIMITE_CONTAGEM_PAINEL: ha pelo menos `total` processos.
+        self.total_estimado = total_estimado
+
+    @property
+    def pages(self):
+        return self._pages
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def prev_num(self):
+        return max(1, self.page - 1)
+
+    @property
+    def next_num(self):
+        return min(self.pages, self.page + 1)
+
+
+def paginar_lista(itens: List[object], pagina_atual: int, por_pagina: int):
+    """Paginação simples para listas já carregadas."""
+    total = len(itens)
+    por_pagina = por_pagina or total or 1
+    total_paginas = max(1, (total + por_pagina - 1) // por_pagina)
+    pagina_atual = max(1, min(pagina_atual, total_paginas))
+    inicio = (pagina_atual - 1) * por_pagina
+    paginacao_lista = PaginacaoPainel(
+        page=pagina_atual,
+        per_page=por_pagina,
+        total=total,
+        pages=total_paginas,
+    )
+    return itens[inicio:inicio + por_pagina], paginacao_lista
+
+
+def ler_cursor_painel(args) -> Optional[Tuple[datetime, int]]:
+    """Le o cursor (atualizado_em, id) do ultimo processo exibido na pagina anterior."""
+    apos_id = args.get("apos_id", type=int)
+    apos_ts = (args.get("apos_ts") or "").strip()
+    if not apos_id or not apos_ts:
+        return None
+    try:
+        return datetime.fromisoformat(apos_ts), apos_id
+    except ValueError:
+        return None
+
+
+def _condicao_apos_cursor_painel(apos_ts: datetime, apos_id: int):
+    """Condicao de seek para a ordem (atualizado_em desc, id desc) apos o cursor."""
+    condicao = tuple_(Processo.atualizado_em, Processo.id) < tuple_(apos_ts, apos_id)
+    if db.engine.dialect.name != "postgresql":
+        # Fora do Postgres NULL fica por ultimo em ordem DESC, depois de qualquer cursor.
+        condicao = or_(condicao, Processo.atualizado_em.is_(None))
+    return condicao
+
+
 def corrigir_gerencias_sem_cadastro() -> int:
     """Ajusta registros antigos mapeando gerencias para nomenclatura atual."""
     atualizados = 0
@@ -4397,10 +5334,20 @@ def corrigir_gerencias_sem_cadastro() -> int:
     return atualizados
 
 
+# Incrementar sempre que garantir_colunas_extra ganhar novas colunas, indices ou ajustes.
+ESQUEMA_VERSAO = 6
+
+
 def garantir_colunas_extra():
     """Adiciona colunas novas quando o banco foi criado em versoes antigas."""
+    # Com o esquema ja na versao atual, evita inspecionar tabelas e reaplicar DDL a cada start.
+    registro_versao = EsquemaVersao.query.order_by(EsquemaVersao.id).first()
+    if registro_versao and registro_versao.versao == ESQUEMA_VERSAO:
+        return
+
     insp = inspect(db.engine)
-    colunas = {col["name"] for col in insp.get_columns("processos")}
+    colunas_info = insp.get_columns("processos")
+    colunas = {col["name"] for col in colunas_info}
     alteracoes = []
     if "finalizado_em" not in colunas:
         alteracoes.append("ALTER TABLE processos ADD COLUMN finalizado_em DATETIME")
@@ -4411,9 +5358,10 @@ def garantir_colunas_extra():
     if "dados_extra" not in colunas:
         alteracoes.append("ALTER TABLE processos ADD COLUMN dados_extra TEXT")
 
-    for comando in alteracoes:
+    if alteracoes:
         with db.engine.begin() as conexao:
-            conexao.execute(text(comando))
+            for comando in alteracoes:
+                conexao.execute(text(comando))
 
     # Ajustes na tabela de usuarios
     colunas_usuarios = {col["name"] for col in insp.get_columns("usuarios")}
@@ -4473,18 +5421,21 @@ def garantir_colunas_extra():
         )
         adicionou_permissoes = True
 
-    for comando in alteracoes_usuarios:
-        with db.engine.begin() as conexao:
-            conexao.execute(text(comando))
     with db.engine.begin() as conexao:
-        conexao.execute(
-            text(
-                "UPDATE usuarios SET pode_finalizar_gerencia = TRUE "
-                "WHERE pode_finalizar_gerencia IS NULL"
+        for comando in alteracoes_usuarios:
+            conexao.execute(text(comando))
+        # Sonda barata antes do UPDATE: no estado normal nenhuma linha precisa de ajuste.
+        finalizar_pendente = conexao.execute(
+            text("SELECT 1 FROM usuarios WHERE pode_finalizar_gerencia IS NULL LIMIT 1")
+        ).first()
+        if finalizar_pendente:
+            conexao.execute(
+                text(
+                    "UPDATE usuarios SET pode_finalizar_gerencia = TRUE "
+                    "WHERE pode_finalizar_gerencia IS NULL"
+                )
             )
-        )
-    if adicionou_permissoes:
-        with db.engine.begin() as conexao:
+        if adicionou_permissoes:
             conexao.execute(
                 text(
                     "UPDATE usuarios SET "
@@ -4524,15 +5475,21 @@ def garantir_colunas_extra():
     if "tipo" not in colunas_mov:
         alteracoes_mov.append("ALTER TABLE movimentacoes ADD COLUMN tipo VARCHAR(40) DEFAULT 'movimentacao'")
 
-    for comando in alteracoes_mov:
+    if alteracoes_mov:
         with db.engine.begin() as conexao:
-            conexao.execute(text(comando))
+            for comando in alteracoes_mov:
+                conexao.execute(text(comando))
 
     # Indices para reduzir tempo de filtros/ordenacao nas telas com alto volume.
-    # (apenas colunas fisicas existentes no banco)
-    insp = inspect(db.engine)
-    colunas_proc_atual = {col["name"] for col in insp.get_columns("processos")}
-    colunas_mov_atual = {col["name"] for col in insp.get_columns("movimentacoes")}
+    # (apenas colunas fisicas existentes no banco; as colunas ausentes acima
+    # acabaram de ser criadas, entao nao e preciso inspecionar o banco de novo)
+    colunas_proc_atual = colunas | {
+        "finalizado_em",
+        "finalizado_por",
+        "assigned_to_id",
+        "dados_extra",
+    }
+    colunas_mov_atual = colunas_mov | {"dados_snapshot", "tipo"}
 
     indices = []
     if "finalizado_em" in colunas_proc_atual:
@@ -4563,10 +5520,83 @@ def garantir_colunas_extra():
         indices.append(
             "CREATE INDEX IF NOT EXISTS idx_movimentacoes_tipo ON movimentacoes (tipo)"
         )
+    # Movimentacoes de varios processos filtradas por tipo (snapshots, historicos) e as
+    # saidas/finalizacoes de uma gerencia (listar_ids_finalizados_fora_da_gerencia).
+    if {"processo_id", "tipo"} <= colunas_mov_atual:
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_movimentacoes_processo_tipo "
+            "ON movimentacoes (processo_id, tipo)"
+        )
+    if {"de_gerencia", "para_gerencia", "tipo"} <= colunas_mov_atual:
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_movimentacoes_de_para_tipo "
+            "ON movimentacoes (de_gerencia, para_gerencia, tipo)"
+        )
+    # Indices parciais (apenas processos ativos) no formato filtro + ordenacao do dashboard,
+    # permitindo percorrer em ordem e parar no LIMIT da pagina sem ordenar tudo.
+    if {"finalizado_em", "gerencia", "atualizado_em"} <= colunas_proc_atual:
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_processos_ativos_gerencia_atualizado "
+            "ON processos (gerencia, atualizado_em DESC) WHERE finalizado_em IS NULL"
+        )
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_processos_ativos_atualizado "
+            "ON processos (atualizado_em DESC) WHERE finalizado_em IS NULL"
+        )
+        # Aba de finalizados da gerencia: filtro por gerencia e ordem por finalizado_em DESC.
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_processos_finalizados_gerencia "
+            "ON processos (gerencia, finalizado_em DESC) WHERE finalizado_em IS NOT NULL"
+        )
+        # Exportacoes por gerencia (escopos todos/finalizados): filtro por gerencia com ordem
+        # por atualizado_em DESC, sem restricao de finalizado_em.
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_processos_gerencia_atualizado "
+            "ON processos (gerencia, atualizado_em DESC)"
+        )
+    if {"finalizado_em", "assigned_to_id", "gerencia"} <= colunas_proc_atual:
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_processos_ativos_atribuido_gerencia "
+            "ON processos (assigned_to_id, gerencia) WHERE finalizado_em IS NULL"
+        )
+    if {"finalizado_em", "prazo"} <= colunas_proc_atual:
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_processos_ativos_prazo "
+            "ON processos (prazo) WHERE finalizado_em IS NULL AND prazo IS NOT NULL"
+        )
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_processos_ativos_sem_prazo "
+            "ON processos (id) WHERE finalizado_em IS NULL AND prazo IS NULL"
+        )
+    # Indice por expressao para o filtro de devolvidos ao gabinete (somente quando a
+    # coluna ja e JSON nativo; bases legadas com TEXT continuam sem o indice).
+    tipo_dados_extra = next(
+        (col["type"] for col in colunas_info if col["name"] == "dados_extra"), None
+    )
+    if db.engine.dialect.name == "postgresql" and isinstance(tipo_dados_extra, db.JSON):
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_processos_devolvido_gabinete "
+            "ON processos ((dados_extra ->> 'devolvido_gabinete'))"
+        )
+        # Mesma expressao de _expressao_numero_sei_base (busca de relacionados por numero base).
+        indices.append(
+            "CREATE INDEX IF NOT EXISTS idx_processos_numero_sei_base ON processos "
+            "((coalesce(nullif(trim(dados_extra ->> 'numero_sei_original'), ''), "
+            "trim(CASE WHEN strpos(numero_sei, '-') > 0 "
+            "THEN substr(numero_sei, strpos(numero_sei, '-') + 1) ELSE numero_sei END))))"
+        )
 
-    for comando in indices:
+    if indices:
         with db.engine.begin() as conexao:
-            conexao.execute(text(comando))
+            for comando in indices:
+                conexao.execute(text(comando))
+
+    registro_versao = EsquemaVersao.query.order_by(EsquemaVersao.id).first()
+    if not registro_versao:
+        registro_versao = EsquemaVersao()
+        db.session.add(registro_versao)
+    registro_versao.versao = ESQUEMA_VERSAO
+    db.session.commit()
 
 
 # === Filtros de template (datas) ===
@@ -4653,6 +5683,13 @@ def index():
 
     hoje = datetime.utcnow().date()
 
+    # Sem mudanca nos processos, no usuario ou nos filtros o navegador reaproveita a pagina.
+    etag_painel = calcular_etag_painel(hoje)
+    if etag_painel and request.if_none_match.contains_weak(etag_painel):
+        resposta = make_response("", 304)
+        resposta.set_etag(etag_painel, weak=True)
+        return resposta
+
     processos = []
     paginacao = None
     contagens = {ger: 0 for ger in GERENCIAS}
@@ -4663,7 +5700,18 @@ def index():
     gerencia_padrao_usuario = None
 
     if not SITE_EM_CONFIGURACAO:
-        consulta = Processo.query.filter(Processo.finalizado_em.is_(None))
+        opcoes_carga = [
+            load_only(
+                *(getattr(Processo, nome) for nome in COLUNAS_PAINEL_PROCESSO),
+                raiseload=app.debug,
+            ),
+            joinedload(Processo.assigned_to),
+        ]
+        if app.debug:
+            # Em desenvolvimento, acesso a coluna ou relacionamento nao carregado falha na
+            # hora em vez de virar uma consulta extra por linha do dashboard.
+            opcoes_carga.append(raiseload("*"))
+        consulta = Processo.query.options(*opcoes_carga).filter(Processo.finalizado_em.is_(None))
         consulta = aplicar_filtro_devolvidos_gabinete(consulta)
         if filtro_gerencia:
             consulta = consulta.filter(Processo.gerencia == filtro_gerencia)
@@ -4680,9 +5728,18 @@ def index():
             )
         elif filtro_prazo == "em_dia":
             limite = hoje + timedelta(days=7)
-            consulta = consulta.filter(
-                or_(Processo.prazo.is_(None), Processo.prazo > limite)
+            # Cada lado do "sem prazo OU prazo folgado" usa seu indice parcial
+            # (idx_processos_ativos_sem_prazo / idx_processos_ativos_prazo); com OR
+            # direto o planner acaba varrendo todos os ativos.
+            ids_em_dia = union_all(
+                select(Processo.id).where(
+                    Processo.finalizado_em.is_(None), Processo.prazo.is_(None)
+                ),
+                select(Processo.id).where(
+                    Processo.finalizado_em.is_(None), Processo.prazo > limite
+                ),
             )
+            consulta = consulta.filter(Processo.id.in_(ids_em_dia))
         if filtro_resp_eq_vazio:
             consulta = consulta.filter(
                 Processo.assigned_to_id.is_(None),
@@ -4692,6 +5749,8 @@ def index():
                 ),
             )
 
+        agregados = obter_agregados_painel()
+        totais_gerencia = agregados["totais"]
         if filtros_coluna:
             processos_ordenados = consulta.order_by(Processo.atualizado_em.desc()).all()
 
@@ -4792,34 +5851,7 @@ def index():
             fim = inicio + por_pagina
             processos = processos_filtrados[inicio:fim]
 
-            class PaginacaoSimples:
-                def __init__(self, page: int, per_page: int, total: int, pages: int):
-                    self.page = page
-                    self.per_page = per_page
-                    self.total = total
-                    self._pages = pages
-
-                @property
-                def pages(self):
-                    return self._pages
-
-                @property
-                def has_prev(self):
-                    return self.page > 1
-
-                @property
-                def has_next(self):
-                    return self.page < self.pages
-
-                @property
-                def prev_num(self):
-                    return max(1, self.page - 1)
-
-                @property
-                def next_num(self):
-                    return min(self.pages, self.page + 1)
-
-            paginacao = PaginacaoSimples(
+            paginacao = PaginacaoPainel(
                 page=pagina,
                 per_page=por_pagina,
                 total=total_filtrado,
@@ -4844,6 +5876,22 @@ def index():
                 "assunto",
                 "responsavel_equipe",
             }
+            # O total vem das contagens agrupadas quando so ha filtro de gerencia.
+            total_estimado = False
+            if filtro_sei or filtro_prazo or filtro_resp_eq_vazio:
+                # Contagem limitada: acima de LIMITE_CONTAGEM_PAINEL o total e exibido como
+                # "mais de" e a existencia da proxima pagina vem de uma linha extra buscada.
+                total_processos = consulta.order_by(None).limit(LIMITE_CONTAGEM_PAINEL + 1).count()
+                if total_processos > LIMITE_CONTAGEM_PAINEL:
+                    total_processos = LIMITE_CONTAGEM_PAINEL
+                    total_estimado = True
+            elif filtro_gerencia:
+                total_processos = totais_gerencia.get(filtro_gerencia, {}).get("andamento", 0)
+            else:
+                total_processos = sum(valores["andamento"] for valores in totais_gerencia.values())
+            total_paginas = max(1, (total_processos + por_pagina - 1) // por_pagina)
+            pagina = max(1, pagina if total_estimado else min(pagina, total_paginas))
+            linhas_pagina = por_pagina + 1 if total_estimado else por_pagina
             coluna_ordem = mapa_ordem.get(ordem_coluna)
             if coluna_ordem is not None:
                 ordem_base = (
@@ -4855,21 +5903,52 @@ def index():
                     ordem_base.desc() if ordem_direcao == "desc" else ordem_base.asc(),
                     Processo.atualizado_em.desc(),
                 )
+                processos = (
+                    consulta_ordenada.offset((pagina - 1) * por_pagina).limit(linhas_pagina).all()
+                )
+                if total_estimado and len(processos) > por_pagina:
+                    total_paginas = max(total_paginas, pagina + 1)
+                processos = processos[:por_pagina]
+                paginacao = PaginacaoPainel(
+                    page=pagina,
+                    per_page=por_pagina,
+                    total=total_processos,
+                    pages=max(total_paginas, pagina),
+                    total_estimado=total_estimado,
+                )
             else:
-                consulta_ordenada = consulta.order_by(Processo.atualizado_em.desc())
-
-            paginacao = consulta_ordenada.paginate(
-                page=pagina, per_page=por_pagina, error_out=False
-            )
-            processos = paginacao.items
-        contagens = obter_contagens_por_gerencia()
-        metricas = obter_metricas_processos()
-        contagem_saida = (
-            db.session.query(func.count(Processo.id))
-            .filter(Processo.finalizado_em.is_(None), Processo.gerencia == "SAIDA")
-            .scalar()
-            or 0
-        )
+                # Ordem padrao: "Proxima" avanca por cursor (atualizado_em, id) em vez de OFFSET.
+                consulta_ordenada = consulta.order_by(
+                    Processo.atualizado_em.desc(), Processo.id.desc()
+                )
+                cursor = ler_cursor_painel(request.args) if pagina > 1 else None
+                if cursor:
+                    consulta_ordenada = consulta_ordenada.filter(
+                        _condicao_apos_cursor_painel(*cursor)
+                    )
+                else:
+                    consulta_ordenada = consulta_ordenada.offset((pagina - 1) * por_pagina)
+                processos = consulta_ordenada.limit(linhas_pagina).all()
+                if total_estimado and len(processos) > por_pagina:
+                    total_paginas = max(total_paginas, pagina + 1)
+                processos = processos[:por_pagina]
+                ultimo = processos[-1] if processos else None
+                paginacao = PaginacaoPainel(
+                    page=pagina,
+                    per_page=por_pagina,
+                    total=total_processos,
+                    pages=max(total_paginas, pagina),
+                    total_estimado=total_estimado,
+                    apos_ts=(
+                        ultimo.atualizado_em.isoformat()
+                        if ultimo is not None and ultimo.atualizado_em
+                        else None
+                    ),
+                    apos_id=ultimo.id if ultimo is not None else None,
+                )
+        contagens = agregados["contagens"]
+        metricas = agregados["metricas"]
+        contagem_saida = agregados["contagem_saida"]
         if current_user.is_authenticated:
             gerencias_usuario = [
                 g for g in obter_gerencias_liberadas_usuario(current_user) if g in GERENCIAS
@@ -4899,7 +5978,7 @@ def index():
             vistos = session.get("meus_processos_visto", 0)
             meus_processos_novos = max(meus_processos_total - vistos, 0)
 
-    return render_template(
+    conteudo = render_template(
         "pg_inicial.html",
         processos=processos,
         paginacao=paginacao,
@@ -4926,6 +6005,12 @@ def index():
         meus_processos_novos=meus_processos_novos,
         gerencia_padrao_usuario=gerencia_padrao_usuario,
     )
+    resposta = make_response(conteudo)
+    if etag_painel:
+        resposta.set_etag(etag_painel, weak=True)
+        resposta.cache_control.private = True
+        resposta.cache_control.no_cache = True
+    return resposta
 
 
 @app.route("/api/atualizacoes-painel")
@@ -4950,14 +6035,10 @@ def api_atualizacoes_painel():
     if SITE_EM_CONFIGURACAO:
         return jsonify(resposta)
 
-    resposta["contagens"] = obter_contagens_por_gerencia()
-    resposta["metricas"] = obter_metricas_processos()
-    resposta["contagem_saida"] = (
-        db.session.query(func.count(Processo.id))
-        .filter(Processo.finalizado_em.is_(None), Processo.gerencia == "SAIDA")
-        .scalar()
-        or 0
-    )
+    agregados = obter_agregados_painel()
+    resposta["contagens"] = agregados["contagens"]
+    resposta["metricas"] = agregados["metricas"]
+    resposta["contagem_saida"] = agregados["contagem_saida"]
 
     if current_user.is_authenticated:
         gerencias_usuario = [
@@ -5149,6 +6230,349 @@ def api_home_column_options():
     return jsonify({"ok": True, "values": valores_ordenados})
 
 
+def _xlsxwriter_disponivel() -> bool:
+    """Indica se o gravador xlsxwriter (mais rapido que openpyxl para exportar) esta instalado."""
+    try:
+        import xlsxwriter  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def gerar_planilha_processos(
+    cabecalhos: List[str], linhas: Iterable[List[object]], destino=None
+) -> Tuple[BytesIO, int]:
+    """Grava as linhas em uma planilha .xlsx em modo streaming e retorna (buffer, total).
+
+    Com destino (arquivo aberto em modo binario) a planilha e gravada nele, sem copia em memoria.
+    Valores date/datetime viram celulas de data com FORMATO_DATA_PLANILHA/FORMATO_DATA_HORA_PLANILHA.
+    """
+    if _xlsxwriter_disponivel():
+        return _gerar_planilha_xlsxwriter(cabecalhos, linhas, destino)
+    # write_only do openpyxl escreve linha a linha sem manter as celulas em memoria,
+    # entao as linhas podem vir direto de um iterador da consulta.
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet("Processos")
+
+    def _celula(valor):
+        if not isinstance(valor, date):
+            return valor
+        celula = WriteOnlyCell(aba, valor)
+        celula.number_format = (
+            FORMATO_DATA_HORA_PLANILHA if isinstance(valor, datetime) else FORMATO_DATA_PLANILHA
+        )
+        return celula
+
+    aba.append(cabecalhos)
+    total = 0
+    for linha in linhas:
+        aba.append([_celula(valor) for valor in linha])
+        total += 1
+    buffer = BytesIO() if destino is None else destino
+    planilha.save(buffer)
+    buffer.seek(0)
+    return buffer, total
+
+
+def gerar_csv_processos(cabecalhos: List[str], linhas: Iterable[List[object]]) -> Iterator[str]:
+    """Gera o CSV (separador ";" e BOM, como o Excel em portugues espera) em blocos de texto."""
+    buffer = StringIO()
+    escritor = csv.writer(buffer, delimiter=";")
+    buffer.write("\ufeff")
+    escritor.writerow(cabecalhos)
+    for indice, linha in enumerate(linhas, start=1):
+        escritor.writerow(
+            [
+                valor.strftime("%d/%m/%Y %H:%M") if isinstance(valor, datetime)
+                else valor.strftime("%d/%m/%Y") if isinstance(valor, date)
+                else valor
+                for valor in linha
+            ]
+        )
+        if indice % 500 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _gerar_planilha_xlsxwriter(
+    cabecalhos: List[str], linhas: Iterable[List[object]], destino=None
+) -> Tuple[BytesIO, int]:
+    """Mesma planilha de gerar_planilha_processos gravada pelo xlsxwriter."""
+    import xlsxwriter
+
+    buffer = BytesIO() if destino is None else destino
+    # constant_memory descarrega cada linha ao avancar; strings_to_urls desligado mantem o
+    # texto como no openpyxl (sem hiperlinks automaticos nem o limite de URLs por aba).
+    planilha = xlsxwriter.Workbook(
+        buffer,
+        {
+            "constant_memory": True,
+            "strings_to_urls": False,
+            "default_date_format": FORMATO_DATA_PLANILHA,
+        },
+    )
+    formato_data_hora = planilha.add_format({"num_format": FORMATO_DATA_HORA_PLANILHA})
+    aba = planilha.add_worksheet("Processos")
+    aba.write_row(0, 0, cabecalhos)
+    total = 0
+    for linha in linhas:
+        total += 1
+        for coluna, valor in enumerate(linha):
+            if isinstance(valor, datetime):
+                aba.write_datetime(total, coluna, valor, formato_data_hora)
+            else:
+                aba.write(total, coluna, valor)
+    planilha.close()
+    buffer.seek(0)
+    return buffer, total
+
+
+_EXPORTACOES_EM_ANDAMENTO: Set[str] = set()
+_EXPORTACOES_LOCK = threading.Lock()
+# job_id = "<escopo>-<sha1>": o escopo (geral ou a gerencia) fica no nome dos arquivos e as
+# rotas de status/download so aceitam jobs do proprio escopo.
+REGEX_JOB_EXPORTACAO = re.compile(r"^[a-z0-9_]+-[0-9a-f]{40}$")
+
+
+def _escopo_job_exportacao(gerencia: Optional[str] = None) -> str:
+    """Prefixo do job_id: 'geral' ou 'ger_<gerencia>' para exportacoes da gerencia."""
+    if not gerencia:
+        return "geral"
+    return "ger_" + re.sub(r"[^a-z0-9]+", "_", gerencia.lower())
+
+
+def _gerar_job_exportacao(escopo_job: str, parametros: Dict[str, object]) -> str:
+    resumo = hashlib.sha1(json.dumps(parametros, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{escopo_job}-{resumo}"
+
+
+def _job_exportacao_valido(job_id: str, escopo_job: str) -> bool:
+    """Confere o formato do job_id e se ele pertence ao escopo da rota."""
+    return bool(REGEX_JOB_EXPORTACAO.match(job_id)) and job_id.rsplit("-", 1)[0] == escopo_job
+
+
+def _caminho_exportacao(job_id: str, extensao: str) -> str:
+    """Caminho do arquivo (ou marcador) de uma exportacao em segundo plano."""
+    return os.path.join(EXPORT_CACHE_DIR, f"{job_id}.{extensao}")
+
+
+def _marcar_exportacao(job_id: str, extensao: str) -> None:
+    """Cria um marcador vazio de estado da exportacao."""
+    with open(_caminho_exportacao(job_id, extensao), "w", encoding="utf-8"):
+        pass
+
+
+def _remover_arquivo_exportacao(caminho: str) -> None:
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def _limpar_cache_exportacao() -> None:
+    """Remove planilhas e marcadores de exportacao mais antigos que o TTL."""
+    limite = time.time() - EXPORT_CACHE_TTL_MIN * 60
+    try:
+        nomes = os.listdir(EXPORT_CACHE_DIR)
+    except OSError:
+        return
+    mtimes: Dict[str, float] = {}
+    for nome in nomes:
+        try:
+            mtimes[nome] = os.path.getmtime(os.path.join(EXPORT_CACHE_DIR, nome))
+        except OSError:
+            pass
+    # Jobs rodando (neste processo ou com .parcial renovado pelo sinal de vida) mantem
+    # todos os arquivos: o .xlsx.tmp so e gravado no fechamento e fica com mtime antigo.
+    with _EXPORTACOES_LOCK:
+        ativos = set(_EXPORTACOES_EM_ANDAMENTO)
+    ativos.update(
+        nome[: -len(".parcial")]
+        for nome, mtime in mtimes.items()
+        if nome.endswith(".parcial") and mtime >= limite
+    )
+    for nome, mtime in mtimes.items():
+        if mtime >= limite or nome.split(".", 1)[0] in ativos:
+            continue
+        _remover_arquivo_exportacao(os.path.join(EXPORT_CACHE_DIR, nome))
+
+
+def _estado_exportacao(job_id: str) -> Tuple[str, Optional[str]]:
+    """Retorna (estado, caminho) da exportacao: pronto, vazio, erro, andamento ou expirado."""
+    limite = time.time() - EXPORT_CACHE_TTL_MIN * 60
+    with _EXPORTACOES_LOCK:
+        rodando = job_id in _EXPORTACOES_EM_ANDAMENTO
+    for estado, extensao in (("pronto", "xlsx"), ("vazio", "vazio"), ("erro", "erro"), ("andamento", "parcial")):
+        caminho = _caminho_exportacao(job_id, extensao)
+        try:
+            if os.path.getmtime(caminho) >= limite:
+                return estado, caminho
+        except OSError:
+            continue
+    if rodando:
+        return "andamento", _caminho_exportacao(job_id, "parcial")
+    return "expirado", None
+
+
+def _linhas_com_sinal_de_vida(job_id: str, linhas: Iterable[list]) -> Iterator[list]:
+    """Repassa as linhas renovando o .parcial a cada EXPORT_HEARTBEAT_SEG segundos."""
+    marcador = _caminho_exportacao(job_id, "parcial")
+    proximo = time.monotonic() + EXPORT_HEARTBEAT_SEG
+    for indice, linha in enumerate(linhas):
+        yield linha
+        if indice % 500 == 0 and time.monotonic() >= proximo:
+            try:
+                os.utime(marcador, None)
+            except OSError:
+                pass
+            proximo = time.monotonic() + EXPORT_HEARTBEAT_SEG
+
+
+# Colunas fixas das exportacoes (geral e de gerencia): rotulo, leitor e atributos do
+# modelo lidos pelo leitor; so eles sao selecionados, em tuplas sem montar objetos ORM.
+COLUNAS_EXPORTACAO_PROCESSOS = {
+    "numero_sei": (
+        "Número SEI",
+        lambda p: calcular_numero_sei_base(p.numero_sei, p.dados_extra),
+        ("numero_sei", "dados_extra"),
+    ),
+    "assunto": ("Assunto", lambda p: p.assunto, ("assunto",)),
+    "interessado": ("Interessado", lambda p: p.interessado, ("interessado",)),
+    "concessionaria": ("Concessionária", lambda p: p.concessionaria, ("concessionaria",)),
+    "gerencia": ("Gerência", lambda p: p.gerencia, ("gerencia",)),
+    "data_entrada": ("Data entrada", lambda p: p.data_entrada or "", ("data_entrada",)),
+    "prazo": ("Prazo SUROD", lambda p: p.prazo or "", ("prazo",)),
+    "status": ("Status", lambda p: p.status, ("status",)),
+    "prazo_equipe": ("Prazo equipe", lambda p: p.prazo_equipe or "", ("prazo_equipe",)),
+    "responsavel_adm": ("Responsável Adm", lambda p: p.responsavel_adm, ("responsavel_adm",)),
+    "coordenadoria": ("Coordenadoria", lambda p: p.coordenadoria, ("coordenadoria",)),
+    "equipe_area": ("Equipe / Área", lambda p: p.equipe_area, ("equipe_area",)),
+    "responsavel_equipe": (
+        "Responsável (Equipe)",
+        lambda p: p.responsavel_equipe,
+        ("responsavel_equipe",),
+    ),
+    "tipo_processo": ("Tipo de processo", lambda p: p.tipo_processo, ("tipo_processo",)),
+    "palavras_chave": ("Palavras-chave", lambda p: p.palavras_chave, ("palavras_chave",)),
+    "observacoes_complementares": (
+        "Observações complementares",
+        lambda p: p.observacoes_complementares,
+        ("observacoes_complementares",),
+    ),
+    "data_saida": ("Data de saída", lambda p: p.data_saida or "", ("data_saida",)),
+    "destino_saida": (
+        "Destino saída",
+        lambda p: p.tramitado_para if p.finalizado_em else "",
+        ("tramitado_para", "finalizado_em"),
+    ),
+    "finalizado_em": ("Finalizado em", lambda p: p.finalizado_em or "", ("finalizado_em",)),
+}
+
+# A exportacao geral sempre usou estes rotulos sem acento; mantidos para nao mudar a planilha.
+ROTULOS_EXPORTACAO_GERAL = {
+    "equipe_area": "Equipe / Area",
+    "responsavel_equipe": "Responsavel (Equipe)",
+}
+
+
+def preparar_exportacao_geral(escopo: str, filtro_gerencia: str, colunas: List[str]):
+    """Monta cabecalhos e o gerador de linhas da exportacao geral."""
+    extras_por_gerencia = obter_campos_por_gerencia()
+    extras_map = {}
+    for ger, campos in extras_por_gerencia.items():
+        for campo in campos:
+            extras_map[f"extra:{ger}:{campo.slug}"] = (campo.label, ger, campo.slug)
+
+    atributos_necessarios = {"gerencia"}
+    for chave in colunas:
+        if chave in COLUNAS_EXPORTACAO_PROCESSOS:
+            atributos_necessarios.update(COLUNAS_EXPORTACAO_PROCESSOS[chave][2])
+        elif chave in extras_map:
+            atributos_necessarios.add("dados_extra")
+
+    consulta = select(*(getattr(Processo, nome) for nome in sorted(atributos_necessarios)))
+    if filtro_gerencia:
+        consulta = consulta.where(Processo.gerencia == filtro_gerencia)
+    if escopo == "ativos":
+        consulta = consulta.where(Processo.finalizado_em.is_(None))
+    elif escopo == "finalizados":
+        consulta = consulta.where(Processo.finalizado_em.isnot(None))
+    consulta = consulta.order_by(Processo.atualizado_em.desc()).execution_options(yield_per=500)
+
+    # Cabecalhos e leitores resolvidos uma vez; cada linha so aplica a lista de leitores.
+    cabecalhos = []
+    getters = []
+    for chave in colunas:
+        if chave in COLUNAS_EXPORTACAO_PROCESSOS:
+            rotulo, getter, _ = COLUNAS_EXPORTACAO_PROCESSOS[chave]
+            cabecalhos.append(ROTULOS_EXPORTACAO_GERAL.get(chave, rotulo))
+            getters.append(getter)
+        elif chave in extras_map:
+            label, ger, slug = extras_map[chave]
+            cabecalhos.append(f"{label} ({ger})")
+            getters.append(
+                lambda p, ger=ger, slug=slug: (p.dados_extra or {}).get(slug, "") if p.gerencia == ger else ""
+            )
+        else:
+            cabecalhos.append(chave)
+            getters.append(lambda p: "")
+
+    def gerar_linhas():
+        for proc in db.session.execute(consulta):
+            yield [getter(proc) for getter in getters]
+
+    return cabecalhos, gerar_linhas
+
+
+def _executar_exportacao(job_id: str, cabecalhos: List[str], gerar_linhas) -> None:
+    """Gera a planilha (exportacao geral ou de gerencia) fora da requisicao em EXPORT_CACHE_DIR."""
+    try:
+        # Grava direto em arquivo temporario e renomeia para que o status nunca veja planilha pela metade.
+        temporario = _caminho_exportacao(job_id, "xlsx.tmp")
+        with app.app_context(), open(temporario, "wb") as fh:
+            _, total_linhas = gerar_planilha_processos(
+                cabecalhos, _linhas_com_sinal_de_vida(job_id, gerar_linhas()), fh
+            )
+        if total_linhas:
+            os.replace(temporario, _caminho_exportacao(job_id, "xlsx"))
+        else:
+            _remover_arquivo_exportacao(temporario)
+            _marcar_exportacao(job_id, "vazio")
+    except Exception:
+        logger.exception("Falha ao gerar exportacao %s", job_id)
+        try:
+            _marcar_exportacao(job_id, "erro")
+        except OSError:
+            pass
+    finally:
+        _remover_arquivo_exportacao(_caminho_exportacao(job_id, "xlsx.tmp"))
+        _remover_arquivo_exportacao(_caminho_exportacao(job_id, "parcial"))
+        with _EXPORTACOES_LOCK:
+            _EXPORTACOES_EM_ANDAMENTO.discard(job_id)
+
+
+def _iniciar_exportacao(job_id: str, cabecalhos: List[str], gerar_linhas) -> None:
+    """Dispara a geracao em uma thread, a menos que o mesmo job ja esteja rodando."""
+    with _EXPORTACOES_LOCK:
+        if job_id in _EXPORTACOES_EM_ANDAMENTO:
+            return
+        _EXPORTACOES_EM_ANDAMENTO.add(job_id)
+    for extensao in ("vazio", "erro"):
+        _remover_arquivo_exportacao(_caminho_exportacao(job_id, extensao))
+    _marcar_exportacao(job_id, "parcial")
+    threading.Thread(
+        target=_executar_exportacao,
+        args=(job_id, cabecalhos, gerar_linhas),
+        name=f"exportacao-{job_id[:-32]}",
+        daemon=True,
+    ).start()
+
+
 @app.route("/exportar-geral", methods=["POST"])
 @login_required
 def exportar_geral():
@@ -5164,96 +6588,76 @@ def exportar_geral():
         flash("Selecione ao menos uma coluna para exportar.", "warning")
         return redirect(url_for("index"))
 
-    base_colunas = {
-        "numero_sei": ("Número SEI", lambda p: p.numero_sei_base),
-        "assunto": ("Assunto", lambda p: p.assunto),
-        "interessado": ("Interessado", lambda p: p.interessado),
-        "concessionaria": ("Concessionária", lambda p: p.concessionaria),
-        "gerencia": ("Gerência", lambda p: p.gerencia),
-        "data_entrada": ("Data entrada", lambda p: p.data_entrada.strftime("%d/%m/%Y") if p.data_entrada else ""),
-        "prazo": ("Prazo SUROD", lambda p: p.prazo.strftime("%d/%m/%Y") if p.prazo else ""),
-        "status": ("Status", lambda p: p.status),
-        "prazo_equipe": ("Prazo equipe", lambda p: p.prazo_equipe.strftime("%d/%m/%Y") if p.prazo_equipe else ""),
-        "responsavel_adm": ("Responsável Adm", lambda p: p.responsavel_adm),
-        "coordenadoria": ("Coordenadoria", lambda p: p.coordenadoria),
-        "equipe_area": ("Equipe / Area", lambda p: p.equipe_area),
-        "responsavel_equipe": ("Responsavel (Equipe)", lambda p: p.responsavel_equipe),
-        "tipo_processo": ("Tipo de processo", lambda p: p.tipo_processo),
-        "palavras_chave": ("Palavras-chave", lambda p: p.palavras_chave),
-        "observacoes_complementares": (
-            "Observações complementares",
-            lambda p: p.observacoes_complementares,
-        ),
-        "data_saida": (
-            "Data de saída",
-            lambda p: p.data_saida.strftime("%d/%m/%Y") if p.data_saida else "",
-        ),
-        "destino_saida": (
-            "Destino saída",
-            lambda p: p.tramitado_para if p.finalizado_em else "",
-        ),
-        "finalizado_em": (
-            "Finalizado em",
-            lambda p: p.finalizado_em.strftime("%d/%m/%Y %H:%M") if p.finalizado_em else "",
-        ),
-    }
+    cabecalhos, gerar_linhas = preparar_exportacao_geral(escopo, filtro_gerencia, colunas)
 
-    extras_por_gerencia = obter_campos_por_gerencia()
-    extras_map = {}
-    for ger, campos in extras_por_gerencia.items():
-        for campo in campos:
-            extras_map[f"extra:{ger}:{campo.slug}"] = (campo.label, ger, campo.slug)
+    # Pedidos iguais (mesmos parametros e mesmos dados) reaproveitam a planilha ja gerada.
+    parametros = {
+        "escopo": escopo,
+        "gerencia": filtro_gerencia,
+        "colunas": colunas,
+        "cabecalhos": cabecalhos,
+        "dados": assinatura_tabela_processos(),
+    }
+    job_id = _gerar_job_exportacao(_escopo_job_exportacao(), parametros)
+
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    _limpar_cache_exportacao()
+    estado, _ = _estado_exportacao(job_id)
+    if estado == "pronto":
+        return redirect(url_for("baixar_exportacao_geral", job_id=job_id))
+    if estado == "vazio":
+        flash("Nenhum processo encontrado para exportacao.", "info")
+        return redirect(url_for("index"))
+    if estado != "andamento":
+        _iniciar_exportacao(job_id, cabecalhos, gerar_linhas)
+    return redirect(url_for("status_exportacao_geral", job_id=job_id))
 
-    consulta = Processo.query
-    if filtro_gerencia:
-        consulta = consulta.filter(Processo.gerencia == filtro_gerencia)
-    if escopo == "ativos":
-        consulta = consulta.filter(Processo.finalizado_em.is_(None))
-    elif escopo == "finalizados":
-        consulta = consulta.filter(Processo.finalizado_em.isnot(None))
 
-    processos = consulta.order_by(Processo.atualizado_em.desc()).all()
-    if not processos:
+@app.route("/exportar-geral/status/<job_id>")
+@login_required
+def status_exportacao_geral(job_id: str):
+    """Acompanha uma exportacao geral em andamento."""
+    if not usuario_pode_exportar_global():
+        flash("Sem permissão para exportar relatórios.", "danger")
+        return redirect(url_for("index"))
+    if not _job_exportacao_valido(job_id, _escopo_job_exportacao()):
+        abort(404)
+    estado, _ = _estado_exportacao(job_id)
+    if estado == "vazio":
         flash("Nenhum processo encontrado para exportacao.", "info")
         return redirect(url_for("index"))
+    if estado == "erro":
+        flash("Nao foi possivel gerar a exportacao. Tente novamente.", "danger")
+        return redirect(url_for("index"))
+    if estado == "expirado":
+        flash("A exportacao expirou. Solicite novamente.", "warning")
+        return redirect(url_for("index"))
+    return render_template(
+        "exportacao_status.html",
+        pronto=estado == "pronto",
+        url_download=url_for("baixar_exportacao_geral", job_id=job_id),
+        url_voltar=url_for("index"),
+        texto_voltar="Voltar ao painel",
+    )
 
-    cabecalhos = []
-    for chave in colunas:
-        if chave in base_colunas:
-            cabecalhos.append(base_colunas[chave][0])
-        elif chave in extras_map:
-            label, ger, _ = extras_map[chave]
-            cabecalhos.append(f"{label} ({ger})")
-        else:
-            cabecalhos.append(chave)
-
-    linhas = []
-    for proc in processos:
-        linha = []
-        for chave in colunas:
-            if chave in base_colunas:
-                _, getter = base_colunas[chave]
-                linha.append(getter(proc))
-            elif chave in extras_map:
-                _, ger_destino, slug = extras_map[chave]
-                if proc.gerencia == ger_destino:
-                    linha.append((proc.dados_extra or {}).get(slug, ""))
-                else:
-                    linha.append("")
-            else:
-                linha.append("")
-        linhas.append(linha)
 
-    df = pd.DataFrame(linhas, columns=cabecalhos)
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df.to_excel(writer, sheet_name="Processos", index=False)
-    buffer.seek(0)
-    nome_arquivo = f"processos_geral_{datetime.utcnow():%Y%m%d%H%M}.xlsx"
+@app.route("/exportar-geral/download/<job_id>")
+@login_required
+def baixar_exportacao_geral(job_id: str):
+    """Entrega a planilha gerada em segundo plano."""
+    if not usuario_pode_exportar_global():
+        flash("Sem permissão para exportar relatórios.", "danger")
+        return redirect(url_for("index"))
+    if not _job_exportacao_valido(job_id, _escopo_job_exportacao()):
+        abort(404)
+    estado, caminho = _estado_exportacao(job_id)
+    if estado != "pronto":
+        return redirect(url_for("status_exportacao_geral", job_id=job_id))
+    gerado_em = datetime.utcfromtimestamp(os.path.getmtime(caminho))
     return send_file(
-        buffer,
+        caminho,
         as_attachment=True,
-        download_name=nome_arquivo,
+        download_name=f"processos_geral_{gerado_em:%Y%m%d%H%M}.xlsx",
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
 
@@ -5357,6 +6761,8 @@ def importar_excel():
             return redirect(url_for("importar_excel"))
 
         df_preview.columns = [str(col) for col in df_preview.columns]
+        # A leitura completa vai para parquet em segundo plano enquanto o usuario mapeia.
+        _iniciar_leitura_importacao(caminho, sheet_name, header_index, kwargs)
         colunas = [str(col) for col in df_preview.columns]
         preview = df_preview.fillna("").to_dict(orient="records")
         sugestoes = _sugerir_mapeamento_importacao(colunas)
@@ -5397,22 +6803,27 @@ def importar_excel():
     sheet_name = request.form.get("sheet_name") or 0
     header_row = _normalizar_linha_cabecalho(request.form.get("header_row"), 1)
     header_index = max(header_row - 1, 0)
-    try:
-        kwargs = {"engine": engine} if engine else {}
-        df = pd.read_excel(caminho, sheet_name=sheet_name, header=header_index, **kwargs)
-    except Exception as exc:
-        app.logger.exception("Erro ao ler planilha de importacao: %s", exc)
-        flash(_mensagem_erro_excel(caminho, exc), "danger")
-        _remover_importacao_temp(token)
-        return redirect(url_for("importar_excel"))
-
-    if df.empty:
+    kwargs = {"engine": engine} if engine else {}
+    df_completo = _carregar_dataframe_importacao(caminho, sheet_name, header_index)
+    if df_completo is not None:
+        colunas = list(df_completo.columns)
+    else:
+        try:
+            # Primeiro so o cabecalho: a planilha completa e lida depois apenas com as
+            # colunas mapeadas e as de campos extras (usecols).
+            df_cabecalho = pd.read_excel(
+                caminho, sheet_name=sheet_name, header=header_index, nrows=0, **kwargs
+            )
+        except Exception as exc:
+            app.logger.exception("Erro ao ler planilha de importacao: %s", exc)
+            flash(_mensagem_erro_excel(caminho, exc), "danger")
+            _remover_importacao_temp(token)
+            return redirect(url_for("importar_excel"))
+        colunas = [str(col) for col in df_cabecalho.columns]
+    if not colunas:
         flash("A planilha esta vazia.", "warning")
         _remover_importacao_temp(token)
         return redirect(url_for("importar_excel"))
-
-    df.columns = [str(col) for col in df.columns]
-    colunas = [str(col) for col in df.columns]
     sugestoes = _sugerir_mapeamento_importacao(colunas)
 
     mapeamento_usuario = {}
@@ -5422,10 +6833,27 @@ def importar_excel():
             mapeamento_usuario[campo] = coluna
 
     colunas_map = {**sugestoes, **mapeamento_usuario}
-    colunas_map = {campo: col for campo, col in colunas_map.items() if col in df.columns}
+    colunas_map = {campo: col for campo, col in colunas_map.items() if col in colunas}
 
     if "numero_sei" not in colunas_map:
-        preview = df.head(5).fillna("").to_dict(orient="records")
+        try:
+            if df_completo is not None:
+                df_preview = df_completo.head(5).copy()
+            else:
+                df_preview = pd.read_excel(
+                    caminho, sheet_name=sheet_name, header=header_index, nrows=5, **kwargs
+                )
+        except Exception as exc:
+            app.logger.exception("Erro ao ler planilha de importacao: %s", exc)
+            flash(_mensagem_erro_excel(caminho, exc), "danger")
+            _remover_importacao_temp(token)
+            return redirect(url_for("importar_excel"))
+        if df_preview.empty:
+            flash("A planilha esta vazia.", "warning")
+            _remover_importacao_temp(token)
+            return redirect(url_for("importar_excel"))
+        df_preview.columns = colunas
+        preview = df_preview.fillna("").to_dict(orient="records")
         flash("Mapeie a coluna Número SEI para continuar.", "danger")
         return render_template(
             "importar_excel.html",
@@ -5458,9 +6886,10 @@ def importar_excel():
         for ger, campos in extras_por_gerencia.items()
     }
     extras_colunas = {}
-    for col in df.columns:
-        texto_col = str(col)
-        match = re.match(r"^(.*)\(([^)]+)\)\s*$", texto_col)
+    for col in colunas:
+        if ")" not in col:
+            continue
+        match = REGEX_COLUNA_EXTRA_IMPORTACAO.match(col)
         if not match:
             continue
         label = match.group(1).strip()
@@ -5476,16 +6905,48 @@ def importar_excel():
         if campo_extra:
             extras_colunas[col] = campo_extra
 
+    colunas_usadas = set(colunas_map.values()) | set(extras_colunas)
+    if df_completo is not None:
+        df = df_completo.loc[:, [col for col in df_completo.columns if col in colunas_usadas]]
+    else:
+        try:
+            df = pd.read_excel(
+                caminho,
+                sheet_name=sheet_name,
+                header=header_index,
+                usecols=lambda col: str(col) in colunas_usadas,
+                **kwargs,
+            )
+        except Exception as exc:
+            app.logger.exception("Erro ao ler planilha de importacao: %s", exc)
+            flash(_mensagem_erro_excel(caminho, exc), "danger")
+            _remover_importacao_temp(token)
+            return redirect(url_for("importar_excel"))
+
+    if df.empty:
+        flash("A planilha esta vazia.", "warning")
+        _remover_importacao_temp(token)
+        return redirect(url_for("importar_excel"))
+
+    df.columns = [str(col) for col in df.columns]
+
     importados = 0
-    pendentes_lote = 0
+    processos_lote: List[Dict[str, object]] = []
+    # Movimentacoes do lote referenciam o processo pela posicao em processos_lote.
+    movimentacoes_lote: List[Tuple[int, Dict[str, object]]] = []
     invalidos = []
+    duplicados = []
     responsavel_padrao = current_user.nome or current_user.username or "USUARIO"
 
+    # As linhas sao percorridas com itertuples (tuplas simples); o valor de cada coluna
+    # mapeada e lido pela posicao da coluna no DataFrame.
+    posicao_coluna = {col: posicao for posicao, col in enumerate(df.columns)}
+
     def obter_valor(row, campo):
         col = colunas_map.get(campo)
         if not col:
             return None
-        return row.get(col)
+        return row[posicao_coluna[col]]
 
     def texto_opcional(valor):
         texto = limpar_texto(valor, "")
@@ -5511,7 +6972,7 @@ def importar_excel():
         if isinstance(valor, float) and valor.is_integer():
             return str(int(valor))
         texto = str(valor).strip()
-        if re.fullmatch(r"\d+\.0", texto):
+        if texto.endswith(".0") and REGEX_NUMERO_COM_DECIMAL_ZERO.fullmatch(texto):
             return texto[:-2]
         return texto
 
@@ -5544,44 +7005,113 @@ def importar_excel():
         return None
 
     def _commit_lote_importacao() -> bool:
-        """Confirma o lote atual de importacao no banco."""
-        nonlocal importados, pendentes_lote
-        if pendentes_lote <= 0:
+        """Grava o lote atual de importacao com INSERTs em massa e confirma no banco."""
+        nonlocal importados
+        if not processos_lote:
             return True
         try:
+            ids_processos = db.session.scalars(
+                insert(Processo).returning(Processo.id, sort_by_parameter_order=True),
+                processos_lote,
+            ).all()
+            if movimentacoes_lote:
+                db.session.execute(
+                    insert(Movimentacao),
+                    [
+                        {**dados_mov, "processo_id": ids_processos[indice]}
+                        for indice, dados_mov in movimentacoes_lote
+                    ],
+                )
             db.session.commit()
-            importados += pendentes_lote
-            pendentes_lote = 0
+            importados += len(processos_lote)
+            processos_lote.clear()
+            movimentacoes_lote.clear()
             return True
         except Exception as exc:
             db.session.rollback()
             app.logger.exception("Erro ao salvar lote da importacao: %s", exc)
             return False
 
-    for idx, row in df.iterrows():
-        linha_num = idx + 2
-        numero_raw = limpar_numero_sei(obter_valor(row, "numero_sei"))
-        assunto = limpar_texto(obter_valor(row, "assunto"), "NAO INFORMADO")
-        interessado = limpar_texto(obter_valor(row, "interessado"), "NAO INFORMADO")
+    # Numero SEI e datas sao convertidos coluna a coluna antes do loop; valores repetidos
+    # (datas costumam se repetir muito) sao convertidos uma unica vez.
+    conversores_coluna = {
+        "numero_sei": limpar_numero_sei,
+        "prazo": parse_date,
+        "data_entrada": parse_date,
+        "data_status": parse_date,
+        "prazo_equipe": parse_date,
+        "data_saida": parse_date,
+        "finalizado_em": parse_datetime,
+    }
+    valores_convertidos: Dict[str, list] = {}
+    for campo, conversor in conversores_coluna.items():
+        col = colunas_map.get(campo)
+        if not col:
+            valores_convertidos[campo] = [conversor(None)] * len(df)
+            continue
+        serie = df[col]
+        if conversor in (parse_date, parse_datetime) and pd.api.types.is_datetime64_any_dtype(serie):
+            # Coluna ja lida como data pelo Excel: converte a coluna inteira de uma vez.
+            # Textos continuam em parse_date, que aceita apenas os formatos conhecidos.
+            datas = serie.dt.date if conversor is parse_date else serie
+            valores_convertidos[campo] = datas.astype(object).where(serie.notna(), None).tolist()
+            continue
+        convertidos_por_valor = {}
+        convertidos = []
+        for valor in serie.tolist():
+            try:
+                convertido = convertidos_por_valor[valor]
+            except KeyError:
+                convertido = convertidos_por_valor[valor] = conversor(valor)
+            except TypeError:
+                convertido = conversor(valor)
+            convertidos.append(convertido)
+        valores_convertidos[campo] = convertidos
+
+    # Gerencia e numero formatado (GERENCIA-numero) de cada linha sao resolvidos antes do
+    # loop para consultar em lote quais numeros ja possuem demanda ativa no banco.
+    valores_gerencia = (
+        df[colunas_map["gerencia"]].tolist() if "gerencia" in colunas_map else [None] * len(df)
+    )
+    numeros_linhas: List[Optional[Tuple[str, str, str]]] = []
+    for numero_raw, gerencia_bruta in zip(valores_convertidos["numero_sei"], valores_gerencia):
         if not numero_raw:
-            invalidos.append(f"Linha {linha_num}: Número SEI ausente")
+            numeros_linhas.append(None)
             continue
-
-        gerencia_col = normalizar_gerencia(obter_valor(row, "gerencia"))
         prefixo_gerencia, numero_base = extrair_prefixo_gerencia(numero_raw)
-        gerencia = gerencia_col or prefixo_gerencia or GERENCIA_PADRAO
+        gerencia = normalizar_gerencia(gerencia_bruta) or prefixo_gerencia or GERENCIA_PADRAO
         if not numero_base:
-            invalidos.append(f"Linha {linha_num}: Número SEI ausente")
+            numeros_linhas.append(None)
             continue
+        numeros_linhas.append((gerencia, numero_base, f"{gerencia}-{numero_base}".strip()[:50]))
+
+    numeros_candidatos = sorted({item[2] for item in numeros_linhas if item})
+    numeros_ativos_existentes: Set[str] = set()
+    for inicio in range(0, len(numeros_candidatos), 1000):
+        numeros_ativos_existentes.update(
+            db.session.scalars(
+                select(Processo.numero_sei).where(
+                    Processo.finalizado_em.is_(None),
+                    Processo.numero_sei.in_(numeros_candidatos[inicio : inicio + 1000]),
+                )
+            )
+        )
 
-        numero_formatado = f"{gerencia}-{numero_base}".strip()[:50]
-
-        prazo = parse_date(obter_valor(row, "prazo"))
-        data_entrada = parse_date(obter_valor(row, "data_entrada"))
-        data_status = parse_date(obter_valor(row, "data_status"))
-        prazo_equipe = parse_date(obter_valor(row, "prazo_equipe"))
-        data_saida = parse_date(obter_valor(row, "data_saida"))
-        finalizado_em = parse_datetime(obter_valor(row, "finalizado_em"))
+    for idx, row in enumerate(df.itertuples(index=False, name=None)):
+        linha_num = idx + 2
+        assunto = limpar_texto(obter_valor(row, "assunto"), "NAO INFORMADO")
+        interessado = limpar_texto(obter_valor(row, "interessado"), "NAO INFORMADO")
+        if numeros_linhas[idx] is None:
+            invalidos.append(f"Linha {linha_num}: Número SEI ausente")
+            continue
+        gerencia, numero_base, numero_formatado = numeros_linhas[idx]
+
+        prazo = valores_convertidos["prazo"][idx]
+        data_entrada = valores_convertidos["data_entrada"][idx]
+        data_status = valores_convertidos["data_status"][idx]
+        prazo_equipe = valores_convertidos["prazo_equipe"][idx]
+        data_saida = valores_convertidos["data_saida"][idx]
+        finalizado_em = valores_convertidos["finalizado_em"][idx]
         status_raw = texto_opcional(obter_valor(row, "status"))
         if not finalizado_em and data_saida:
             finalizado_em = datetime.combine(data_saida, datetime.min.time())
@@ -5592,6 +7122,13 @@ def importar_excel():
         if isinstance(finalizado_em, datetime):
             # Importacao de planilha: hora desconhecida, padroniza para 00:00:00.
             finalizado_em = datetime.combine(finalizado_em.date(), datetime.min.time())
+        if not finalizado_em:
+            # Mesma regra do cadastro manual: nao abre segunda demanda ativa com o
+            # mesmo numero na gerencia (linhas ja finalizadas entram como historico).
+            if numero_formatado in numeros_ativos_existentes:
+                duplicados.append(f"Linha {linha_num}: {numero_formatado}")
+                continue
+            numeros_ativos_existentes.add(numero_formatado)
 
         responsavel_adm = (
             limitar_texto_bd(obter_valor(row, "responsavel_adm"), 255)
@@ -5614,7 +7151,7 @@ def importar_excel():
             for col, campo_extra in extras_colunas.items():
                 if campo_extra.gerencia != gerencia:
                     continue
-                valor_extra = row.get(col)
+                valor_extra = row[posicao_coluna[col]]
                 if valor_extra is None:
                     continue
                 try:
@@ -5631,41 +7168,40 @@ def importar_excel():
                     if texto_extra:
                         dados_extra[campo_extra.slug] = texto_extra
 
-        processo = Processo(
-            numero_sei=numero_formatado,
-            assunto=limitar_texto_bd(assunto, 255) or "NAO INFORMADO",
-            interessado=limitar_texto_bd(interessado, 255) or "NAO INFORMADO",
-            concessionaria=limitar_texto_bd(obter_valor(row, "concessionaria"), 255),
-            descricao=texto_opcional(obter_valor(row, "descricao")),
-            gerencia=limitar_texto_bd(gerencia, 50) or GERENCIA_PADRAO,
-            prazo=prazo,
-            data_entrada=data_entrada,
-            responsavel_adm=responsavel_adm,
-            observacao=texto_opcional(obter_valor(row, "observacao")),
-            descricao_melhorada=texto_opcional(obter_valor(row, "descricao_melhorada")),
-            coordenadoria=limitar_texto_bd(obter_valor(row, "coordenadoria"), 255),
-            equipe_area=limitar_texto_bd(obter_valor(row, "equipe_area"), 255),
-            responsavel_equipe=limitar_texto_bd(obter_valor(row, "responsavel_equipe"), 255),
-            tipo_processo=limitar_texto_bd(obter_valor(row, "tipo_processo"), 255),
-            palavras_chave=limitar_texto_bd(obter_valor(row, "palavras_chave"), 255),
-            status=limitar_texto_bd(status_raw, 100),
-            data_status=data_status,
-            prazo_equipe=prazo_equipe,
-            observacoes_complementares=texto_opcional(
-                obter_valor(row, "observacoes_complementares")
-            ),
-            data_saida=data_saida,
-            tramitado_para=tramitado_para,
-            finalizado_em=finalizado_em,
-            finalizado_por=limitar_texto_bd(obter_valor(row, "finalizado_por"), 80),
-            dados_extra=dados_extra,
-        )
-
+        # classificacao_institucional e gravada na coluna descricao (ver Processo).
         classificacao = texto_opcional(obter_valor(row, "classificacao_institucional"))
-        if classificacao:
-            processo.classificacao_institucional = classificacao
-
-        db.session.add(processo)
+        processos_lote.append(
+            {
+                "numero_sei": numero_formatado,
+                "assunto": limitar_texto_bd(assunto, 255) or "NAO INFORMADO",
+                "interessado": limitar_texto_bd(interessado, 255) or "NAO INFORMADO",
+                "concessionaria": limitar_texto_bd(obter_valor(row, "concessionaria"), 255),
+                "descricao": classificacao or texto_opcional(obter_valor(row, "descricao")),
+                "gerencia": limitar_texto_bd(gerencia, 50) or GERENCIA_PADRAO,
+                "prazo": prazo,
+                "data_entrada": data_entrada,
+                "responsavel_adm": responsavel_adm,
+                "observacao": texto_opcional(obter_valor(row, "observacao")),
+                "descricao_melhorada": texto_opcional(obter_valor(row, "descricao_melhorada")),
+                "coordenadoria": limitar_texto_bd(obter_valor(row, "coordenadoria"), 255),
+                "equipe_area": limitar_texto_bd(obter_valor(row, "equipe_area"), 255),
+                "responsavel_equipe": limitar_texto_bd(obter_valor(row, "responsavel_equipe"), 255),
+                "tipo_processo": limitar_texto_bd(obter_valor(row, "tipo_processo"), 255),
+                "palavras_chave": limitar_texto_bd(obter_valor(row, "palavras_chave"), 255),
+                "status": limitar_texto_bd(status_raw, 100),
+                "data_status": data_status,
+                "prazo_equipe": prazo_equipe,
+                "observacoes_complementares": texto_opcional(
+                    obter_valor(row, "observacoes_complementares")
+                ),
+                "data_saida": data_saida,
+                "tramitado_para": tramitado_para,
+                "finalizado_em": finalizado_em,
+                "finalizado_por": limitar_texto_bd(obter_valor(row, "finalizado_por"), 80),
+                "dados_extra": dados_extra,
+            }
+        )
+        indice_lote = len(processos_lote) - 1
 
         # Para linhas importadas sem trilha historica, cria uma trilha minima consistente
         # usando as datas da planilha (cadastro -> finalizacao gerencia -> encerramento geral).
@@ -5684,15 +7220,17 @@ def importar_excel():
                 else datetime.utcnow()
             )
         )
-        db.session.add(
-            Movimentacao(
-                processo=processo,
-                de_gerencia="CADASTRO",
-                para_gerencia=gerencia,
-                motivo="Cadastro importado via planilha",
-                usuario=usuario_evento,
-                tipo="cadastro",
-                criado_em=data_cadastro,
+        movimentacoes_lote.append(
+            (
+                indice_lote,
+                {
+                    "de_gerencia": "CADASTRO",
+                    "para_gerencia": gerencia,
+                    "motivo": "Cadastro importado via planilha",
+                    "usuario": usuario_evento,
+                    "tipo": "cadastro",
+                    "criado_em": data_cadastro,
+                },
             )
         )
 
@@ -5716,31 +7254,34 @@ def importar_excel():
             data_finalizacao_gerencia = datetime.combine(
                 finalizado_em.date(), datetime.min.time()
             )
-            db.session.add(
-                Movimentacao(
-                    processo=processo,
-                    de_gerencia=gerencia,
-                    para_gerencia="SAIDA",
-                    motivo="Finalizacao importada via planilha",
-                    usuario=usuario_evento,
-                    tipo="finalizacao_gerencia",
-                    criado_em=data_finalizacao_gerencia,
-                    dados_snapshot=dados_snapshot_import,
+            movimentacoes_lote.append(
+                (
+                    indice_lote,
+                    {
+                        "de_gerencia": gerencia,
+                        "para_gerencia": "SAIDA",
+                        "motivo": "Finalizacao importada via planilha",
+                        "usuario": usuario_evento,
+                        "tipo": "finalizacao_gerencia",
+                        "criado_em": data_finalizacao_gerencia,
+                        "dados_snapshot": dados_snapshot_import,
+                    },
                 )
             )
-            db.session.add(
-                Movimentacao(
-                    processo=processo,
-                    de_gerencia="SAIDA",
-                    para_gerencia="FINALIZADO",
-                    motivo="Encerramento geral importado via planilha",
-                    usuario=usuario_evento,
-                    tipo="finalizado_geral",
-                    criado_em=finalizado_em,
+            movimentacoes_lote.append(
+                (
+                    indice_lote,
+                    {
+                        "de_gerencia": "SAIDA",
+                        "para_gerencia": "FINALIZADO",
+                        "motivo": "Encerramento geral importado via planilha",
+                        "usuario": usuario_evento,
+                        "tipo": "finalizado_geral",
+                        "criado_em": finalizado_em,
+                    },
                 )
             )
-        pendentes_lote += 1
-        if pendentes_lote >= IMPORT_COMMIT_BATCH_SIZE:
+        if len(processos_lote) >= IMPORT_COMMIT_BATCH_SIZE:
             if not _commit_lote_importacao():
                 flash("Falha ao salvar a importacao no banco de dados.", "danger")
                 _remover_importacao_temp(token)
@@ -5765,6 +7306,14 @@ def importar_excel():
             f"{len(invalidos)} linha(s) ignoradas por falta de Número SEI: {detalhe}.",
             "warning",
         )
+    if duplicados:
+        detalhe = ", ".join(duplicados[:5])
+        if len(duplicados) > 5:
+            detalhe = f"{detalhe}..."
+        flash(
+            f"{len(duplicados)} linha(s) ignoradas por já existir demanda ativa com o mesmo número: {detalhe}.",
+            "warning",
+        )
     return redirect(url_for("index"))
 
 
@@ -5956,7 +7505,7 @@ def gerencia(nome_gerencia):
                 return (proc.prazo_equipe is None, proc.prazo_equipe or date.min)
             return valor
         if slug_coluna in {"finalizado_em"}:
-            return (proc.finalizado_em is None, proc.finalizado_em or datetime.min)
+            return (proc.finalizado_em is None, proc.finalizado_em or _DATA_HORA_MINIMA)
         return _normalizar_coluna(_valor_coluna_scope(proc, scope, slug_coluna))
 
     def ordenar_finalizados(proc: Processo) -> datetime:
@@ -5964,15 +7513,15 @@ def gerencia(nome_gerencia):
         if proc.finalizado_em:
             return proc.finalizado_em
         if proc.data_saida:
-            return datetime.combine(proc.data_saida, datetime.min.time())
+            return datetime.combine(proc.data_saida, _MEIA_NOITE)
         if proc.atualizado_em:
             return proc.atualizado_em
         if proc.criado_em:
             return proc.criado_em
-        return datetime.min
+        return _DATA_HORA_MINIMA
 
     def _ordem_processo(proc: Processo) -> datetime:
-        return proc.atualizado_em or proc.criado_em or datetime.min
+        return proc.atualizado_em or proc.criado_em or _DATA_HORA_MINIMA
 
     def agrupar_processos_saida(
         lista_processos: List[Processo],
@@ -5981,6 +7530,8 @@ def gerencia(nome_gerencia):
         """Agrupa processos da SAIDA por numero base/chave para evitar duplicidade."""
         chave_referencia_por_base = chave_referencia_por_base or {}
         grupos: Dict[tuple, Dict[str, object]] = {}
+        # Ordem do representante atual de cada grupo, calculada uma vez por processo.
+        ordens: Dict[tuple, datetime] = {}
         for proc in lista_processos:
             numero_base = proc.numero_sei_base
             chave_ref = obter_chave_processo_relacional(proc) or (
@@ -5990,6 +7541,7 @@ def gerencia(nome_gerencia):
                 chave_grupo = (f"id:{proc.id}", "")
             else:
                 chave_grupo = (numero_base, chave_ref or "")
+            ordem = _ordem_processo(proc)
             grupo = grupos.get(chave_grupo)
             if not grupo:
                 grupos[chave_grupo] = {
@@ -5998,53 +7550,20 @@ def gerencia(nome_gerencia):
                     "chave_ref": chave_ref,
                     "processos": [proc],
                 }
+                ordens[chave_grupo] = ordem
                 continue
             grupo["processos"].append(proc)
-            if _ordem_processo(proc) > _ordem_processo(grupo["representante"]):
+            if ordem > ordens[chave_grupo]:
                 grupo["representante"] = proc
-        grupos_lista = list(grupos.values())
-        grupos_lista.sort(key=lambda g: _ordem_processo(g["representante"]), reverse=True)
-        return grupos_lista
-
-    def paginar_lista(itens: List[object], pagina_atual: int, por_pagina: int):
-        """Paginação simples para listas já carregadas."""
-        total = len(itens)
-        por_pagina = por_pagina or total or 1
-        total_paginas = max(1, (total + por_pagina - 1) // por_pagina)
-        pagina_atual = max(1, min(pagina_atual, total_paginas))
-        inicio = (pagina_atual - 1) * por_pagina
-        fim = inicio + por_pagina
-
-        class PaginacaoSimples:
-            def __init__(self):
-                self.page = pagina_atual
-                self.per_page = por_pagina
-                self.total = total
-
-            @property
-            def pages(self):
-                return total_paginas
-
-            @property
-            def has_prev(self):
-                return self.page > 1
-
-            @property
-            def has_next(self):
-                return self.page < self.pages
-
-            @property
-            def prev_num(self):
-                return max(1, self.page - 1)
-
-            @property
-            def next_num(self):
-                return min(self.pages, self.page + 1)
-
-        return itens[inicio:fim], PaginacaoSimples()
+                ordens[chave_grupo] = ordem
+        chaves_ordenadas = sorted(ordens, key=ordens.__getitem__, reverse=True)
+        return [grupos[chave] for chave in chaves_ordenadas]
 
     if not SITE_EM_CONFIGURACAO:
-        consulta = Processo.query.filter(
+        # Em desenvolvimento, relacionamento acessado sem ter sido carregado em lote
+        # (carregar_relacionamentos_processos / selectinload) falha em vez de virar N+1.
+        opcoes_carga = [raiseload("*")] if app.debug else []
+        consulta = Processo.query.options(*opcoes_carga).filter(
             Processo.gerencia == gerencia_alvo, Processo.finalizado_em.is_(None)
         )
         if gerencia_alvo == "GABINETE":
@@ -6052,23 +7571,32 @@ def gerencia(nome_gerencia):
         consulta = aplicar_filtros_processo(consulta)
 
         if gerencia_alvo == "SAIDA":
-            processos_filtrados = consulta.order_by(Processo.atualizado_em.desc()).all()
+            # Sem filtro/ordenacao por coluna, agrupar e paginar so precisa das colunas que
+            # definem o grupo; os objetos completos sao carregados apenas para a pagina.
+            somente_resumos = not filtros_coluna and not ordem_coluna
+            if somente_resumos:
+                processos_filtrados = [
+                    ResumoProcessoSaida(
+                        id=linha.id,
+                        numero_sei_base=calcular_numero_sei_base(linha.numero_sei, linha.dados_extra),
+                        dados_extra=linha.dados_extra,
+                        atualizado_em=linha.atualizado_em,
+                        criado_em=linha.criado_em,
+                    )
+                    for linha in consulta.with_entities(
+                        Processo.id,
+                        Processo.numero_sei,
+                        Processo.dados_extra,
+                        Processo.atualizado_em,
+                        Processo.criado_em,
+                    ).order_by(Processo.atualizado_em.desc())
+                ]
+            else:
+                processos_filtrados = consulta.order_by(Processo.atualizado_em.desc()).all()
 
-            bases_filtradas = {
-                proc.numero_sei_base for proc in processos_filtrados if proc.numero_sei_base
-            }
-            relacionados_por_base: Dict[str, List[Processo]] = {}
-            if bases_filtradas:
-                for item in Processo.query.all():
-                    base_item = item.numero_sei_base
-                    if base_item in bases_filtradas:
-                        relacionados_por_base.setdefault(base_item, []).append(item)
-
-            chave_referencia_por_base: Dict[str, Optional[str]] = {}
-            for base_item, relacionados in relacionados_por_base.items():
-                chave_referencia_por_base[base_item] = obter_chave_referencia_unica_por_base(
-                    relacionados
-                )
+            chave_referencia_por_base = obter_chaves_referencia_por_numeros_base(
+                proc.numero_sei_base for proc in processos_filtrados
+            )
 
             grupos_saida = agrupar_processos_saida(
                 processos_filtrados, chave_referencia_por_base
@@ -6086,9 +7614,64 @@ def gerencia(nome_gerencia):
                     reverse=ordem_direcao == "desc",
                 )
             grupos_pagina, paginacao = paginar_lista(grupos_saida, pagina, 10)
+            if somente_resumos:
+                ids_pagina = {proc.id for grupo in grupos_pagina for proc in grupo["processos"]}
+                objetos_pagina = {}
+                if ids_pagina:
+                    objetos_pagina = {
+                        proc.id: proc
+                        for proc in Processo.query.options(*opcoes_carga).filter(
+                            Processo.id.in_(ids_pagina)
+                        )
+                    }
+                # Processos excluidos entre as duas consultas saem do grupo; grupo vazio sai da pagina.
+                grupos_carregados = []
+                for grupo in grupos_pagina:
+                    carregados = [
+                        objetos_pagina[proc.id]
+                        for proc in grupo["processos"]
+                        if proc.id in objetos_pagina
+                    ]
+                    if not carregados:
+                        continue
+                    grupo["representante"] = objetos_pagina.get(
+                        grupo["representante"].id, carregados[0]
+                    )
+                    grupo["processos"] = carregados
+                    grupos_carregados.append(grupo)
+                grupos_pagina = grupos_carregados
             processos = [grupo["representante"] for grupo in grupos_pagina]
+            relacionados_por_base = agrupar_processos_por_numeros_base(
+                grupo["numero_base"] for grupo in grupos_pagina
+            )
+            # As trilhas dos grupos da pagina leem as movimentacoes de todos os relacionados.
+            carregar_relacionamentos_processos(
+                item
+                for grupo in grupos_pagina
+                for item in (
+                    relacionados_por_base.get(grupo["numero_base"], [])
+                    if grupo["numero_base"]
+                    else grupo["processos"]
+                )
+            )
+
+            # Dados extras normalizados uma unica vez por relacionado; as tres passagens abaixo reutilizam.
+            extras_relacionados: Dict[int, Dict[str, object]] = {}
+            for grupo in grupos_pagina:
+                for item in (*grupo["processos"], *relacionados_por_base.get(grupo["numero_base"], [])):
+                    if item.id not in extras_relacionados:
+                        extras_relacionados[item.id] = _normalizar_dados_extra(item.dados_extra)
+
+            ignorar = GERENCIAS_FORA_TRILHA
+
+            def _normalizar_validas(gerencias) -> List[str]:
+                normalizadas = []
+                for ger in gerencias:
+                    ger_norm = normalizar_gerencia(ger, permitir_entrada=True)
+                    if ger_norm and ger_norm not in ignorar:
+                        normalizadas.append(ger_norm)
+                return normalizadas
 
-            ignorar = {"SAIDA", "FINALIZADO", "ENTRADA", "CADASTRO"}
             for grupo in grupos_pagina:
                 rep = grupo["representante"]
                 numero_base = grupo["numero_base"]
@@ -6107,80 +7690,46 @@ def gerencia(nome_gerencia):
                             chave_referencia=chave_ref,
                         )
                     ]
+                # Primeira passagem: normaliza cada relacionado uma vez e monta gerencias_validas,
+                # que filtra as gerencias escolhidas na segunda passagem.
                 gerencias_validas = set()
+                resumos_relacionados = []
                 for item in relacionados_grupo:
-                    extras_item = _normalizar_dados_extra(item.dados_extra)
+                    extras_item = extras_relacionados[item.id]
                     if extras_item.get("devolvido_gabinete"):
                         continue
-                    for ger in coletar_gerencias_envolvidas(item):
-                        ger_norm = normalizar_gerencia(ger, permitir_entrada=True)
-                        if ger_norm and ger_norm not in ignorar:
-                            gerencias_validas.add(ger_norm)
+                    envolvidas_item = _normalizar_validas(coletar_gerencias_envolvidas(item))
                     ger_atual = normalizar_gerencia(item.gerencia, permitir_entrada=True)
-                    if ger_atual and ger_atual not in ignorar:
+                    if not ger_atual or ger_atual in ignorar:
+                        ger_atual = None
+                    gerencias_validas.update(envolvidas_item)
+                    if ger_atual:
                         gerencias_validas.add(ger_atual)
+                    resumos_relacionados.append(
+                        (
+                            item,
+                            _normalizar_validas(extras_item.get("gerencias_escolhidas") or []),
+                            envolvidas_item,
+                            ger_atual,
+                        )
+                    )
 
+                # Segunda passagem: gerencias envolvidas/abertas e trilhas a partir dos resumos.
                 gerencias_env = set()
                 gerencias_abertas = set()
-                for item in relacionados_grupo:
-                    extras_item = _normalizar_dados_extra(item.dados_extra)
-                    if extras_item.get("devolvido_gabinete"):
-                        continue
-                    gerencias_item = extras_item.get("gerencias_escolhidas") or []
-                    gerencias_filtradas = []
-                    if gerencias_item:
-                        for ger in gerencias_item:
-                            ger_norm = normalizar_gerencia(ger, permitir_entrada=True)
-                            if (
-                                ger_norm
-                                and ger_norm not in ignorar
-                                and (not gerencias_validas or ger_norm in gerencias_validas)
-                            ):
-                                gerencias_filtradas.append(ger_norm)
-                    if gerencias_filtradas:
-                        for ger in gerencias_filtradas:
-                            gerencias_env.add(ger)
-                    else:
-                        for ger in coletar_gerencias_envolvidas(item):
-                            ger_norm = normalizar_gerencia(ger, permitir_entrada=True)
-                            if ger_norm and ger_norm not in ignorar:
-                                gerencias_env.add(ger_norm)
-                    ger_atual = normalizar_gerencia(item.gerencia, permitir_entrada=True)
-                    if ger_atual and ger_atual not in ignorar:
+                trilhas_por_chave: Dict[str, Dict[str, object]] = {}
+                for item, escolhidas_item, envolvidas_item, ger_atual in resumos_relacionados:
+                    gerencias_filtradas = [
+                        ger
+                        for ger in escolhidas_item
+                        if not gerencias_validas or ger in gerencias_validas
+                    ]
+                    gerencias_env.update(gerencias_filtradas or envolvidas_item)
+                    if ger_atual:
                         gerencias_env.add(ger_atual)
                         if item.finalizado_em is None:
                             gerencias_abertas.add(ger_atual)
-                gerencias_envolvidas_map[rep.id] = ordenar_gerencias_preferencial(
-                    list(gerencias_env)
-                )
-                gerencias_abertas_map[rep.id] = ordenar_gerencias_preferencial(
-                    list(gerencias_abertas)
-                )
-                trilhas_por_chave: Dict[str, Dict[str, object]] = {}
-                for item in relacionados_grupo:
-                    trilha_itens: List[str] = []
-                    extras_item = _normalizar_dados_extra(item.dados_extra)
-                    if extras_item.get("devolvido_gabinete"):
-                        continue
-                    gerencias_item = extras_item.get("gerencias_escolhidas") or []
-                    if gerencias_item:
-                        for ger in gerencias_item:
-                            ger_norm = normalizar_gerencia(ger, permitir_entrada=True)
-                            if (
-                                ger_norm
-                                and ger_norm not in ignorar
-                                and (not gerencias_validas or ger_norm in gerencias_validas)
-                            ):
-                                trilha_itens.append(ger_norm)
-                    if not trilha_itens:
-                        for ger in coletar_gerencias_envolvidas(item):
-                            ger_norm = normalizar_gerencia(ger, permitir_entrada=True)
-                            if ger_norm and ger_norm not in ignorar:
-                                trilha_itens.append(ger_norm)
-                    if not trilha_itens:
-                        ger_atual = normalizar_gerencia(item.gerencia, permitir_entrada=True)
-                        if ger_atual and ger_atual not in ignorar:
-                            trilha_itens.append(ger_atual)
+                    trilha_itens = gerencias_filtradas or envolvidas_item or ([ger_atual] if ger_atual else [])
                     vistos_trilha = set()
                     trilha_unica: List[str] = []
                     for ger in trilha_itens:
@@ -6195,87 +7744,57 @@ def gerencia(nome_gerencia):
                     if not trilha_unica:
                         continue
                     trilha_texto = " -> ".join(trilha_unica)
-                    ger_atual_open = normalizar_gerencia(item.gerencia, permitir_entrada=True)
-                    aberta = (
-                        item.finalizado_em is None
-                        and ger_atual_open
-                        and ger_atual_open not in ignorar
-                    )
-                    slug_aberta = (
-                        str(ger_atual_open).strip().upper() if aberta and ger_atual_open else ""
-                    )
+                    aberta = item.finalizado_em is None and ger_atual
+                    slug_aberta = str(ger_atual).strip().upper() if aberta else ""
+                    # trilha_unica ja vem com o slug (texto em maiusculas, sem espacos) de cada parte.
                     partes = [
-                        {"nome": ger, "aberta": str(ger).strip().upper() == slug_aberta}
+                        {"nome": ger, "slug": ger.upper(), "aberta": ger.upper() == slug_aberta}
                         for ger in trilha_unica
                     ]
                     registro = trilhas_por_chave.get(trilha_texto)
                     if registro:
                         if aberta:
                             registro["aberta"] = True
-                        partes_reg = registro.get("partes") or []
-                        if partes:
-                            mapa_partes = {
-                                str(item_parte.get("nome", "")).strip().upper(): item_parte
-                                for item_parte in partes_reg
-                                if str(item_parte.get("nome", "")).strip()
-                            }
-                            for item_parte in partes:
-                                if not item_parte.get("aberta"):
-                                    continue
-                                chave = str(item_parte.get("nome", "")).strip().upper()
-                                if chave in mapa_partes:
-                                    mapa_partes[chave]["aberta"] = True
-                                else:
-                                    partes_reg.append(item_parte)
-                            registro["partes"] = partes_reg
+                        mapa_partes = registro["mapa_partes"]
+                        for item_parte in partes:
+                            if not item_parte["aberta"]:
+                                continue
+                            if item_parte["slug"] in mapa_partes:
+                                mapa_partes[item_parte["slug"]]["aberta"] = True
+                            else:
+                                mapa_partes[item_parte["slug"]] = item_parte
+                                registro["partes"].append(item_parte)
                     else:
                         trilhas_por_chave[trilha_texto] = {
                             "texto": trilha_texto,
                             "aberta": aberta,
                             "partes": partes,
+                            "mapa_partes": {parte["slug"]: parte for parte in partes},
                         }
-                trilhas_lista = list(trilhas_por_chave.values())
-                def _nomes_trilha(registro: Dict[str, object]) -> List[str]:
-                    partes_reg = registro.get("partes") or []
-                    nomes = [
-                        str(parte.get("nome", "")).strip()
-                        for parte in partes_reg
-                        if str(parte.get("nome", "")).strip()
-                    ]
-                    if nomes:
-                        return nomes
-                    texto_reg = str(registro.get("texto", "") or "")
-                    return [p.strip() for p in texto_reg.split("->") if p.strip()]
-
-                prefixos: Dict[str, List[Dict[str, object]]] = {}
-                for reg in trilhas_lista:
-                    nomes = _nomes_trilha(reg)
-                    if len(nomes) > 1:
-                        chave = nomes[0].strip().upper()
-                        if chave:
-                            prefixos.setdefault(chave, []).append(reg)
-
-                removidos = set()
-                for reg in trilhas_lista:
-                    nomes = _nomes_trilha(reg)
-                    if len(nomes) != 1:
+                gerencias_envolvidas_map[rep.id] = ordenar_gerencias_preferencial(gerencias_env)
+                gerencias_abertas_map[rep.id] = ordenar_gerencias_preferencial(gerencias_abertas)
+                # Slugs das partes de cada trilha, calculados uma vez: trilhas de uma gerencia so
+                # que iniciam uma trilha maior sao absorvidas por ela (repassando a marca de aberta).
+                slugs_trilhas = []
+                prefixos: Dict[str, List[Dict[str, object]]] = defaultdict(list)
+                for registro in trilhas_por_chave.values():
+                    registro.pop("mapa_partes", None)
+                    slugs = [parte["slug"] for parte in registro["partes"]]
+                    slugs_trilhas.append((registro, slugs))
+                    if len(slugs) > 1:
+                        prefixos[slugs[0]].append(registro)
+
+                trilhas_lista = []
+                for registro, slugs in slugs_trilhas:
+                    if len(slugs) == 1 and slugs[0] in prefixos:
+                        if registro["aberta"]:
+                            for reg_long in prefixos[slugs[0]]:
+                                reg_long["aberta"] = True
+                                for parte in reg_long["partes"]:
+                                    if parte["slug"] == slugs[0]:
+                                        parte["aberta"] = True
                         continue
-                    chave = nomes[0].strip().upper()
-                    if not chave or chave not in prefixos:
-                        continue
-                    if reg.get("aberta"):
-                        for reg_long in prefixos.get(chave, []):
-                            reg_long["aberta"] = True
-                            partes_long = reg_long.get("partes") or []
-                            for parte in partes_long:
-                                nome_parte = str(parte.get("nome", "")).strip().upper()
-                                if nome_parte == chave:
-                                    parte["aberta"] = True
-                            reg_long["partes"] = partes_long
-                    removidos.add(reg.get("texto"))
-
-                if removidos:
-                    trilhas_lista = [reg for reg in trilhas_lista if reg.get("texto") not in removidos]
+                    trilhas_lista.append(registro)
                 trilhas_saida_map[rep.id] = trilhas_lista
         else:
             processos_lista = consulta.order_by(Processo.atualizado_em.desc()).all()
@@ -6291,15 +7810,20 @@ def gerencia(nome_gerencia):
                 )
             processos, paginacao = paginar_lista(processos_lista, pagina, 10)
 
-        consulta_finalizados = Processo.query.filter(
+        consulta_finalizados = Processo.query.options(*opcoes_carga).filter(
             Processo.gerencia == gerencia_alvo, Processo.finalizado_em.isnot(None)
         )
+        if gerencia_alvo == "SAIDA":
+            # A origem de todos os finalizados da SAIDA sai das movimentacoes.
+            consulta_finalizados = consulta_finalizados.options(
+                selectinload(Processo.movimentacoes)
+            )
         if gerencia_alvo == "GABINETE":
             consulta_finalizados = aplicar_filtro_devolvidos_gabinete(consulta_finalizados)
         consulta_finalizados = aplicar_filtros_processo(consulta_finalizados)
         finalizados = consulta_finalizados.order_by(Processo.finalizado_em.desc()).all()
         if pode_ver_devolvidos:
-            consulta_devolvidos = Processo.query.filter(
+            consulta_devolvidos = Processo.query.options(*opcoes_carga).filter(
                 Processo.gerencia == "GABINETE",
                 Processo.finalizado_em.is_(None),
             )
@@ -6323,73 +7847,30 @@ def gerencia(nome_gerencia):
             )
         # Inclui processos finalizados nesta gerencia e tramitados para outra.
         if gerencia_alvo != "SAIDA":
-            ids_saida = [
-                pid
-                for (pid,) in db.session.query(Movimentacao.processo_id)
-                .filter(
-                    Movimentacao.de_gerencia == gerencia_alvo,
-                    Movimentacao.para_gerencia == "SAIDA",
-                )
-                .all()
-            ]
-            if ids_saida:
-                ids_saida = [
-                    pid
-                    for (pid,) in Processo.query.filter(
-                        Processo.id.in_(ids_saida), Processo.gerencia == "SAIDA"
-                    )
-                    .with_entities(Processo.id)
-                    .all()
-                ]
-            ids_finalizacao = [
-                pid
-                for (pid,) in db.session.query(Movimentacao.processo_id)
-                .filter(
-                    Movimentacao.de_gerencia == gerencia_alvo,
-                    Movimentacao.tipo == "finalizacao_gerencia",
-                )
-                .all()
-            ]
-            ids_devolvidos = [
-                pid
-                for (pid,) in db.session.query(Movimentacao.processo_id)
-                .filter(
-                    Movimentacao.de_gerencia == "SAIDA",
-                    Movimentacao.para_gerencia != "SAIDA",
-                    Movimentacao.tipo == "movimentacao",
-                )
-                .all()
-            ]
-            if ids_devolvidos:
-                ids_devolvidos = set(
-                    pid
-                    for (pid,) in Processo.query.filter(
-                        Processo.id.in_(ids_devolvidos),
-                        Processo.gerencia != "SAIDA",
-                        Processo.finalizado_em.is_(None),
-                    )
-                    .with_entities(Processo.id)
-                    .all()
-                )
-            else:
-                ids_devolvidos = set()
-            ids_extras = {pid for pid in ids_saida + ids_finalizacao if pid not in ids_devolvidos}
+            ids_extras = listar_ids_finalizados_fora_da_gerencia(gerencia_alvo)
             if ids_extras:
-                finalizados_ids = {p.id for p in finalizados}
+                finalizados_por_id = {p.id: p for p in finalizados}
+                # Os que ja vieram em finalizados passaram pelos mesmos filtros; so os
+                # demais sao carregados.
+                for pid in ids_extras & finalizados_por_id.keys():
+                    origens_saida[pid] = gerencia_alvo
+                ids_carregar = ids_extras - finalizados_por_id.keys()
                 extras = (
-                    aplicar_filtros_processo(Processo.query.filter(Processo.id.in_(ids_extras)))
+                    aplicar_filtros_processo(
+                        Processo.query.options(*opcoes_carga).filter(Processo.id.in_(ids_carregar))
+                    )
                     .order_by(Processo.atualizado_em.desc())
                     .all()
+                    if ids_carregar
+                    else []
                 )
                 for proc in extras:
                     origens_saida[proc.id] = gerencia_alvo
-                finalizados = list({p.id: p for p in finalizados + extras}.values())
+                    finalizados_por_id[proc.id] = proc
+                finalizados = list(finalizados_por_id.values())
         else:
             # Quando a gerencia e SAIDA exibimos a origem real
-            for proc in processos:
-                origens_saida[proc.id] = obter_origem_saida(proc)
-            for proc in finalizados:
-                origens_saida[proc.id] = obter_origem_saida(proc)
+            origens_saida.update(obter_origens_saida([*processos, *finalizados]))
         if finalizados:
             if filtros_coluna:
                 finalizados = [
@@ -6440,6 +7921,7 @@ def gerencia(nome_gerencia):
             if request.args.get("ack_meus_processos"):
                 session["meus_processos_visto"] = meus_processos_total_usuario
 
+    carregar_relacionamentos_processos([*processos, *finalizados, *devolvidos])
     for lista_proc in (processos, finalizados, devolvidos):
         for processo in lista_proc:
             processo.dados_extra = _normalizar_dados_extra(getattr(processo, "dados_extra", None))
@@ -6449,8 +7931,8 @@ def gerencia(nome_gerencia):
     def _normalizar_texto_historico(texto: Optional[str]) -> str:
         return " ".join((texto or "").strip().lower().split())
 
-    def _prioridade_evento_historico(texto: Optional[str]) -> int:
-        texto_norm = _normalizar_texto_historico(texto)
+    def _prioridade_evento_historico(texto_norm: str) -> int:
+        # Recebe o texto ja normalizado por _normalizar_texto_historico.
         if texto_norm.startswith("destino saida"):
             return 40
         if "processo encerrado em saida" in texto_norm:
@@ -6469,7 +7951,7 @@ def gerencia(nome_gerencia):
             or (processo.assigned_to.nome or processo.assigned_to.username if processo.assigned_to else None)
             or "usuario"
         )
-        movs = sorted(processo.movimentacoes, key=lambda m: m.criado_em or datetime.min)
+        movs = sorted(processo.movimentacoes, key=lambda m: m.criado_em or _DATA_HORA_MINIMA)
 
         possui_evento_cadastro = any((m.tipo or "").lower() == "cadastro" for m in movs)
         if not possui_evento_cadastro and processo.criado_em:
@@ -6509,7 +7991,7 @@ def gerencia(nome_gerencia):
             )
 
         eventos_ordenados = sorted(
-            eventos, key=lambda e: e["quando"] or datetime.min
+            eventos, key=lambda e: e["quando"] or _DATA_HORA_MINIMA
         )
         destino_saida = processo.tramitado_para if processo.gerencia == "SAIDA" else None
         if destino_saida:
@@ -6524,6 +8006,8 @@ def gerencia(nome_gerencia):
                     {"quando": quando_destino, "texto": texto_destino}
                 )
 
+        # Cada evento guarda (quando, prioridade, evento): o texto e normalizado uma vez
+        # e serve tanto para a deduplicacao quanto para a prioridade na ordenacao.
         eventos_unicos = []
         vistos_eventos = set()
         for evento in eventos_ordenados:
@@ -6532,53 +8016,40 @@ def gerencia(nome_gerencia):
                 chave_quando = int(quando.timestamp())
             else:
                 chave_quando = 0
-            chave_evento = (
-                _normalizar_texto_historico(evento.get("texto")),
-                chave_quando,
-            )
+            texto_norm = _normalizar_texto_historico(evento.get("texto"))
+            chave_evento = (texto_norm, chave_quando)
             if chave_evento in vistos_eventos:
                 continue
             vistos_eventos.add(chave_evento)
-            eventos_unicos.append(evento)
+            eventos_unicos.append(
+                (evento["quando"] or _DATA_HORA_MINIMA, _prioridade_evento_historico(texto_norm), evento)
+            )
 
         # Exibe historico do mais recente para o mais antigo.
-        eventos_ordenados = sorted(
-            eventos_unicos,
-            key=lambda e: (
-                e["quando"] or datetime.min,
-                _prioridade_evento_historico(e.get("texto")),
-            ),
-            reverse=True,
-        )
-        historico_finalizados[processo.id] = eventos_ordenados
+        eventos_unicos.sort(key=lambda item: item[:2], reverse=True)
+        historico_finalizados[processo.id] = [evento for _, _, evento in eventos_unicos]
 
+    # Snapshot da ultima saida de cada finalizado desta gerencia, lido das movimentacoes
+    # ja carregadas em lote (carregar_relacionamentos_processos), sem nova consulta.
     snapshots_finalizados: Dict[int, Dict[str, object]] = {}
-    if finalizados:
-        ids_finalizados = [p.id for p in finalizados]
-        movs = (
-            Movimentacao.query.filter(
-                Movimentacao.processo_id.in_(ids_finalizados),
-                Movimentacao.de_gerencia == gerencia_alvo,
-                Movimentacao.tipo.in_(["finalizacao_gerencia", "movimentacao"]),
-            )
-            .order_by(Movimentacao.criado_em.desc())
-            .all()
+    for processo in finalizados:
+        ultima_saida = max(
+            (
+                mov
+                for mov in processo.movimentacoes
+                if mov.de_gerencia == gerencia_alvo and mov.tipo in TIPOS_MOVIMENTACAO_SAIDA_GERENCIA
+            ),
+            key=lambda mov: mov.criado_em or _DATA_HORA_MINIMA,
+            default=None,
         )
-        for mov in movs:
-            if mov.processo_id in snapshots_finalizados:
-                continue
-            snapshot = _normalizar_snapshot(getattr(mov, "dados_snapshot", None)) or {}
-            if snapshot.get("data_status"):
-                snapshot["data_status"] = parse_date(snapshot.get("data_status"))
-            if snapshot.get("prazo_equipe"):
-                snapshot["prazo_equipe"] = parse_date(snapshot.get("prazo_equipe"))
-            if snapshot.get("prazo"):
-                snapshot["prazo"] = parse_date(snapshot.get("prazo"))
-            if snapshot.get("data_entrada"):
-                snapshot["data_entrada"] = parse_date(snapshot.get("data_entrada"))
-            if snapshot.get("data_entrada_geplan"):
-                snapshot["data_entrada_geplan"] = parse_date(snapshot.get("data_entrada_geplan"))
-            snapshots_finalizados[mov.processo_id] = snapshot
+        if ultima_saida is None:
+            continue
+        snapshot = dict(_normalizar_snapshot(ultima_saida.dados_snapshot) or {})
+        for campo in CAMPOS_DATA_SNAPSHOT:
+            valor = snapshot.get(campo)
+            if valor:
+                snapshot[campo] = parse_date(valor)
+        snapshots_finalizados[processo.id] = snapshot
 
     opcoes_coordenadorias = _ordenar_nomes_unicos(
         obter_coordenadorias_por_gerencia_base(gerencia_alvo)
@@ -6896,7 +8367,7 @@ def api_gerencia_column_options(nome_gerencia: str):
         if slug == "finalizado_em":
             return proc.finalizado_em.strftime("%d/%m/%Y") if proc.finalizado_em else "-"
         if slug == "gerencia_de_origem":
-            return obter_origem_saida(proc) or "-"
+            return origens_lista.get(proc.id) or "-"
         if slug == "origem_da_devolucao":
             return limpar_texto(dados_extra.get("origem_devolucao"), "") or "-"
         if slug == "motivo_da_devolucao":
@@ -6935,65 +8406,22 @@ def api_gerencia_column_options(nome_gerencia: str):
         consulta_finalizados = aplicar_filtros_processo(consulta_finalizados)
         lista = consulta_finalizados.order_by(Processo.finalizado_em.desc()).all()
         if gerencia_alvo != "SAIDA":
-            ids_saida = [
-                pid
-                for (pid,) in db.session.query(Movimentacao.processo_id)
-                .filter(
-                    Movimentacao.de_gerencia == gerencia_alvo,
-                    Movimentacao.para_gerencia == "SAIDA",
-                )
-                .all()
-            ]
-            if ids_saida:
-                ids_saida = [
-                    pid
-                    for (pid,) in Processo.query.filter(
-                        Processo.id.in_(ids_saida), Processo.gerencia == "SAIDA"
-                    )
-                    .with_entities(Processo.id)
-                    .all()
-                ]
-            ids_finalizacao = [
-                pid
-                for (pid,) in db.session.query(Movimentacao.processo_id)
-                .filter(
-                    Movimentacao.de_gerencia == gerencia_alvo,
-                    Movimentacao.tipo == "finalizacao_gerencia",
-                )
-                .all()
-            ]
-            ids_devolvidos = [
-                pid
-                for (pid,) in db.session.query(Movimentacao.processo_id)
-                .filter(
-                    Movimentacao.de_gerencia == "SAIDA",
-                    Movimentacao.para_gerencia != "SAIDA",
-                    Movimentacao.tipo == "movimentacao",
-                )
-                .all()
-            ]
-            if ids_devolvidos:
-                ids_devolvidos = set(
-                    pid
-                    for (pid,) in Processo.query.filter(
-                        Processo.id.in_(ids_devolvidos),
-                        Processo.gerencia != "SAIDA",
-                        Processo.finalizado_em.is_(None),
-                    )
-                    .with_entities(Processo.id)
-                    .all()
-                )
-            else:
-                ids_devolvidos = set()
-            ids_extras = {pid for pid in ids_saida + ids_finalizacao if pid not in ids_devolvidos}
-            if ids_extras:
+            ids_extras = listar_ids_finalizados_fora_da_gerencia(gerencia_alvo)
+            lista_por_id = {p.id: p for p in lista}
+            ids_carregar = ids_extras - lista_por_id.keys()
+            if ids_carregar:
                 extras = (
-                    aplicar_filtros_processo(Processo.query.filter(Processo.id.in_(ids_extras)))
+                    aplicar_filtros_processo(Processo.query.filter(Processo.id.in_(ids_carregar)))
                     .order_by(Processo.atualizado_em.desc())
                     .all()
                 )
-                lista = list({p.id: p for p in (lista + extras)}.values())
+                for proc in extras:
+                    lista_por_id[proc.id] = proc
+                lista = list(lista_por_id.values())
 
+    origens_lista: Dict[int, Optional[str]] = {}
+    if "gerencia_de_origem" in filtros_coluna or col_slug == "gerencia_de_origem":
+        origens_lista = obter_origens_saida(lista)
     lista = [proc for proc in lista if _proc_atende_cf(proc)]
     unicos: Dict[str, str] = {}
     for proc in lista:
@@ -7005,6 +8433,54 @@ def api_gerencia_column_options(nome_gerencia: str):
     return jsonify({"ok": True, "values": valores})
 
 
+def _filtros_exportacao_gerencia(gerencia_alvo: str, escopo: str) -> list:
+    """Condicoes da exportacao da gerencia para o escopo (ativos, finalizados ou todos)."""
+    filtros = [Processo.gerencia == gerencia_alvo]
+    if escopo == "finalizados":
+        filtros.append(Processo.finalizado_em.isnot(None))
+    elif escopo != "todos":  # ativos
+        filtros.append(Processo.finalizado_em.is_(None))
+    return filtros
+
+
+def preparar_exportacao_gerencia(gerencia_alvo: str, escopo: str, colunas: List[str]):
+    """Monta cabecalhos e o gerador de linhas da exportacao de uma gerencia."""
+    extras_defs = listar_campos_gerencia(gerencia_alvo)
+    extras_map = {f"extra:{c.slug}": c for c in extras_defs}
+
+    atributos_necessarios = {"id"}
+    cabecalhos = []
+    getters = []
+    for chave in colunas:
+        if chave in COLUNAS_EXPORTACAO_PROCESSOS:
+            rotulo, getter, atributos = COLUNAS_EXPORTACAO_PROCESSOS[chave]
+            cabecalhos.append(rotulo)
+            getters.append(getter)
+            atributos_necessarios.update(atributos)
+        elif chave in extras_map:
+            atributos_necessarios.add("dados_extra")
+            cabecalhos.append(extras_map[chave].label)
+            getters.append(
+                lambda p, slug=extras_map[chave].slug: (p.dados_extra or {}).get(slug, "")
+            )
+        else:
+            cabecalhos.append(chave)
+            getters.append(lambda p: "")
+
+    consulta = (
+        select(*(getattr(Processo, nome) for nome in sorted(atributos_necessarios)))
+        .where(*_filtros_exportacao_gerencia(gerencia_alvo, escopo))
+        .order_by(Processo.atualizado_em.desc())
+        .execution_options(yield_per=500)
+    )
+
+    def gerar_linhas():
+        for proc in db.session.execute(consulta):
+            yield [getter(proc) for getter in getters]
+
+    return cabecalhos, gerar_linhas
+
+
 @app.route("/gerencia/<string:nome_gerencia>/exportar", methods=["POST"])
 @login_required
 def exportar_gerencia(nome_gerencia: str):
@@ -7023,93 +8499,125 @@ def exportar_gerencia(nome_gerencia: str):
         flash("Selecione ao menos uma coluna para exportar.", "warning")
         return redirect(url_for("gerencia", nome_gerencia=gerencia_alvo))
 
-    base_colunas = {
-        "numero_sei": ("Número SEI", lambda p: p.numero_sei_base),
-        "assunto": ("Assunto", lambda p: p.assunto),
-        "interessado": ("Interessado", lambda p: p.interessado),
-        "concessionaria": ("Concessionária", lambda p: p.concessionaria),
-        "gerencia": ("Gerência", lambda p: p.gerencia),
-        "data_entrada": ("Data entrada", lambda p: p.data_entrada.strftime("%d/%m/%Y") if p.data_entrada else ""),
-        "prazo": ("Prazo SUROD", lambda p: p.prazo.strftime("%d/%m/%Y") if p.prazo else ""),
-        "status": ("Status", lambda p: p.status),
-        "prazo_equipe": ("Prazo equipe", lambda p: p.prazo_equipe.strftime("%d/%m/%Y") if p.prazo_equipe else ""),
-        "responsavel_adm": ("Responsável Adm", lambda p: p.responsavel_adm),
-        "coordenadoria": ("Coordenadoria", lambda p: p.coordenadoria),
-        "equipe_area": ("Equipe / Área", lambda p: p.equipe_area),
-        "responsavel_equipe": ("Responsável (Equipe)", lambda p: p.responsavel_equipe),
-        "tipo_processo": ("Tipo de processo", lambda p: p.tipo_processo),
-        "palavras_chave": ("Palavras-chave", lambda p: p.palavras_chave),
-        "observacoes_complementares": (
-            "Observações complementares",
-            lambda p: p.observacoes_complementares,
-        ),
-        "data_saida": (
-            "Data de saída",
-            lambda p: p.data_saida.strftime("%d/%m/%Y") if p.data_saida else "",
-        ),
-        "destino_saida": (
-            "Destino saída",
-            lambda p: p.tramitado_para if p.finalizado_em else "",
-        ),
-        "finalizado_em": (
-            "Finalizado em",
-            lambda p: p.finalizado_em.strftime("%d/%m/%Y %H:%M") if p.finalizado_em else "",
-        ),
-    }
+    formato = request.form.get("formato") or "xlsx"
+    cabecalhos, gerar_linhas = preparar_exportacao_gerencia(gerencia_alvo, escopo, colunas)
+
+    sufixo_csv = ""
+    if formato != "csv":
+        # Mesmo fluxo da exportacao geral: a planilha e gerada em segundo plano e pedidos
+        # iguais (mesmos parametros e mesmos dados) reaproveitam o arquivo ja gerado.
+        parametros = {
+            "gerencia_exportacao": gerencia_alvo,
+            "escopo": escopo,
+            "colunas": colunas,
+            "cabecalhos": cabecalhos,
+            "dados": assinatura_tabela_processos(),
+        }
+        job_id = _gerar_job_exportacao(_escopo_job_exportacao(gerencia_alvo), parametros)
+        url_status = url_for(
+            "status_exportacao_gerencia", nome_gerencia=gerencia_alvo, job_id=job_id
+        )
 
-    extras_defs = listar_campos_gerencia(gerencia_alvo)
-    extras_map = {f"extra:{c.slug}": c for c in extras_defs}
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        _limpar_cache_exportacao()
+        estado, _ = _estado_exportacao(job_id)
+        if estado == "pronto":
+            return redirect(
+                url_for("baixar_exportacao_gerencia", nome_gerencia=gerencia_alvo, job_id=job_id)
+            )
+        if estado == "vazio":
+            flash("Nenhum processo encontrado para exportacao.", "info")
+            return redirect(url_for("gerencia", nome_gerencia=gerencia_alvo))
+        if estado == "andamento":
+            return redirect(url_status)
 
-    if escopo == "finalizados":
-        consulta = Processo.query.filter(
-            Processo.gerencia == gerencia_alvo, Processo.finalizado_em.isnot(None)
-        )
-    elif escopo == "todos":
-        consulta = Processo.query.filter(Processo.gerencia == gerencia_alvo)
-    else:  # ativos
-        consulta = Processo.query.filter(
-            Processo.gerencia == gerencia_alvo, Processo.finalizado_em.is_(None)
+        # So conta quando nao ha planilha pronta nem em andamento para reaproveitar.
+        total_previsto = db.session.scalar(
+            select(func.count(Processo.id)).where(
+                *_filtros_exportacao_gerencia(gerencia_alvo, escopo)
+            )
         )
-
-    processos = consulta.order_by(Processo.atualizado_em.desc()).all()
-    if not processos:
+        if total_previsto <= EXPORT_CSV_LIMITE_LINHAS:
+            _iniciar_exportacao(job_id, cabecalhos, gerar_linhas)
+            return redirect(url_status)
+        # Acima do limite o Excel fica lento demais; a troca fica indicada no nome do CSV.
+        sufixo_csv = f"_csv_acima_de_{EXPORT_CSV_LIMITE_LINHAS}_linhas"
+
+    # CSV sai direto na resposta, linha a linha, sem passar pela planilha em segundo plano.
+    linhas = gerar_linhas()
+    primeira = next(linhas, None)
+    if primeira is None:
         flash("Nenhum processo encontrado para exportacao.", "info")
         return redirect(url_for("gerencia", nome_gerencia=gerencia_alvo))
+    nome_arquivo = (
+        f"processos_{gerencia_alvo.lower()}_{datetime.utcnow():%Y%m%d%H%M}{sufixo_csv}.csv"
+    )
+    resposta = Response(
+        stream_with_context(gerar_csv_processos(cabecalhos, chain([primeira], linhas))),
+        mimetype="text/csv",
+    )
+    resposta.headers["Content-Disposition"] = f'attachment; filename="{nome_arquivo}"'
+    return resposta
 
-    linhas = []
-    cabecalhos = []
-    for chave in colunas:
-        if chave in base_colunas:
-            cabecalhos.append(base_colunas[chave][0])
-        elif chave in extras_map:
-            cabecalhos.append(extras_map[chave].label)
-        else:
-            cabecalhos.append(chave)
 
-    for proc in processos:
-        linha = []
-        for chave in colunas:
-            if chave in base_colunas:
-                _, getter = base_colunas[chave]
-                linha.append(getter(proc))
-            elif chave in extras_map:
-                val = (proc.dados_extra or {}).get(extras_map[chave].slug, "")
-                linha.append(val)
-            else:
-                linha.append("")
-        linhas.append(linha)
+@app.route("/gerencia/<string:nome_gerencia>/exportar/status/<job_id>")
+@login_required
+def status_exportacao_gerencia(nome_gerencia: str, job_id: str):
+    """Acompanha uma exportacao de gerencia em andamento."""
+    gerencia_alvo = normalizar_gerencia(nome_gerencia, permitir_entrada=True)
+    if not gerencia_alvo:
+        flash("Gerência inválida para exportação.", "warning")
+        return redirect(url_for("index"))
+    if not usuario_pode_exportar_gerencia(gerencia_alvo):
+        flash("Sem permissão para exportar relatórios desta gerência.", "danger")
+        return redirect(url_for("gerencia", nome_gerencia=gerencia_alvo))
+    if not _job_exportacao_valido(job_id, _escopo_job_exportacao(gerencia_alvo)):
+        abort(404)
+    url_voltar = url_for("gerencia", nome_gerencia=gerencia_alvo)
+    estado, _ = _estado_exportacao(job_id)
+    if estado == "vazio":
+        flash("Nenhum processo encontrado para exportacao.", "info")
+        return redirect(url_voltar)
+    if estado == "erro":
+        flash("Nao foi possivel gerar a exportacao. Tente novamente.", "danger")
+        return redirect(url_voltar)
+    if estado == "expirado":
+        flash("A exportacao expirou. Solicite novamente.", "warning")
+        return redirect(url_voltar)
+    return render_template(
+        "exportacao_status.html",
+        pronto=estado == "pronto",
+        url_download=url_for(
+            "baixar_exportacao_gerencia", nome_gerencia=gerencia_alvo, job_id=job_id
+        ),
+        url_voltar=url_voltar,
+        texto_voltar="Voltar à gerência",
+    )
 
-    df = pd.DataFrame(linhas, columns=cabecalhos)
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df.to_excel(writer, sheet_name="Processos", index=False)
-    buffer.seek(0)
 
-    nome_arquivo = f"processos_{gerencia_alvo.lower()}_{datetime.utcnow():%Y%m%d%H%M}.xlsx"
+@app.route("/gerencia/<string:nome_gerencia>/exportar/download/<job_id>")
+@login_required
+def baixar_exportacao_gerencia(nome_gerencia: str, job_id: str):
+    """Entrega a planilha da gerencia gerada em segundo plano."""
+    gerencia_alvo = normalizar_gerencia(nome_gerencia, permitir_entrada=True)
+    if not gerencia_alvo:
+        flash("Gerência inválida para exportação.", "warning")
+        return redirect(url_for("index"))
+    if not usuario_pode_exportar_gerencia(gerencia_alvo):
+        flash("Sem permissão para exportar relatórios desta gerência.", "danger")
+        return redirect(url_for("gerencia", nome_gerencia=gerencia_alvo))
+    if not _job_exportacao_valido(job_id, _escopo_job_exportacao(gerencia_alvo)):
+        abort(404)
+    estado, caminho = _estado_exportacao(job_id)
+    if estado != "pronto":
+        return redirect(
+            url_for("status_exportacao_gerencia", nome_gerencia=gerencia_alvo, job_id=job_id)
+        )
+    gerado_em = datetime.utcfromtimestamp(os.path.getmtime(caminho))
     return send_file(
-        buffer,
+        caminho,
         as_attachment=True,
-        download_name=nome_arquivo,
+        download_name=f"processos_{gerencia_alvo.lower()}_{gerado_em:%Y%m%d%H%M}.xlsx",
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
 
@@ -7149,6 +8657,7 @@ def gerencia_campos(nome_gerencia):
                 )
                 db.session.add(campo)
                 db.session.commit()
+                g.pop("campos_por_gerencia", None)
                 flash("Campo extra criado.", "success")
             return redirect(url_for("gerencia_campos", nome_gerencia=gerencia_alvo))
         elif acao == "remover":
@@ -7158,12 +8667,21 @@ def gerencia_campos(nome_gerencia):
                 abort(400)
             slug_removido = campo.slug
             db.session.delete(campo)
-            for processo in Processo.query.filter_by(gerencia=gerencia_alvo).all():
+            # So os processos que tem o campo preenchido sao carregados (filtro no SQL).
+            consulta = Processo.query.options(
+                load_only(Processo.id, Processo.dados_extra), lazyload("*")
+            ).filter(Processo.gerencia == gerencia_alvo)
+            condicao = _condicao_dados_extra_com_chave(slug_removido)
+            if condicao is not None:
+                consulta = consulta.filter(condicao)
+            for processo in consulta:
                 dados = processo.dados_extra or {}
                 if slug_removido in dados:
-                    dados.pop(slug_removido, None)
-                    processo.dados_extra = dados
+                    processo.dados_extra = {
+                        chave: valor for chave, valor in dados.items() if chave != slug_removido
+                    }
             db.session.commit()
+            g.pop("campos_por_gerencia", None)
             flash("Campo extra removido.", "info")
             return redirect(url_for("gerencia_campos", nome_gerencia=gerencia_alvo))
 
@@ -7246,7 +8764,15 @@ def novo_processo():
 
         data_entrada = obter_data("data_entrada", "Data de entrada")
         numero_sei = obter_texto("sei", "Numero SEI")
-        analise_numero = analisar_numero_para_cadastro(numero_sei)
+        # Demandas do mesmo numero base buscadas uma vez para a analise, a propagacao
+        # de dados base e a chave de referencia.
+        numero_base = extrair_numero_base_sei(numero_sei)
+        relacionados_mesmo_numero: List[Processo] = (
+            listar_processos_por_numero_base(numero_base) if numero_base else []
+        )
+        analise_numero = analisar_numero_para_cadastro(
+            numero_sei, relacionados=relacionados_mesmo_numero
+        )
         prazo = obter_data("prazo", "Prazo SUROD", obrigatorio=False)
         assunto = obter_texto("assunto", "Assunto")
         interessado = obter_texto("interessado", "Interessado")
@@ -7254,11 +8780,7 @@ def novo_processo():
         responsavel_adm = obter_texto("responsavel_adm", "Responsável Adm")
         observacao = obter_texto_opcional("observacao")
         if concessionaria:
-            mapa_concessionarias = {
-                normalizar_chave(item): item for item in CONCESSIONARIAS if item
-            }
-            concessionaria_norm = normalizar_chave(concessionaria)
-            concessionaria_ok = mapa_concessionarias.get(concessionaria_norm)
+            concessionaria_ok = MAPA_CONCESSIONARIAS.get(normalizar_chave(concessionaria))
             if not concessionaria_ok:
                 erros_invalidos.append("Concessionária")
                 campos_invalidos.append("concessionaria")
@@ -7352,17 +8874,11 @@ def novo_processo():
             "numero_sei_original": numero_sei,
             "responsavel_adm_inicial": responsavel_adm,
         }
-        numero_base = analise_numero.get("numero_base") or extrair_numero_base_sei(numero_sei)
 
         # Se o numero ja existe, pode haver alteracao de dados imutaveis do processo.
         # Nesse caso, propaga assunto/interessado/concessionaria para todas as demandas
         # (ativas e finalizadas) do mesmo numero base.
         campos_propagados = []
-        relacionados_mesmo_numero: List[Processo] = []
-        if numero_base:
-            relacionados_mesmo_numero = [
-                p for p in Processo.query.all() if p.numero_sei_base == numero_base
-            ]
         if relacionados_mesmo_numero:
             referencia_existente = sorted(
                 relacionados_mesmo_numero,
@@ -7403,10 +8919,8 @@ def novo_processo():
             # Novo retorno de processo ja encerrado: inicia ciclo novo e nao consolida com historico anterior.
             chave_processo = gerar_nova_chave_processo(numero_base)
         elif not chave_processo and numero_base:
-            relacionados = [
-                p for p in Processo.query.all() if p.numero_sei_base == numero_base
-            ]
-            chave_processo = obter_chave_referencia_unica_por_base(relacionados)
+            # A propagacao acima nao altera numero nem chave das demandas relacionadas.
+            chave_processo = obter_chave_referencia_unica_por_base(relacionados_mesmo_numero)
 
         for ger_destino, numero_atual in zip(gerencias_normalizadas, numeros_para_criar):
             processo = Processo(
@@ -7431,8 +8945,9 @@ def novo_processo():
                     ),
                 },
             )
+            # Sem flush por gerencia: a movimentacao referencia o processo pelo relacionamento e
+            # o commit grava todos os processos e depois todas as movimentacoes em lote.
             db.session.add(processo)
-            db.session.flush()
             db.session.add(
                 Movimentacao(
                     processo=processo,
@@ -7541,14 +9056,6 @@ def verificar_dados():
     data_inicio = parse_date(data_inicio_str) if data_inicio_str else None
     data_fim = parse_date(data_fim_str) if data_fim_str else None
 
-    def _parse_iso_datetime(valor: Optional[str]) -> Optional[datetime]:
-        if not valor:
-            return None
-        try:
-            return datetime.fromisoformat(valor)
-        except Exception:
-            return None
-
     def _data_somente(valor: object) -> Optional[date]:
         if isinstance(valor, datetime):
             return valor.date()
@@ -7971,32 +9478,8 @@ def verificar_dados():
             total=total_bases,
             pages=total_paginas,
         )
-        def _chave_exata(proc: Processo) -> tuple:
-            """Suprime apenas linhas 100% idênticas; mantém variações."""
-            return (
-                proc.id,
-                proc.numero_sei_base,
-                proc.numero_sei,
-                proc.gerencia,
-                proc.data_entrada,
-                proc.assunto,
-                proc.interessado,
-                proc.concessionaria,
-                proc.classificacao_institucional,
-                proc.coordenadoria,
-                proc.equipe_area,
-                proc.responsavel_equipe,
-                proc.responsavel_adm,
-                proc.status,
-                proc.tipo_processo,
-                proc.palavras_chave,
-                proc.finalizado_em,
-                proc.prazo,
-                proc.prazo_equipe,
-            )
-
-        processos = []
-        vistos_processos: Set[tuple] = set()
+        # A consulta nao tem join que multiplique linhas (assigned_to e muitos-para-um e os
+        # filtros por movimentacao usam EXISTS), entao cada processo ja aparece uma unica vez.
         iter_processos = processos_raw
         if not coluna_ordem:
             iter_processos = sorted(
@@ -8004,74 +9487,33 @@ def verificar_dados():
                 key=lambda p: (p.finalizado_em or datetime.min, p.atualizado_em or datetime.min),
                 reverse=True,
             )
-        for proc in iter_processos:
-            chave = _chave_exata(proc)
-            if chave in vistos_processos:
-                continue
-            vistos_processos.add(chave)
-            processos.append(proc)
+        processos = iter_processos
         processos_union = list(processos_raw)
         processos_por_id = {proc.id: proc for proc in processos_union}
+        # Nome do responsavel atribuido (assigned_to ja veio no joinedload), usado como planilhador
+        # quando responsavel_adm esta vazio no registro, no movimento e na demanda.
+        planilhador_por_id = {
+            proc.id: proc.assigned_to.nome or proc.assigned_to.username
+            for proc in processos_union
+            if proc.assigned_to
+        }
 
-        def _gerencias_unicas(origem: List[str]) -> List[str]:
-            vistos = set()
-            resultado: List[str] = []
-            for nome in origem:
-                if not nome:
-                    continue
-                chave = nome.strip().upper()
-                if chave not in vistos:
-                    vistos.add(chave)
-                    resultado.append(nome.strip())
-            return resultado
-
-        def _ordenar_gerencias(origem: List[str]) -> List[str]:
-            return ordenar_gerencias_preferencial(_gerencias_unicas(origem))
-
+        # processos_raw vem agrupado por numero base; sem ordenacao por coluna a mesma
+        # ordenacao global ja foi feita em iter_processos (sorted e estavel).
+        if coluna_ordem:
+            processos_ordenados = sorted(
+                processos_union,
+                key=lambda p: (p.finalizado_em or datetime.min, p.atualizado_em or datetime.min),
+                reverse=True,
+            )
+        else:
+            processos_ordenados = iter_processos
         processos_data = []
-        vistos_data: Set[tuple] = set()
-        for proc in sorted(
-            processos_union,
-            key=lambda p: (p.finalizado_em or datetime.min, p.atualizado_em or datetime.min),
-            reverse=True,
-        ):
+        for proc in processos_ordenados:
             base = serializar_processo_para_relatorio(proc)
-            movimentos = base.get("movimentacoes") or []
-            movimentos = sorted(movimentos, key=lambda m: m.get("data") or "")
-            gerencias = []
-            gerencias.extend(base.get("gerencias_involvidas") or [])
-            dados_extra_base = base.get("dados_extra") or {}
-            if isinstance(dados_extra_base, dict):
-                gerencias.extend(dados_extra_base.get("gerencias_escolhidas") or [])
-            gerencias.append(base.get("gerencia"))
-            for mov in movimentos:
-                gerencias.extend([mov.get("de"), mov.get("para")])
-            ignorar = {"SAIDA", "FINALIZADO", "ENTRADA", "CADASTRO"}
-            gerencias = [g for g in gerencias if g and str(g).strip() and str(g).strip().upper() not in ignorar]
-            base["movimentacoes"] = movimentos
-            base["gerencias_involvidas"] = _ordenar_gerencias(
-                [g for g in gerencias if g and str(g).strip()]
-            )
-            chave_data = (
-                base.get("id"),
-                base.get("numero_sei_base") or base.get("numero_sei"),
-                base.get("gerencia"),
-                base.get("data_entrada"),
-                base.get("assunto"),
-                base.get("interessado"),
-                base.get("concessionaria"),
-                base.get("coordenadoria"),
-                base.get("equipe_area"),
-                base.get("status"),
-                base.get("finalizado_em"),
-                base.get("responsavel_adm"),
-                base.get("responsavel_equipe"),
-                base.get("tipo_processo"),
-                base.get("palavras_chave"),
-            )
-            if chave_data in vistos_data:
-                continue
-            vistos_data.add(chave_data)
+            # A serializacao ja entrega as movimentacoes em ordem de criado_em.
+            base["movimentacoes"] = base.get("movimentacoes") or []
+            base["gerencias_involvidas"] = trilha_gerencias_relatorio(base)
             processos_data.append(base)
 
         def _registro_finalizado_por_processo(
@@ -8116,38 +9558,44 @@ def verificar_dados():
                 )
             dados_extra = proc.get("dados_extra") or {}
             planilhador = proc.get("responsavel_adm")
-            if proc_ref and not planilhador:
-                if proc_ref.assigned_to:
-                    planilhador = proc_ref.assigned_to.nome or proc_ref.assigned_to.username
-            data_entrada_gerencia = (
-                data_entrada_na_gerencia(proc_ref, "SAIDA") if proc_ref else None
-            )
-            gerencia_origem = obter_origem_saida(proc_ref) if proc_ref else None
-            destino_saida = proc_ref.tramitado_para if proc_ref else None
+            # Campos do processo carregado lidos uma vez, sem repetir o teste de proc_ref por campo.
+            if proc_ref:
+                if not planilhador:
+                    planilhador = planilhador_por_id.get(proc_ref.id, planilhador)
+                numero_sei_base = proc_ref.numero_sei_base
+                data_entrada = proc_ref.data_entrada
+                concessionaria = proc_ref.concessionaria
+                prazo = proc_ref.prazo
+                classificacao_institucional = proc_ref.classificacao_institucional
+                descricao_melhorada = proc_ref.descricao_melhorada
+                data_saida = proc_ref.data_saida
+                data_entrada_gerencia = data_entrada_na_gerencia(proc_ref, "SAIDA")
+                gerencia_origem = obter_origem_saida(proc_ref)
+                destino_saida = proc_ref.tramitado_para
+            else:
+                numero_sei_base = proc.get("numero_sei_base") or proc.get("numero_sei")
+                data_entrada = concessionaria = prazo = classificacao_institucional = None
+                descricao_melhorada = data_saida = data_entrada_gerencia = gerencia_origem = destino_saida = None
             return {
                 "id": proc.get("id"),
                 "numero_sei": proc.get("numero_sei"),
-                "numero_sei_base": (
-                    proc_ref.numero_sei_base if proc_ref else proc.get("numero_sei_base") or proc.get("numero_sei")
-                ),
+                "numero_sei_base": numero_sei_base,
                 "chave_relacionamento": proc.get("chave_relacionamento"),
-                "data_entrada": proc_ref.data_entrada if proc_ref else None,
+                "data_entrada": data_entrada,
                 "assunto": proc.get("assunto"),
                 "interessado": proc.get("interessado"),
-                "concessionaria": proc_ref.concessionaria if proc_ref else None,
+                "concessionaria": concessionaria,
                 "gerencia": gerencias_concat or gerencia_final,
                 "gerencia_origem": gerencia_origem,
                 "destino_saida": destino_saida,
-                "prazo": proc_ref.prazo if proc_ref else None,
+                "prazo": prazo,
                 "coordenadoria": snapshot.get("coordenadoria") or proc.get("coordenadoria"),
                 "equipe_area": snapshot.get("equipe_area") or proc.get("equipe_area"),
                 "responsavel_equipe": snapshot.get("responsavel_equipe") or proc.get("responsavel_equipe"),
                 "status": status_val,
                 "status_equipe": status_equipe,
-                "classificacao_institucional": (
-                    proc_ref.classificacao_institucional if proc_ref else None
-                ),
-                "descricao_melhorada": proc_ref.descricao_melhorada if proc_ref else None,
+                "classificacao_institucional": classificacao_institucional,
+                "descricao_melhorada": descricao_melhorada,
                 "finalizado_em": data_final,
                 "responsavel_adm": proc.get("responsavel_adm"),
                 "planilhador": planilhador,
@@ -8157,35 +9605,46 @@ def verificar_dados():
                 "observacoes_complementares": observacoes_complementares,
                 "data_entrada_gerencia": data_entrada_gerencia,
                 "dados_extra": dados_extra,
-                "data_saida": proc_ref.data_saida if proc_ref else None,
+                "data_saida": data_saida,
             }
 
         def _normalizar_str(valor: Optional[str]) -> str:
             return (valor or "").strip().lower()
 
+        # Filtros normalizados uma vez; os laços abaixo so normalizam os valores das linhas.
+        filtro_gerencia_norm = _normalizar_str(filtro_gerencia)
+        coordenadoria_norm = _normalizar_str(coordenadoria)
+        equipe_norm = _normalizar_str(equipe)
+        interessado_norm = _normalizar_str(interessado)
+
         registros_finalizados = []
         for proc in processos_data:
-            proc_ref = processos_por_id.get(proc.get("id"))
-            registro = _registro_finalizado_por_processo(proc, proc_ref)
-            if not registro:
+            # Filtros que so leem o processo serializado rodam antes de montar o registro completo.
+            if interessado and _normalizar_str(proc.get("interessado")) != interessado_norm:
                 continue
-
-            gerencias_lista = (proc.get("gerencias_involvidas") or []) + (
-                [proc.get("gerencia")] if proc.get("gerencia") else []
-            )
-            gerencias_lista = [
-                g for g in gerencias_lista if g and _normalizar_str(g) not in {"saida", "finalizado", "entrada", "cadastro"}
-            ]
-
-            if filtro_gerencia and not any(_normalizar_str(g) == _normalizar_str(filtro_gerencia) for g in gerencias_lista):
+            if numero_sei and numero_sei.lower() not in (proc.get("numero_sei") or "").lower():
                 continue
-            if coordenadoria and _normalizar_str(registro.get("coordenadoria")) != _normalizar_str(coordenadoria):
+            gerencias_lista: List[str] = []
+            # Cada gerencia e normalizada uma vez; o filtro vira consulta ao conjunto.
+            gerencias_norm: Set[str] = set()
+            for g in chain(proc.get("gerencias_involvidas") or (), (proc.get("gerencia"),)):
+                if not g:
+                    continue
+                g_norm = _normalizar_str(g)
+                if g_norm in GERENCIAS_FORA_TRILHA_MINUSCULAS:
+                    continue
+                gerencias_lista.append(g)
+                gerencias_norm.add(g_norm)
+            if filtro_gerencia and filtro_gerencia_norm not in gerencias_norm:
                 continue
-            if equipe and _normalizar_str(registro.get("equipe_area")) != _normalizar_str(equipe):
+
+            proc_ref = processos_por_id.get(proc.get("id"))
+            registro = _registro_finalizado_por_processo(proc, proc_ref)
+            if not registro:
                 continue
-            if interessado and _normalizar_str(registro.get("interessado")) != _normalizar_str(interessado):
+            if coordenadoria and _normalizar_str(registro.get("coordenadoria")) != coordenadoria_norm:
                 continue
-            if numero_sei and numero_sei.lower() not in (registro.get("numero_sei") or "").lower():
+            if equipe and _normalizar_str(registro.get("equipe_area")) != equipe_norm:
                 continue
             if not _atende_filtro_datas(
                 registro.get("data_entrada"),
@@ -8193,13 +9652,27 @@ def verificar_dados():
             ):
                 continue
 
-            gerencias_lista = _ordenar_gerencias(gerencias_lista)
+            gerencias_lista = ordenar_gerencias_preferencial(gerencias_lista)
             registro["gerencia"] = " -> ".join(gerencias_lista) if gerencias_lista else registro.get("gerencia")
             registros_finalizados.append(registro)
 
         # Calcula ciclos por numero base + mesma gerencia de origem (regra de ciclo de retorno).
+        # Uma unica passada monta os grupos de ciclo e os grupos por numero base (painel de finalizados).
         registros_por_base_all: Dict[str, List[Dict[str, object]]] = defaultdict(list)
+        processos_por_base: Dict[str, List[Dict[str, object]]] = defaultdict(list)
+        chave_data_final = itemgetter("_data_final_ordem")
+
+        def _data_final_registro(reg: Dict[str, object]) -> datetime:
+            val = reg.get("finalizado_em")
+            if isinstance(val, datetime):
+                return val
+            if isinstance(val, str):
+                return _parse_iso_datetime(val) or datetime.min
+            return datetime.min
+
         for registro in registros_finalizados:
+            # Data final resolvida uma vez; as ordenacoes abaixo so leem a chave.
+            registro["_data_final_ordem"] = _data_final_registro(registro)
             base = (
                 (registro.get("numero_sei_base") or registro.get("numero_sei") or "").strip().lower()
                 or f"id:{registro.get('id')}"
@@ -8209,57 +9682,27 @@ def verificar_dados():
             ) or "sem-gerencia"
             chave_grupo_ciclo = f"{base}::{ger_origem}"
             registros_por_base_all[chave_grupo_ciclo].append(registro)
-        ciclo_por_id: Dict[int, Dict[str, int]] = {}
-        total_ciclos_por_grupo: Dict[str, int] = {}
-        for chave_grupo_ciclo, lista_base in registros_por_base_all.items():
-            lista_base.sort(
-                key=lambda r: (
-                    r.get("finalizado_em")
-                    if isinstance(r.get("finalizado_em"), datetime)
-                    else (_parse_iso_datetime(r.get("finalizado_em")) if isinstance(r.get("finalizado_em"), str) else datetime.min)
-                )
-                or datetime.min
-            )
+            processos_por_base[base].append(registro)
+        # Processos sem ciclo registrado contam como ciclo unico.
+        ciclo_por_id: Dict[int, Dict[str, int]] = defaultdict(
+            lambda: {"ciclo_numero": 1, "ciclos_total": 1}
+        )
+        # Cada processo gera um unico registro, entao o ciclo e gravado no proprio laco dos grupos.
+        for lista_base in registros_por_base_all.values():
+            lista_base.sort(key=chave_data_final)
             total = len(lista_base)
-            total_ciclos_por_grupo[chave_grupo_ciclo] = total
             for indice, registro in enumerate(lista_base, start=1):
-                if registro.get("id") is not None:
-                    ciclo_por_id[int(registro.get("id"))] = {
-                        "ciclo_numero": indice,
-                        "ciclos_total": total,
-                    }
+                if registro.get("id") is None:
+                    # Sem id, vale o total do grupo.
+                    registro["ciclo_numero"] = total
+                    registro["ciclos_total"] = total
+                    continue
+                ciclo_por_id[int(registro["id"])] = {"ciclo_numero": indice, "ciclos_total": total}
+                registro["ciclo_numero"] = indice
+                registro["ciclos_total"] = total
 
         registros_finalizados_todos = list(registros_finalizados)
 
-        for registro in registros_finalizados_todos:
-            base = (
-                (registro.get("numero_sei_base") or registro.get("numero_sei") or "").strip().lower()
-                or f"id:{registro.get('id')}"
-            )
-            ger_origem = _normalizar_str(
-                registro.get("gerencia_origem") or registro.get("gerencia")
-            ) or "sem-gerencia"
-            chave_grupo_ciclo = f"{base}::{ger_origem}"
-            ciclo_info = (
-                ciclo_por_id.get(int(registro.get("id")))
-                if registro.get("id") is not None
-                else None
-            ) or {}
-            registro["ciclo_numero"] = int(
-                ciclo_info.get("ciclo_numero") or total_ciclos_por_grupo.get(chave_grupo_ciclo) or 1
-            )
-            registro["ciclos_total"] = int(
-                ciclo_info.get("ciclos_total") or total_ciclos_por_grupo.get(chave_grupo_ciclo) or 1
-            )
-
-        def _data_final_registro(reg: Dict[str, object]) -> datetime:
-            val = reg.get("finalizado_em")
-            if isinstance(val, datetime):
-                return val
-            if isinstance(val, str):
-                return _parse_iso_datetime(val) or datetime.min
-            return datetime.min
-
         processos: List[Dict[str, object]] = []
         filtros_consolidado_ativos = any(
             [
@@ -8272,31 +9715,25 @@ def verificar_dados():
         )
         # Processos finalizados: exibe todos os retornos juntos (lado a lado por numero base),
         # mesmo quando os filtros do painel principal estao ativos.
-        processos_por_base: Dict[str, List[Dict[str, object]]] = defaultdict(list)
-        for registro in registros_finalizados_todos:
-            chave_base = (
-                (registro.get("numero_sei_base") or registro.get("numero_sei") or "").strip().lower()
-                or f"id:{registro.get('id')}"
-            )
-            processos_por_base[chave_base].append(registro)
-
+        # Cada grupo e ordenado uma vez; o primeiro item ja e a data final mais recente da base.
+        grupos_ordenados = {
+            base: sorted(lista, key=chave_data_final, reverse=True)
+            for base, lista in processos_por_base.items()
+        }
         bases_ordenadas = sorted(
-            processos_por_base.keys(),
-            key=lambda base: max(
-                (_data_final_registro(r) for r in processos_por_base[base]),
-                default=datetime.min,
-            ),
+            grupos_ordenados,
+            key=lambda base: chave_data_final(grupos_ordenados[base][0]),
             reverse=True,
         )
         for base in bases_ordenadas:
-            grupo = sorted(processos_por_base[base], key=_data_final_registro, reverse=True)
+            grupo = grupos_ordenados[base]
             grupo_total = len(grupo)
             principal = dict(grupo[0]) if grupo else {}
             principal["grupo_retorno"] = grupo_total > 1
             principal["grupo_retorno_total"] = grupo_total
 
             pares_datas: List[Dict[str, object]] = []
-            vistos_pares: Set[str] = set()
+            vistos_pares: Set[Tuple[Optional[date], Optional[datetime], str]] = set()
             cores_pares = (
                 "pareado-1",
                 "pareado-2",
@@ -8323,10 +9760,11 @@ def verificar_dados():
                     data_final_item = _parse_iso_datetime(data_final_item)
                 if isinstance(data_final_item, date) and not isinstance(data_final_item, datetime):
                     data_final_item = datetime.combine(data_final_item, datetime.min.time())
+                # Tupla com as proprias datas (sem isoformat); valores ausentes viram None.
                 chave_par = (
-                    f"{data_entrada_item.isoformat() if isinstance(data_entrada_item, date) else '-'}::"
-                    f"{data_final_item.isoformat() if isinstance(data_final_item, datetime) else '-'}::"
-                    f"{(item.get('gerencia_origem') or item.get('gerencia') or '').strip().lower()}"
+                    data_entrada_item if isinstance(data_entrada_item, date) else None,
+                    data_final_item if isinstance(data_final_item, datetime) else None,
+                    (item.get("gerencia_origem") or item.get("gerencia") or "").strip().lower(),
                 )
                 if chave_par in vistos_pares:
                     continue
@@ -8351,17 +9789,16 @@ def verificar_dados():
                 )
 
             datas_entrada_unicas: List[date] = []
-            vistos_datas_entrada: Set[str] = set()
+            vistos_datas_entrada: Set[date] = set()
             for item in grupo:
                 data_item = item.get("data_entrada_gerencia") or item.get("data_entrada")
                 if isinstance(data_item, datetime):
                     data_item = data_item.date()
                 if not isinstance(data_item, date):
                     continue
-                chave_data = data_item.isoformat()
-                if chave_data in vistos_datas_entrada:
+                if data_item in vistos_datas_entrada:
                     continue
-                vistos_datas_entrada.add(chave_data)
+                vistos_datas_entrada.add(data_item)
                 datas_entrada_unicas.append(data_item)
             datas_entrada_unicas.sort(reverse=True)
             principal["datas_entrada"] = datas_entrada_unicas
@@ -8381,10 +9818,10 @@ def verificar_dados():
                 if not partes:
                     partes = [valor]
                 for parte in partes:
-                    if _normalizar_str(parte) in {"saida", "finalizado", "entrada", "cadastro"}:
+                    if _normalizar_str(parte) in GERENCIAS_FORA_TRILHA_MINUSCULAS:
                         continue
                     gerencias_group.append(parte)
-            gerencias_group = _ordenar_gerencias(gerencias_group)
+            gerencias_group = ordenar_gerencias_preferencial(gerencias_group)
             if gerencias_group:
                 principal["gerencia"] = " -> ".join(gerencias_group)
 
@@ -8571,7 +10008,9 @@ def verificar_dados():
             consulta_andamento = consulta_andamento.filter(Processo.numero_sei.ilike(f"%{numero_sei}%"))
 
         total_andamento = consulta_andamento.count()
-        duracoes_segundos = []
+        # Soma e contagem acumuladas direto, como em obter_metricas_processos.
+        soma_segundos = 0.0
+        quantidade = 0
         for registro in processos:
             proc_ref = processos_por_id.get(registro.get("id"))
             data_entrada = proc_ref.data_entrada if proc_ref else registro.get("data_entrada")
@@ -8579,14 +10018,11 @@ def verificar_dados():
             if isinstance(finalizado_em, str):
                 finalizado_em = _parse_iso_datetime(finalizado_em)
             if data_entrada and finalizado_em:
-                entrada_dt = datetime.combine(data_entrada, datetime.min.time())
+                entrada_dt = datetime.combine(data_entrada, _MEIA_NOITE)
                 if finalizado_em >= entrada_dt:
-                    duracoes_segundos.append((finalizado_em - entrada_dt).total_seconds())
-        tempo_medio_dias = (
-            (sum(duracoes_segundos) / len(duracoes_segundos)) / 86400
-            if duracoes_segundos
-            else None
-        )
+                    soma_segundos += (finalizado_em - entrada_dt).total_seconds()
+                    quantidade += 1
+        tempo_medio_dias = (soma_segundos / quantidade) / 86400 if quantidade else None
         metricas_base = {
             "andamento": int(total_andamento),
             "finalizados": int(total_finalizados_indicador),
@@ -8608,14 +10044,23 @@ def verificar_dados():
         ids_processos_union = [proc.id for proc in processos_union if proc.id is not None]
         movimentos_demanda: List[Movimentacao] = []
         if ids_processos_union:
+            # Os processos de processos_union ja vieram com movimentacoes e responsavel carregados
+            # (selectinload/joinedload da consulta principal), entao mov.processo sai do identity
+            # map e cada bloco consulta so as movimentacoes, sem repetir o eager loading.
             base_mov_query = (
-                Movimentacao.query.options(
-                    joinedload(Movimentacao.processo).joinedload(Processo.assigned_to),
-                    joinedload(Movimentacao.processo).selectinload(Processo.movimentacoes),
-                )
+                Movimentacao.query
                 .filter(Movimentacao.tipo.in_(["finalizacao_gerencia", "finalizado_geral"]))
                 .order_by(Movimentacao.criado_em.desc())
             )
+            # A gerencia do movimento (de_gerencia) ja filtra no SQL; sem de_gerencia vale a
+            # gerencia do processo, entao essas linhas seguem para a conferencia em Python.
+            de_gerencia_norm = func.lower(func.trim(Movimentacao.de_gerencia))
+            sem_de_gerencia = func.coalesce(func.trim(Movimentacao.de_gerencia), "") == ""
+            base_mov_query = base_mov_query.filter(or_(sem_de_gerencia, de_gerencia_norm != "saida"))
+            if filtro_gerencia:
+                base_mov_query = base_mov_query.filter(
+                    or_(sem_de_gerencia, de_gerencia_norm == filtro_gerencia_norm)
+                )
             # SQLite possui limite de parametros no IN; consulta em blocos.
             bloco = 700
             for inicio_idx in range(0, len(ids_processos_union), bloco):
@@ -8628,18 +10073,30 @@ def verificar_dados():
             if not proc:
                 continue
             gerencia_mov = mov.de_gerencia or proc.gerencia
-            if _normalizar_str(gerencia_mov) == "saida":
+            gerencia_mov_norm = _normalizar_str(gerencia_mov)
+            if gerencia_mov_norm == "saida":
                 continue
-            if filtro_gerencia and _normalizar_str(gerencia_mov) != _normalizar_str(filtro_gerencia):
+            if filtro_gerencia and gerencia_mov_norm != filtro_gerencia_norm:
+                continue
+            # Filtros que so dependem do processo descartam a linha antes de montar o snapshot.
+            if interessado and _normalizar_str(proc.interessado) != interessado_norm:
+                continue
+            if numero_sei and numero_sei.lower() not in (proc.numero_sei or "").lower():
+                continue
+            if not _atende_filtro_datas(proc.data_entrada, proc.data_saida):
                 continue
             snapshot = _normalizar_snapshot(getattr(mov, "dados_snapshot", None)) or {}
             coord = snapshot.get("coordenadoria") or proc.coordenadoria
+            if coordenadoria and _normalizar_str(coord) != coordenadoria_norm:
+                continue
             equipe_area = snapshot.get("equipe_area") or proc.equipe_area
+            if equipe and _normalizar_str(equipe_area) != equipe_norm:
+                continue
             responsavel_equipe = snapshot.get("responsavel_equipe") or proc.responsavel_equipe
             status_val = snapshot.get("status") or proc.status
             planilhador = proc.responsavel_adm
-            if not planilhador and proc.assigned_to:
-                planilhador = proc.assigned_to.nome or proc.assigned_to.username
+            if not planilhador:
+                planilhador = planilhador_por_id.get(proc.id, planilhador)
             prazo_equipe = parse_date(snapshot.get("prazo_equipe")) if snapshot else None
             if not prazo_equipe:
                 prazo_equipe = proc.prazo_equipe
@@ -8653,17 +10110,6 @@ def verificar_dados():
             dados_extra = snapshot.get("extras") or proc.dados_extra or {}
             data_entrada_gerencia = data_entrada_na_gerencia(proc, gerencia_mov)
 
-            if coordenadoria and _normalizar_str(coord) != _normalizar_str(coordenadoria):
-                continue
-            if equipe and _normalizar_str(equipe_area) != _normalizar_str(equipe):
-                continue
-            if interessado and _normalizar_str(proc.interessado) != _normalizar_str(interessado):
-                continue
-            if numero_sei and numero_sei.lower() not in (proc.numero_sei or "").lower():
-                continue
-            if not _atende_filtro_datas(proc.data_entrada, proc.data_saida):
-                continue
-
             chave_rel = gerar_chave_relacionamento_numero(
                 proc.numero_sei_base,
                 obter_chave_processo_relacional(proc),
@@ -8703,8 +10149,8 @@ def verificar_dados():
                     "dados_extra": dados_extra,
                     "data_saida": proc.data_saida,
                     "finalizado_em": mov.criado_em,
-                    "ciclo_numero": (ciclo_por_id.get(proc.id) or {}).get("ciclo_numero", 1),
-                    "ciclos_total": (ciclo_por_id.get(proc.id) or {}).get("ciclos_total", 1),
+                    "ciclo_numero": ciclo_por_id[proc.id]["ciclo_numero"],
+                    "ciclos_total": ciclo_por_id[proc.id]["ciclos_total"],
                 }
             )
 
@@ -8738,8 +10184,8 @@ def verificar_dados():
                         data_final = mov_final.criado_em
 
             planilhador = registro.get("planilhador") or registro.get("responsavel_adm")
-            if not planilhador and proc_ref and proc_ref.assigned_to:
-                planilhador = proc_ref.assigned_to.nome or proc_ref.assigned_to.username
+            if not planilhador and proc_ref:
+                planilhador = planilhador_por_id.get(proc_ref.id, planilhador)
             prazo_equipe = registro.get("prazo_equipe")
             if isinstance(prazo_equipe, str):
                 prazo_equipe = parse_date(prazo_equipe)
@@ -8809,23 +10255,17 @@ def verificar_dados():
             )
 
         # Em demandas, o ciclo so conta quando repete o mesmo numero + mesma gerencia.
-        demandas_por_base_gerencia: Dict[str, List[Dict[str, object]]] = defaultdict(list)
+        demandas_por_base_gerencia: Dict[Tuple[str, str], List[Dict[str, object]]] = defaultdict(list)
         for demanda in demandas:
             base = (
                 (demanda.get("numero_sei_base") or demanda.get("numero_sei") or "").strip().lower()
                 or f"id:{demanda.get('id')}"
             )
             ger = _normalizar_str(demanda.get("gerencia") or demanda.get("gerencia_origem")) or "sem-gerencia"
-            demandas_por_base_gerencia[f"{base}::{ger}"].append(demanda)
-        for _, lista_demandas in demandas_por_base_gerencia.items():
-            lista_demandas.sort(
-                key=lambda d: (
-                    d.get("finalizado_em")
-                    if isinstance(d.get("finalizado_em"), datetime)
-                    else (_parse_iso_datetime(d.get("finalizado_em")) if isinstance(d.get("finalizado_em"), str) else datetime.min)
-                )
-                or datetime.min
-            )
+            demandas_por_base_gerencia[(base, ger)].append(demanda)
+        for lista_demandas in demandas_por_base_gerencia.values():
+            # Mesma data final usada nos registros (_data_final_registro le finalizado_em).
+            lista_demandas.sort(key=_data_final_registro)
             total = len(lista_demandas)
             for idx, demanda in enumerate(lista_demandas, start=1):
                 demanda["ciclo_numero_mesma_gerencia"] = idx
@@ -8857,11 +10297,16 @@ def verificar_dados():
                 # numero_sei_base e propriedade Python (nao coluna SQL),
                 # entao mapeamos ids candidatos antes de consultar com eager loading.
                 ids_relacionados: Set[int] = set()
-                candidatos = db.session.query(
+                consulta_candidatos = db.session.query(
                     Processo.id,
                     Processo.numero_sei,
                     Processo.dados_extra,
-                ).all()
+                )
+                # O SQL descarta o que nao pode casar com as bases; sem suporte no banco,
+                # percorre a tabela inteira como antes.
+                candidatos = _consultar_candidatos_numero_base(
+                    consulta_candidatos, sorted(bases_numero_sei)
+                )
                 for proc_id, numero_sei_item, dados_extra_item in candidatos:
                     numero_base_item = ""
                     if isinstance(dados_extra_item, dict):
@@ -8977,30 +10422,30 @@ def verificar_dados():
                     if not ger_txt:
                         continue
                     ger_norm = ger_txt.upper()
-                    if ger_norm in {"SAIDA", "FINALIZADO", "ENTRADA", "CADASTRO"}:
+                    if ger_norm in GERENCIAS_FORA_TRILHA:
                         continue
                     if ger_norm not in trilha_norm:
                         trilha.append(ger_txt)
                         trilha_norm.add(ger_norm)
-                proc_data["gerencias_involvidas"] = _ordenar_gerencias(trilha)
+                proc_data["gerencias_involvidas"] = ordenar_gerencias_preferencial(trilha)
 
     if not SITE_EM_CONFIGURACAO:
-        duracoes_demandas = []
+        soma_segundos_demandas = 0.0
+        quantidade_demandas = 0
         for demanda in demandas:
             data_entrada = demanda.get("data_entrada")
             finalizado_em = demanda.get("finalizado_em")
             if isinstance(finalizado_em, str):
                 finalizado_em = _parse_iso_datetime(finalizado_em)
             elif isinstance(finalizado_em, date) and not isinstance(finalizado_em, datetime):
-                finalizado_em = datetime.combine(finalizado_em, datetime.min.time())
+                finalizado_em = datetime.combine(finalizado_em, _MEIA_NOITE)
             if data_entrada and finalizado_em:
-                entrada_dt = datetime.combine(data_entrada, datetime.min.time())
+                entrada_dt = datetime.combine(data_entrada, _MEIA_NOITE)
                 if finalizado_em >= entrada_dt:
-                    duracoes_demandas.append((finalizado_em - entrada_dt).total_seconds())
+                    soma_segundos_demandas += (finalizado_em - entrada_dt).total_seconds()
+                    quantidade_demandas += 1
         tempo_medio_demandas = (
-            (sum(duracoes_demandas) / len(duracoes_demandas)) / 86400
-            if duracoes_demandas
-            else None
+            (soma_segundos_demandas / quantidade_demandas) / 86400 if quantidade_demandas else None
         )
         total_demandas = int(total_demandas_indicador or len(demandas))
         metricas_demandas = {
@@ -9140,14 +10585,6 @@ def api_verificar_dados_column_options():
             filtros_coluna = {}
     filtros_coluna.pop(col_slug, None)
 
-    def _parse_iso_datetime(valor: Optional[str]) -> Optional[datetime]:
-        if not valor:
-            return None
-        try:
-            return datetime.fromisoformat(valor)
-        except Exception:
-            return None
-
     def _data_somente(valor: object) -> Optional[date]:
         if isinstance(valor, datetime):
             return valor.date()
@@ -9200,19 +10637,6 @@ def api_verificar_dados_column_options():
             return "(vazio)"
         return normalizar_chave(texto).lower()
 
-    def _ordenar_gerencias(origem: List[str]) -> List[str]:
-        vistos = set()
-        resultado: List[str] = []
-        for nome in origem:
-            if not nome:
-                continue
-            chave = nome.strip().upper()
-            if chave in vistos:
-                continue
-            vistos.add(chave)
-            resultado.append(nome.strip())
-        return ordenar_gerencias_preferencial(resultado)
-
     consulta = (
         Processo.query.options(
             selectinload(Processo.movimentacoes),
@@ -9257,24 +10681,19 @@ def api_verificar_dados_column_options():
 
     processos_brutos = consulta.order_by(Processo.finalizado_em.desc(), Processo.atualizado_em.desc()).all()
     processos_por_id = {proc.id: proc for proc in processos_brutos}
+    planilhador_por_id = {
+        proc.id: proc.assigned_to.nome or proc.assigned_to.username
+        for proc in processos_brutos
+        if proc.assigned_to
+    }
 
     processos_data: List[Dict[str, object]] = []
     vistos_data: Set[tuple] = set()
     for proc in processos_brutos:
         base = serializar_processo_para_relatorio(proc)
-        movimentos = sorted(base.get("movimentacoes") or [], key=lambda m: m.get("data") or "")
-        gerencias = []
-        gerencias.extend(base.get("gerencias_involvidas") or [])
-        dados_extra_base = base.get("dados_extra") or {}
-        if isinstance(dados_extra_base, dict):
-            gerencias.extend(dados_extra_base.get("gerencias_escolhidas") or [])
-        gerencias.append(base.get("gerencia"))
-        for mov in movimentos:
-            gerencias.extend([mov.get("de"), mov.get("para")])
-        ignorar = {"SAIDA", "FINALIZADO", "ENTRADA", "CADASTRO"}
-        gerencias = [g for g in gerencias if g and str(g).strip() and str(g).strip().upper() not in ignorar]
-        base["movimentacoes"] = movimentos
-        base["gerencias_involvidas"] = _ordenar_gerencias([g for g in gerencias if g and str(g).strip()])
+        # A serializacao ja entrega as movimentacoes em ordem de criado_em.
+        base["movimentacoes"] = base.get("movimentacoes") or []
+        base["gerencias_involvidas"] = trilha_gerencias_relatorio(base)
         chave_data = (
             base.get("id"),
             base.get("numero_sei_base") or base.get("numero_sei"),
@@ -9334,31 +10753,44 @@ def api_verificar_dados_column_options():
             observacoes_complementares = proc_ref.observacoes_complementares if proc_ref else proc.get("observacao")
         dados_extra = proc.get("dados_extra") or {}
         planilhador = proc.get("responsavel_adm")
-        if proc_ref and not planilhador and proc_ref.assigned_to:
-            planilhador = proc_ref.assigned_to.nome or proc_ref.assigned_to.username
-        data_entrada_gerencia = data_entrada_na_gerencia(proc_ref, "SAIDA") if proc_ref else None
-        gerencia_origem = obter_origem_saida(proc_ref) if proc_ref else None
-        destino_saida = proc_ref.tramitado_para if proc_ref else None
+        # Campos do processo carregado lidos uma vez, sem repetir o teste de proc_ref por campo.
+        if proc_ref:
+            if not planilhador:
+                planilhador = planilhador_por_id.get(proc_ref.id, planilhador)
+            numero_sei_base = proc_ref.numero_sei_base
+            data_entrada = proc_ref.data_entrada
+            concessionaria = proc_ref.concessionaria
+            prazo = proc_ref.prazo
+            classificacao_institucional = proc_ref.classificacao_institucional
+            descricao_melhorada = proc_ref.descricao_melhorada
+            data_saida = proc_ref.data_saida
+            data_entrada_gerencia = data_entrada_na_gerencia(proc_ref, "SAIDA")
+            gerencia_origem = obter_origem_saida(proc_ref)
+            destino_saida = proc_ref.tramitado_para
+        else:
+            numero_sei_base = proc.get("numero_sei_base") or proc.get("numero_sei")
+            data_entrada = concessionaria = prazo = classificacao_institucional = None
+            descricao_melhorada = data_saida = data_entrada_gerencia = gerencia_origem = destino_saida = None
         return {
             "id": proc.get("id"),
             "numero_sei": proc.get("numero_sei"),
-            "numero_sei_base": proc_ref.numero_sei_base if proc_ref else proc.get("numero_sei_base") or proc.get("numero_sei"),
+            "numero_sei_base": numero_sei_base,
             "chave_relacionamento": proc.get("chave_relacionamento"),
-            "data_entrada": proc_ref.data_entrada if proc_ref else None,
+            "data_entrada": data_entrada,
             "assunto": proc.get("assunto"),
             "interessado": proc.get("interessado"),
-            "concessionaria": proc_ref.concessionaria if proc_ref else None,
+            "concessionaria": concessionaria,
             "gerencia": gerencias_concat or gerencia_final,
             "gerencia_origem": gerencia_origem,
             "destino_saida": destino_saida,
-            "prazo": proc_ref.prazo if proc_ref else None,
+            "prazo": prazo,
             "coordenadoria": snapshot.get("coordenadoria") or proc.get("coordenadoria"),
             "equipe_area": snapshot.get("equipe_area") or proc.get("equipe_area"),
             "responsavel_equipe": snapshot.get("responsavel_equipe") or proc.get("responsavel_equipe"),
             "status": status_val,
             "status_equipe": status_equipe,
-            "classificacao_institucional": proc_ref.classificacao_institucional if proc_ref else None,
-            "descricao_melhorada": proc_ref.descricao_melhorada if proc_ref else None,
+            "classificacao_institucional": classificacao_institucional,
+            "descricao_melhorada": descricao_melhorada,
             "finalizado_em": data_final,
             "responsavel_adm": proc.get("responsavel_adm"),
             "planilhador": planilhador,
@@ -9368,51 +10800,67 @@ def api_verificar_dados_column_options():
             "observacoes_complementares": observacoes_complementares,
             "data_entrada_gerencia": data_entrada_gerencia,
             "dados_extra": dados_extra,
-            "data_saida": proc_ref.data_saida if proc_ref else None,
+            "data_saida": data_saida,
         }
 
     def _normalizar_str(valor: Optional[str]) -> str:
         return (valor or "").strip().lower()
 
+    filtro_gerencia_norm = _normalizar_str(filtro_gerencia)
+    coordenadoria_norm = _normalizar_str(coordenadoria)
+    equipe_norm = _normalizar_str(equipe)
+    interessado_norm = _normalizar_str(interessado)
+
+    def _data_final_registro(reg: Dict[str, object]) -> datetime:
+        val = reg.get("finalizado_em")
+        if isinstance(val, datetime):
+            return val
+        if isinstance(val, str):
+            return _parse_iso_datetime(val) or datetime.min
+        return datetime.min
+
+    chave_data_final = itemgetter("_data_final_ordem")
+
     registros_finalizados_todos: List[Dict[str, object]] = []
     for proc in processos_data:
-        proc_ref = processos_por_id.get(proc.get("id"))
-        registro = _registro_finalizado_por_processo(proc, proc_ref)
-        if not registro:
+        # Filtros que so leem o processo serializado rodam antes de montar o registro completo.
+        if interessado and _normalizar_str(proc.get("interessado")) != interessado_norm:
             continue
-        gerencias_lista = (proc.get("gerencias_involvidas") or []) + ([proc.get("gerencia")] if proc.get("gerencia") else [])
-        gerencias_lista = [
-            g for g in gerencias_lista if g and _normalizar_str(g) not in {"saida", "finalizado", "entrada", "cadastro"}
-        ]
-        if filtro_gerencia and not any(_normalizar_str(g) == _normalizar_str(filtro_gerencia) for g in gerencias_lista):
+        if numero_sei and numero_sei.lower() not in (proc.get("numero_sei") or "").lower():
             continue
-        if coordenadoria and _normalizar_str(registro.get("coordenadoria")) != _normalizar_str(coordenadoria):
+        gerencias_lista: List[str] = []
+        # Cada gerencia e normalizada uma vez; o filtro vira consulta ao conjunto.
+        gerencias_norm: Set[str] = set()
+        for g in chain(proc.get("gerencias_involvidas") or (), (proc.get("gerencia"),)):
+            if not g:
+                continue
+            g_norm = _normalizar_str(g)
+            if g_norm in GERENCIAS_FORA_TRILHA_MINUSCULAS:
+                continue
+            gerencias_lista.append(g)
+            gerencias_norm.add(g_norm)
+        if filtro_gerencia and filtro_gerencia_norm not in gerencias_norm:
             continue
-        if equipe and _normalizar_str(registro.get("equipe_area")) != _normalizar_str(equipe):
+        proc_ref = processos_por_id.get(proc.get("id"))
+        registro = _registro_finalizado_por_processo(proc, proc_ref)
+        if not registro:
             continue
-        if interessado and _normalizar_str(registro.get("interessado")) != _normalizar_str(interessado):
+        if coordenadoria and _normalizar_str(registro.get("coordenadoria")) != coordenadoria_norm:
             continue
-        if numero_sei and numero_sei.lower() not in (registro.get("numero_sei") or "").lower():
+        if equipe and _normalizar_str(registro.get("equipe_area")) != equipe_norm:
             continue
         if not _atende_filtro_datas(registro.get("data_entrada"), registro.get("data_saida") or registro.get("finalizado_em")):
             continue
-        gerencias_lista = _ordenar_gerencias(gerencias_lista)
+        gerencias_lista = ordenar_gerencias_preferencial(gerencias_lista)
         registro["gerencia"] = " -> ".join(gerencias_lista) if gerencias_lista else registro.get("gerencia")
+        registro["_data_final_ordem"] = _data_final_registro(registro)
         registros_finalizados_todos.append(registro)
 
     filtros_consolidado_ativos = any([coordenadoria, equipe, interessado, data_inicio, data_fim])
 
-    def _data_final_registro(reg: Dict[str, object]) -> datetime:
-        val = reg.get("finalizado_em")
-        if isinstance(val, datetime):
-            return val
-        if isinstance(val, str):
-            return _parse_iso_datetime(val) or datetime.min
-        return datetime.min
-
     processos_consolidados: List[Dict[str, object]] = []
     if filtros_consolidado_ativos:
-        for registro in sorted(registros_finalizados_todos, key=_data_final_registro, reverse=True):
+        for registro in sorted(registros_finalizados_todos, key=chave_data_final, reverse=True):
             principal = dict(registro)
             data_entrada_item = principal.get("data_entrada_gerencia") or principal.get("data_entrada")
             if isinstance(data_entrada_item, datetime):
@@ -9439,16 +10887,21 @@ def api_verificar_dados_column_options():
         for registro in registros_finalizados_todos:
             chave_base = ((registro.get("numero_sei_base") or registro.get("numero_sei") or "").strip().lower() or f"id:{registro.get('id')}")
             processos_por_base[chave_base].append(registro)
+        # Cada grupo e ordenado uma vez; o primeiro item ja e a data final mais recente da base.
+        grupos_ordenados = {
+            base: sorted(lista, key=chave_data_final, reverse=True)
+            for base, lista in processos_por_base.items()
+        }
         bases_ordenadas = sorted(
-            processos_por_base.keys(),
-            key=lambda base: max((_data_final_registro(r) for r in processos_por_base[base]), default=datetime.min),
+            grupos_ordenados,
+            key=lambda base: chave_data_final(grupos_ordenados[base][0]),
             reverse=True,
         )
         for base in bases_ordenadas:
-            grupo = sorted(processos_por_base[base], key=_data_final_registro, reverse=True)
+            grupo = grupos_ordenados[base]
             principal = dict(grupo[0]) if grupo else {}
             pares_datas: List[Dict[str, object]] = []
-            vistos_pares: Set[str] = set()
+            vistos_pares: Set[Tuple[Optional[date], Optional[datetime], str]] = set()
             cores_pares = ("pareado-1", "pareado-2", "pareado-3", "pareado-4", "pareado-5", "pareado-6")
             grupo_por_entrada = sorted(
                 grupo,
@@ -9468,10 +10921,11 @@ def api_verificar_dados_column_options():
                     data_final_item = _parse_iso_datetime(data_final_item)
                 if isinstance(data_final_item, date) and not isinstance(data_final_item, datetime):
                     data_final_item = datetime.combine(data_final_item, datetime.min.time())
+                # Tupla com as proprias datas (sem isoformat); valores ausentes viram None.
                 chave_par = (
-                    f"{data_entrada_item.isoformat() if isinstance(data_entrada_item, date) else '-'}::"
-                    f"{data_final_item.isoformat() if isinstance(data_final_item, datetime) else '-'}::"
-                    f"{(item.get('gerencia_origem') or item.get('gerencia') or '').strip().lower()}"
+                    data_entrada_item if isinstance(data_entrada_item, date) else None,
+                    data_final_item if isinstance(data_final_item, datetime) else None,
+                    (item.get("gerencia_origem") or item.get("gerencia") or "").strip().lower(),
                 )
                 if chave_par in vistos_pares:
                     continue
@@ -9485,17 +10939,16 @@ def api_verificar_dados_column_options():
                     "cor": cor,
                 })
             datas_entrada_unicas: List[date] = []
-            vistos_datas_entrada: Set[str] = set()
+            vistos_datas_entrada: Set[date] = set()
             for item in grupo:
                 data_item = item.get("data_entrada_gerencia") or item.get("data_entrada")
                 if isinstance(data_item, datetime):
                     data_item = data_item.date()
                 if not isinstance(data_item, date):
                     continue
-                chave_data = data_item.isoformat()
-                if chave_data in vistos_datas_entrada:
+                if data_item in vistos_datas_entrada:
                     continue
-                vistos_datas_entrada.add(chave_data)
+                vistos_datas_entrada.add(data_item)
                 datas_entrada_unicas.append(data_item)
             datas_entrada_unicas.sort(reverse=True)
             principal["datas_entrada"] = datas_entrada_unicas
@@ -9508,10 +10961,10 @@ def api_verificar_dados_column_options():
                     continue
                 partes = [p.strip() for p in valor.split("->") if p.strip()] or [valor]
                 for parte in partes:
-                    if _normalizar_str(parte) in {"saida", "finalizado", "entrada", "cadastro"}:
+                    if _normalizar_str(parte) in GERENCIAS_FORA_TRILHA_MINUSCULAS:
                         continue
                     gerencias_group.append(parte)
-            gerencias_group = _ordenar_gerencias(gerencias_group)
+            gerencias_group = ordenar_gerencias_preferencial(gerencias_group)
             if gerencias_group:
                 principal["gerencia"] = " -> ".join(gerencias_group)
             processos_consolidados.append(principal)
@@ -9724,7 +11177,7 @@ def _render_tela_edicao_processo(
             ),
         )
         gerencias_registradas: Set[str] = set()
-        ignorar_gerencias = {"SAIDA", "FINALIZADO", "ENTRADA", "CADASTRO"}
+        ignorar_gerencias = GERENCIAS_FORA_TRILHA
         def _snapshot_demanda(proc_item: Processo) -> Dict[str, object]:
             movs = sorted(
                 proc_item.movimentacoes,
@@ -10060,7 +11513,7 @@ def editar_processo(processo_id: int):
             )
             return redirect(url_for("editar_processo", processo_id=processo.id))
         estado_antes = capturar_estado_historico_processo(processo)
-        responsavel_antes = estado_antes.get("responsavel_equipe") or ""
+        responsavel_antes = estado_antes.responsavel_equipe
         aplicar_edicao_processo(processo, request.form, campos_def)
         aviso_atribuicao = sincronizar_atribuicao_responsavel_equipe(
             processo, responsavel_antes
@@ -10228,8 +11681,8 @@ def editar_processo(processo_id: int):
             return redirect(url_for("gerencia", nome_gerencia="SAIDA"))
 
         if mudancas_edicao:
-            status_antes = (estado_antes.get("status") or "").strip()
-            status_depois = (estado_depois.get("status") or "").strip()
+            status_antes = estado_antes.status.strip()
+            status_depois = estado_depois.status.strip()
             if status_antes != status_depois:
                 db.session.add(
                     Movimentacao(
@@ -10888,7 +12341,7 @@ def reenviar_processo_devolvido(processo_id: int):
             if (
                 item.id != processo.id
                 and ger_item
-                and ger_item not in {"SAIDA", "FINALIZADO", "ENTRADA", "CADASTRO"}
+                and ger_item not in GERENCIAS_FORA_TRILHA
                 and item.finalizado_em is None
                 and not dados_item.get("devolvido_gabinete")
             ):